@@ -0,0 +1,314 @@
+import asyncio
+import glob
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from importlib.metadata import entry_points
+
+from logger import log
+from config import (
+    ACTION_PLUGIN_DIRS,
+    ACTION_PLUGIN_ENTRY_POINT_GROUP,
+    ACTION_COLD_START_BUDGET_MS,
+)
+
+
+# ======================================================
+# MANIFESTS
+# ======================================================
+#
+# An action is declared by metadata only; its module is imported the
+# first time the action is dispatched. Callables are "module:attribute".
+#
+#     {"actions": {
+#         "analyze_file": {
+#             "call": "actions:analyze_file_action",
+#             "category": "analysis",        # matched against Agent.allowed_action_categories
+#             "cost": "high",                # low | medium | high
+#             "timeout_seconds": 60,         # None = the runtime's default (ASYNC_INTENT_TIMEOUT_SECONDS)
+#             "target": "process",           # inline: scheduler thread, thread: warm thread pool,
+#                                            # process: warm process pool (CPU-heavy); plugins
+#                                            # default to thread (inline for async callables)
+#             "state_slice": "analyzer:state_slice",   # process target: seed of the scratch state
+#             "after_apply": "analyzer:trim_cache"     # run after a worker's changes are merged
+#         }}}
+#
+# Sources, later ones overriding earlier ones by action name: the built-in
+# manifest below, *.json files in ACTION_PLUGIN_DIRS (each directory also
+# goes on sys.path for its modules), and entry points in
+# ACTION_PLUGIN_ENTRY_POINT_GROUP that load to a manifest dict.
+
+BUILTIN_MANIFEST = {
+    "actions": {
+        "analyze_file": {
+            "call": "actions:analyze_file_action",
+            "category": "analysis",
+            "cost": "high",
+            "target": "process",
+            "state_slice": "analyzer:state_slice",
+            "after_apply": "analyzer:trim_cache",
+        },
+        "log_result": {
+            "call": "actions:log_result",
+            "category": "reporting",
+            "cost": "low",
+            "timeout_seconds": 5,
+            "target": "inline",
+        },
+    },
+}
+
+TARGETS = ("inline", "thread", "process")
+COST_CLASSES = ("low", "medium", "high")
+
+
+def resolve_callable(ref):
+    module_name, _, attribute = ref.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+# ======================================================
+# ACTION SPECS
+# ======================================================
+
+@dataclass(slots=True)
+class ActionSpec:
+    """
+    Metadata of one action plus its lazily imported callables.
+    """
+
+    name: str
+    call: str
+    category: str
+    cost: str = "medium"
+    timeout_seconds: float = None
+    target: str = "inline"
+    state_slice_ref: str = None
+    after_apply_ref: str = None
+    source: str = "builtin"
+    infer_target: bool = False    # no target declared: settled in load()
+
+    # Resolved on first dispatch
+    fn: object = field(default=None, repr=False)
+    state_slice: object = field(default=None, repr=False)
+    after_apply: object = field(default=None, repr=False)
+    loaded: bool = False
+
+    def __post_init__(self):
+        if self.target not in TARGETS:
+            raise ValueError(f"target must be one of {TARGETS}, not {self.target!r}")
+        if self.cost not in COST_CLASSES:
+            raise ValueError(f"cost must be one of {COST_CLASSES}, not {self.cost!r}")
+
+    @classmethod
+    def from_manifest(cls, name, meta, source):
+        return cls(
+            name=name,
+            call=meta["call"],
+            category=meta["category"],
+            cost=meta.get("cost", "medium"),
+            timeout_seconds=meta.get("timeout_seconds"),
+            target=meta.get("target") or ("inline" if source == "builtin" else "thread"),
+            state_slice_ref=meta.get("state_slice"),
+            after_apply_ref=meta.get("after_apply"),
+            source=source,
+            infer_target=source != "builtin" and not meta.get("target"),
+        )
+
+    def load(self):
+        """
+        Import the action's module(s) once; returns self.
+        """
+        if self.loaded:
+            return self
+
+        started = time.perf_counter()
+        self.fn = resolve_callable(self.call)
+        if self.infer_target:
+            # Sync plugins run off the scheduler / event loop thread by
+            # default; coroutines stay inline, under their own timeout
+            self.target = "inline" if asyncio.iscoroutinefunction(self.fn) else "thread"
+        if self.state_slice_ref:
+            self.state_slice = resolve_callable(self.state_slice_ref)
+        if self.after_apply_ref:
+            self.after_apply = resolve_callable(self.after_apply_ref)
+        self.loaded = True
+
+        log(
+            f"[PLUGIN] Loaded action {self.name} from {self.call} "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms",
+            level="DEBUG",
+        )
+        return self
+
+
+# ======================================================
+# REGISTRY
+# ======================================================
+
+class ActionRegistry:
+    """
+    Every discovered action by name. Discovery reads manifests only;
+    nothing is imported until resolve().
+    """
+
+    def __init__(self):
+        self.specs = {}
+        self.version = 0
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def __iter__(self):
+        return iter(self.specs.values())
+
+    def discover(self, plugin_dirs=ACTION_PLUGIN_DIRS, entry_point_group=ACTION_PLUGIN_ENTRY_POINT_GROUP):
+        self.specs = {}
+        self.add_manifest(BUILTIN_MANIFEST, "builtin")
+
+        for directory in plugin_dirs or []:
+            if not os.path.isdir(directory):
+                continue
+            if directory not in sys.path:
+                sys.path.append(directory)
+            for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+                try:
+                    with open(path, "r") as file:
+                        manifest = json.load(file)
+                except (OSError, ValueError) as e:
+                    log(f"[PLUGIN] Unreadable manifest {path}: {e}", level="ERROR")
+                    continue
+                self.add_manifest(manifest, path)
+
+        if entry_point_group:
+            for entry_point in entry_points(group=entry_point_group):
+                try:
+                    manifest = entry_point.load()
+                except Exception as e:
+                    log(f"[PLUGIN] Entry point {entry_point.name} failed to load: {e}", level="ERROR")
+                    continue
+                self.add_manifest(manifest, f"entry point {entry_point.name}")
+
+        self.version += 1
+        return self
+
+    def add_manifest(self, manifest, source):
+        for name, meta in (manifest.get("actions") or {}).items():
+            try:
+                spec = ActionSpec.from_manifest(name, meta, source)
+            except (KeyError, TypeError, ValueError) as e:
+                log(f"[PLUGIN] Skipping action {name} from {source}: {e}", level="ERROR")
+                continue
+
+            previous = self.specs.get(name)
+            if previous is not None:
+                log(f"[PLUGIN] Action {name} from {source} overrides {previous.source}")
+            self.specs[name] = spec
+        self.version += 1
+
+    def get(self, name):
+        return self.specs.get(name)
+
+    def resolve(self, name):
+        """
+        The loaded spec for name; raises RuntimeError if unknown.
+        """
+        spec = self.specs.get(name)
+        if spec is None:
+            raise RuntimeError(f"No executor registered for action '{name}'")
+        return spec.load()
+
+    def preload(self, target=None):
+        """
+        Import every action (of one target) up front, e.g. in pool workers.
+        """
+        for spec in self.specs.values():
+            if target is None or spec.target == target:
+                spec.load()
+
+    def allowed_actions(self, categories):
+        """
+        Action names whose category is in categories ("*" = every category).
+        """
+        if categories is None or "*" in categories:
+            return frozenset(self.specs)
+        categories = set(categories)
+        return frozenset(name for name, spec in self.specs.items() if spec.category in categories)
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = ActionRegistry().discover()
+    return _registry
+
+
+def reload_registry():
+    """
+    Re-read every manifest (loaded modules stay imported).
+    """
+    return get_registry().discover()
+
+
+def resolve_action(name):
+    return get_registry().resolve(name)
+
+
+# ======================================================
+# COLD-START BENCHMARK
+# ======================================================
+
+COLD_START_SNIPPET = """
+import sys, time
+started = time.perf_counter()
+import tasks
+import action_plugins
+registry = action_plugins.get_registry()
+elapsed = (time.perf_counter() - started) * 1000
+modules = sorted({s.call.partition(":")[0] for s in registry} & set(sys.modules))
+print(elapsed, *modules)
+"""
+
+
+def benchmark_cold_start(runs=5, budget_ms=ACTION_COLD_START_BUDGET_MS):
+    """
+    Time `import tasks` + action discovery in fresh interpreters. Returns
+    (best ms, within budget, eagerly imported action modules).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    eager = set()
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SNIPPET],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.splitlines()[-1].split()
+        timings.append(float(output[0]))
+        eager.update(output[1:])
+
+    best = min(timings)
+    return best, best <= budget_ms, sorted(eager)
+
+
+if __name__ == "__main__":
+    # python action_plugins.py            list discovered actions
+    # python action_plugins.py bench      cold-start benchmark (exit 1 over budget)
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        best, ok, eager = benchmark_cold_start()
+        print(f"Cold start: {best:.1f}ms (budget {ACTION_COLD_START_BUDGET_MS}ms)")
+        if eager:
+            print(f"Imported at start: {', '.join(eager)}")
+        sys.exit(0 if ok else 1)
+
+    for spec in get_registry():
+        timeout = f"{spec.timeout_seconds}s" if spec.timeout_seconds else "default"
+        print(f"{spec.name:<20} {spec.category:<12} {spec.cost:<6} {spec.target:<8} "
+              f"{timeout:>8}  {spec.call}  ({spec.source})")
@@ -1,4 +1,5 @@
 from logger import log
+import analyzer
 
 # ======================================================
 # ACTION EXECUTORS
@@ -8,16 +9,15 @@ def analyze_file_action(payload, state):
     file = payload.get("file")
     log(f"[ACTION] Analyzing file: {file}")
 
+    result = analyzer.analyze_path(state, file)
+    log(f"[ACTION] Analysis of {file}: {analyzer.summarize(result)}")
+
 def log_result(payload, state):
     message = payload.get("message")
     log(f"[ACTION] {message}")
 
+    file = payload.get("file")
+    result = state.get("file_analysis", {}).get(file) if file else None
+    if result:
+        log(f"[ACTION] Result for {file}: {analyzer.summarize(result)}")
 
-# ======================================================
-# ACTION REGISTRY
-# ======================================================
-
-ACTION_REGISTRY = {
-    "analyze_file": analyze_file_action,
-    "log_result": log_result,
-}
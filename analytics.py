@@ -0,0 +1,281 @@
+import json
+import math
+import sys
+from array import array
+from datetime import datetime
+
+from records import timestamp
+
+try:
+    import numpy as np
+except ImportError:   # optional: pure-Python fallback over the same arrays
+    np = None
+
+
+# ======================================================
+# COLUMNAR GOALS
+# ======================================================
+
+class Categories:
+    """
+    Dictionary encoding: value <-> small int code.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class GoalColumns:
+    """
+    Goals as parallel typed arrays (one row per goal): dictionary-encoded
+    status / type / mission / agent, score, and time-to-complete in seconds
+    (NaN unless completed with activated_at and updated_at).
+    """
+
+    def __init__(self):
+        self.statuses = Categories()
+        self.types = Categories()
+        self.missions = Categories()
+        self.agents = Categories()
+
+        self.status = array("i")
+        self.type = array("i")
+        self.mission = array("i")
+        self.agent = array("i")
+        self.score = array("d")
+        self.ttc = array("d")
+
+    def __len__(self):
+        return len(self.status)
+
+    def append(self, goal):
+        status = goal.get("status")
+        self.status.append(self.statuses.code(status))
+        self.type.append(self.types.code(goal.get("normalized_type") or goal.get("type")))
+        self.mission.append(self.missions.code(goal.get("mission_id")))
+        self.agent.append(self.agents.code(goal.get("owner_agent_id")))
+        self.score.append(goal.get("score") or 0)
+        self.ttc.append(time_to_complete(goal) if status == "completed" else math.nan)
+
+    @classmethod
+    def from_goals(cls, goals):
+        columns = cls()
+        for goal in goals:
+            columns.append(goal)
+        return columns
+
+
+def time_to_complete(goal):
+    started = timestamp(goal, "activated_at")
+    finished = timestamp(goal, "updated_at")
+    if started is None or finished is None:
+        return math.nan
+    return finished - started
+
+
+# ======================================================
+# VECTORIZED KERNELS (NumPy or pure Python)
+# ======================================================
+
+def group_counts(keys, n_keys, statuses, n_statuses):
+    """
+    counts[key][status] in one pass over the two code columns.
+    """
+    if np is not None and len(keys):
+        flat = np.frombuffer(keys, dtype=np.int32) * n_statuses + np.frombuffer(statuses, dtype=np.int32)
+        return np.bincount(flat, minlength=n_keys * n_statuses).reshape(n_keys, n_statuses).tolist()
+
+    counts = [[0] * n_statuses for _ in range(n_keys)]
+    for key, status in zip(keys, statuses):
+        counts[key][status] += 1
+    return counts
+
+
+def value_counts(codes, n_codes):
+    if np is not None and len(codes):
+        return np.bincount(np.frombuffer(codes, dtype=np.int32), minlength=n_codes).tolist()
+
+    counts = [0] * n_codes
+    for code in codes:
+        counts[code] += 1
+    return counts
+
+
+def percentiles(values, qs):
+    """
+    Nearest-rank percentiles of the finite values (None when there are none).
+    """
+    if np is not None:
+        data = np.frombuffer(values, dtype=np.float64)
+        data = data[np.isfinite(data)]
+        if not data.size:
+            return {q: None for q in qs}
+        return {q: float(v) for q, v in zip(qs, np.percentile(data, qs, method="nearest"))}
+
+    data = sorted(v for v in values if not math.isnan(v))
+    if not data:
+        return {q: None for q in qs}
+    return {q: data[min(len(data) - 1, max(0, math.ceil(q / 100 * len(data)) - 1))] for q in qs}
+
+
+def column_sum(values):
+    if np is not None:
+        return float(np.frombuffer(values, dtype=np.float64).sum())
+    return math.fsum(values)
+
+
+# ======================================================
+# ROLLUPS
+# ======================================================
+
+GROUPINGS = (("mission", "missions", "by_mission"), ("type", "types", "by_type"), ("agent", "agents", "by_agent"))
+
+
+def completion_rates(columns, column, categories, archived=None):
+    """
+    {group: {"total", "completed", "failed", "rate"}} where rate is
+    completed / (completed + failed). archived adds the archive rollup
+    counts ({group: {status: n}}) for goals no longer in hot state.
+    """
+    counts = group_counts(
+        getattr(columns, column), len(getattr(columns, categories).values),
+        columns.status, len(columns.statuses.values),
+    )
+    status_names = columns.statuses.values
+
+    result = {}
+    for code, group in enumerate(getattr(columns, categories).values):
+        row = result[str(group)] = {"total": 0, "completed": 0, "failed": 0}
+        for status_code, n in enumerate(counts[code]):
+            row["total"] += n
+            if status_names[status_code] in ("completed", "failed"):
+                row[status_names[status_code]] += n
+
+    for group, by_status in (archived or {}).items():
+        row = result.setdefault(str(group), {"total": 0, "completed": 0, "failed": 0})
+        for status, n in by_status.items():
+            row["total"] += n
+            if status in ("completed", "failed"):
+                row[status] += n
+
+    for row in result.values():
+        finished = row["completed"] + row["failed"]
+        row["rate"] = round(row["completed"] / finished, 3) if finished else None
+
+    return result
+
+
+def retry_distribution(state):
+    """
+    Histograms {retries: count} for scheduler tasks (retry_count_*) and
+    plan steps (step retry_count).
+    """
+    tasks = {}
+    for key, value in state.items():
+        if key.startswith("retry_count_") and isinstance(value, int):
+            tasks[value] = tasks.get(value, 0) + 1
+
+    steps = {}
+    for plan in state.get("plans", []):
+        for step in plan.get("steps", []):
+            retries = step.get("retry_count", 0)
+            steps[retries] = steps.get(retries, 0) + 1
+
+    failing = {
+        key.replace("retry_count_", ""): value
+        for key, value in state.items()
+        if key.startswith("retry_count_") and isinstance(value, int) and value > 0
+    }
+
+    return {
+        "tasks": dict(sorted(tasks.items())),
+        "steps": dict(sorted(steps.items())),
+        "failing_tasks": failing,
+    }
+
+
+def build_report(state, archived_records=None):
+    """
+    All rollups in one dict. archived_records (from archive.iter_archive)
+    adds archived goals as full rows (time-to-complete included); without
+    them only the archive's rollup counters are folded in.
+    """
+    columns = GoalColumns.from_goals(state.get("goals", []))
+    rollups = state.get("archive_rollups") or {}
+
+    if archived_records is not None:
+        for record in archived_records:
+            columns.append(record["goal"])
+        rollups = {}
+
+    status_counts = dict(zip(
+        columns.statuses.values, value_counts(columns.status, len(columns.statuses.values))
+    ))
+    for status, n in rollups.get("by_status", {}).items():
+        status_counts[status] = status_counts.get(status, 0) + n
+
+    total = len(columns) + rollups.get("goals", 0)
+    score_sum = column_sum(columns.score) + rollups.get("score_sum", 0)
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "backend": "numpy" if np is not None else "array",
+        "goals": total,
+        "by_status": status_counts,
+        "avg_score": round(score_sum / total, 2) if total else 0,
+        "time_to_complete_seconds": percentiles(columns.ttc, (50, 90, 99)),
+        "retries": retry_distribution(state),
+    }
+    for column, categories, rollup_key in GROUPINGS:
+        report[f"completion_by_{column}"] = completion_rates(
+            columns, column, categories, rollups.get(rollup_key)
+        )
+
+    return report
+
+
+def format_report(report):
+    def fmt_seconds(value):
+        return "-" if value is None else f"{value / 60:.1f}m"
+
+    lines = [
+        f"Goals: {report['goals']} {report['by_status']}",
+        "Time to complete: " + ", ".join(
+            f"p{q}={fmt_seconds(v)}" for q, v in report["time_to_complete_seconds"].items()
+        ),
+    ]
+    for column, _, _ in GROUPINGS:
+        rows = report[f"completion_by_{column}"]
+        lines.append(f"Completion by {column}: " + ", ".join(
+            f"{group}={row['completed']}/{row['completed'] + row['failed']}"
+            + (f" ({row['rate']:.0%})" if row["rate"] is not None else "")
+            for group, row in sorted(rows.items())
+        ))
+    retries = report["retries"]
+    lines.append(f"Step retries: {retries['steps']}  Task retries: {retries['tasks']}")
+    if retries["failing_tasks"]:
+        lines.append(f"Failing tasks: {retries['failing_tasks']}")
+    return lines
+
+
+if __name__ == "__main__":
+    # python analytics.py [--archive] [--json]
+    from memory import read_state
+    import archive
+
+    state = read_state()
+    records = archive.iter_archive() if "--archive" in sys.argv else None
+    report = build_report(state, records)
+
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+    else:
+        print("\n".join(format_report(report)))
@@ -0,0 +1,352 @@
+import ast
+import codecs
+import hashlib
+import mmap
+import os
+from datetime import datetime
+
+from config import (
+    ANALYZER_BLOCK_BYTES,
+    ANALYZER_AST_MAX_BYTES,
+    ANALYSIS_CACHE_MAX,
+    FINGERPRINT_MMAP_THRESHOLD,
+)
+from fingerprint import cheap_key, get_fingerprint
+from state_store import mark_dirty, mark_removed
+
+
+# ======================================================
+# BLOCK READING
+# ======================================================
+
+def iter_blocks(path, block_size=ANALYZER_BLOCK_BYTES):
+    """
+    Yields the file in fixed-size blocks: mmap slices for large files,
+    buffered reads otherwise. Only one block is held at a time.
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+
+        if size >= FINGERPRINT_MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for offset in range(0, size, block_size):
+                    yield view[offset:offset + block_size]
+        else:
+            while True:
+                block = file.read(block_size)
+                if not block:
+                    break
+                yield block
+
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def block_is_utf8(block):
+    """
+    UTF-8 check that tolerates a multi-byte sequence split across the
+    block's start or end.
+    """
+    start = 0
+    while start < 3 and start < len(block) and block[start] & 0xC0 == 0x80:
+        start += 1
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        decoder.decode(block[start:], final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def scan_block(block):
+    """
+    Per-block facts; only recomputed for blocks whose digest changed.
+    """
+    ascii_only = block.isascii()
+    return {
+        "lines": block.count(b"\n"),
+        "ascii": ascii_only,
+        "utf8": ascii_only or block_is_utf8(block),
+        "nul": b"\0" in block,
+    }
+
+
+def detect_encoding(first_block, blocks):
+    for bom, name in BOMS:
+        if first_block.startswith(bom):
+            return name
+    if any(b["nul"] for b in blocks):
+        return "binary"
+    if all(b["ascii"] for b in blocks):
+        return "ascii"
+    if all(b["utf8"] for b in blocks):
+        return "utf-8"
+    return "latin-1"
+
+
+# ======================================================
+# PYTHON METRICS
+# ======================================================
+
+def python_metrics(path):
+    size = os.path.getsize(path)
+    if size > ANALYZER_AST_MAX_BYTES:
+        return {"skipped": f"larger than {ANALYZER_AST_MAX_BYTES} bytes"}
+
+    with open(path, "rb") as file:
+        source = file.read()
+
+    try:
+        tree = ast.parse(source, filename=path)
+    except SyntaxError as e:
+        return {"syntax_error": e.msg, "line": e.lineno}
+
+    metrics = {
+        "functions": 0,
+        "async_functions": 0,
+        "classes": 0,
+        "imports": 0,
+        "max_depth": 0,
+        "documented": 0,
+    }
+
+    def visit(node, depth):
+        metrics["max_depth"] = max(metrics["max_depth"], depth)
+        for child in ast.iter_child_nodes(node):
+            nested = depth
+            if isinstance(child, ast.FunctionDef):
+                metrics["functions"] += 1
+                nested += 1
+            elif isinstance(child, ast.AsyncFunctionDef):
+                metrics["async_functions"] += 1
+                nested += 1
+            elif isinstance(child, ast.ClassDef):
+                metrics["classes"] += 1
+                nested += 1
+            elif isinstance(child, (ast.Import, ast.ImportFrom)):
+                metrics["imports"] += 1
+
+            if nested > depth and ast.get_docstring(child):
+                metrics["documented"] += 1
+
+            visit(child, nested)
+
+    visit(tree, 0)
+    return metrics
+
+
+# ======================================================
+# ANALYSIS
+# ======================================================
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def analyze_path(state, path):
+    """
+    Analyzes path and stores the result in state["file_analysis"][path].
+
+    Unchanged content (fingerprint hash = previous result) is not read at
+    all, and identical content of another path is served from the
+    content-hash cache. Otherwise the block digests recorded by the
+    fingerprint pass are compared with the previous result's: only the
+    changed blocks are read and rescanned (an append reads just the new
+    tail), and the changed byte ranges are reported as the diff. Without
+    a current fingerprint the file is streamed and hashed once.
+    """
+    analyses = state.setdefault("file_analysis", {})
+    previous = analyses.get(path)
+
+    st = os.stat(path)
+    fingerprint = get_fingerprint(state, path)
+    known_hash = fingerprint[3] if fingerprint and fingerprint[:3] == cheap_key(st) else None
+
+    if previous and known_hash and previous["content_hash"] == known_hash:
+        return previous
+
+    cache = state.setdefault("analysis_cache", {})
+    cached = cache.get(known_hash) if known_hash else None
+
+    if cached:
+        result = dict(cached)
+    elif known_hash and len(fingerprint) > 4:
+        result = analyze_changed_blocks(path, previous, known_hash, st.st_size, fingerprint[4])
+        store_cached(state, cache, result)
+    else:
+        result = analyze_blocks(path, previous)
+        store_cached(state, cache, result)
+
+    finalize(result, previous, path)
+    analyses[path] = result
+    mark_dirty(state, "file_analysis", path)
+    return result
+
+
+def analyze_blocks(path, previous):
+    old_blocks = previous.get("blocks", []) if previous else []
+
+    digest = hashlib.blake2b(digest_size=20)
+    blocks = []
+    first_block = b""
+    offset = 0
+
+    for i, block in enumerate(iter_blocks(path)):
+        if i == 0:
+            first_block = bytes(block[:4])
+
+        digest.update(block)
+        block_hash = hashlib.blake2b(block, digest_size=16).hexdigest()
+
+        if i < len(old_blocks) and old_blocks[i][0] == block_hash:
+            facts = old_blocks[i][1]
+        else:
+            facts = scan_block(block)
+
+        blocks.append([block_hash, facts])
+        offset += len(block)
+
+    return block_result(path, digest.hexdigest(), offset, first_block, blocks)
+
+
+def analyze_changed_blocks(path, previous, content_hash, size, block_hashes):
+    """
+    analyze_blocks without hashing: block digests come from the
+    fingerprint, and only blocks whose digest moved are read.
+    """
+    old_blocks = previous.get("blocks", []) if previous else []
+    blocks = []
+
+    with open(path, "rb") as file:
+        first_block = file.read(4)
+        for i, block_hash in enumerate(block_hashes):
+            if i < len(old_blocks) and old_blocks[i][0] == block_hash:
+                facts = old_blocks[i][1]
+            else:
+                file.seek(i * ANALYZER_BLOCK_BYTES)
+                facts = scan_block(file.read(ANALYZER_BLOCK_BYTES))
+            blocks.append([block_hash, facts])
+
+    return block_result(path, content_hash, size, first_block, blocks)
+
+
+def block_result(path, content_hash, size, first_block, blocks):
+    block_facts = [facts for _, facts in blocks]
+    encoding = detect_encoding(first_block, block_facts)
+
+    result = {
+        "content_hash": content_hash,
+        "size": size,
+        "lines": sum(f["lines"] for f in block_facts),
+        "encoding": encoding,
+        "binary": encoding == "binary",
+        "blocks": blocks,
+        "python": None,
+    }
+
+    # AST metrics need the whole source (bounded by ANALYZER_AST_MAX_BYTES)
+    if path.endswith(".py") and not result["binary"]:
+        result["python"] = python_metrics(path)
+
+    return result
+
+
+def finalize(result, previous, path):
+    """
+    Path-specific fields: deltas and changed byte ranges vs. the previous
+    analysis of this path, derived from block digests alone.
+    """
+    result["path"] = path
+    result["analyzed_at"] = datetime.now().isoformat()
+    result["size_delta"] = result["size"] - previous["size"] if previous else None
+    result["line_delta"] = result["lines"] - previous["lines"] if previous else None
+
+    old_blocks = previous.get("blocks", []) if previous else []
+    changed = []
+    reused = 0
+
+    for i, (block_hash, _) in enumerate(result["blocks"]):
+        start = i * ANALYZER_BLOCK_BYTES
+        end = min(start + ANALYZER_BLOCK_BYTES, result["size"])
+        if i < len(old_blocks) and old_blocks[i][0] == block_hash:
+            reused += 1
+        else:
+            changed.append((start, end))
+
+    if len(old_blocks) > len(result["blocks"]):
+        changed.append((result["size"], result["size"]))  # truncated
+
+    result["changed_ranges"] = merge_ranges(changed)
+    result["reused_blocks"] = reused
+
+
+def store_cached(state, cache, result):
+    cache[result["content_hash"]] = dict(result)
+    mark_dirty(state, "analysis_cache", result["content_hash"])
+    trim_cache(state)
+
+
+def trim_cache(state):
+    cache = state.get("analysis_cache", {})
+
+    # Oldest entries first (dict insertion order)
+    while len(cache) > ANALYSIS_CACHE_MAX:
+        oldest = next(iter(cache))
+        del cache[oldest]
+        mark_removed(state, "analysis_cache", oldest)
+
+
+def state_slice(payload, state):
+    """
+    The part of state analyze_path reads, for running it in a worker.
+    """
+    path = payload.get("file")
+    fingerprint = get_fingerprint(state, path)
+    seed = {"file_analysis": {}, "file_fingerprints": {}, "analysis_cache": {}}
+
+    previous = state.get("file_analysis", {}).get(path)
+    if previous:
+        seed["file_analysis"][path] = previous
+    if fingerprint:
+        seed["file_fingerprints"][path] = fingerprint
+        cached = state.get("analysis_cache", {}).get(fingerprint[3])
+        if cached:
+            seed["analysis_cache"][fingerprint[3]] = cached
+
+    return seed
+
+
+def summarize(result):
+    parts = [
+        f"{result['size']} bytes",
+        f"{result['lines']} lines",
+        result["encoding"],
+    ]
+    if result.get("size_delta") is not None:
+        parts.append(f"Δsize={result['size_delta']:+d}")
+        parts.append(f"Δlines={result['line_delta']:+d}")
+        parts.append(f"changed ranges={len(result['changed_ranges'])}")
+
+    python = result.get("python")
+    if python and "functions" in python:
+        parts.append(
+            f"py: {python['functions'] + python['async_functions']} funcs, "
+            f"{python['classes']} classes, {python['imports']} imports"
+        )
+    elif python and "syntax_error" in python:
+        parts.append(f"py: syntax error line {python['line']}")
+
+    return ", ".join(parts)
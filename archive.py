@@ -0,0 +1,291 @@
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from logger import log
+from config import (
+    ARCHIVE_DIR,
+    ARCHIVE_AFTER_HOURS,
+    ARCHIVE_BATCH_MAX,
+    ARCHIVE_SEGMENT_MAX_BYTES,
+    STATE_FSYNC,
+)
+from state_store import mark_dirty, get_attachment
+from records import json_default
+import registry
+
+
+# ======================================================
+# SEGMENTS + MANIFEST
+# ======================================================
+#
+# archive/
+#   manifest.json          segment list with record counts and time range
+#   segment_000001.jsonl.gz
+#   segment_000002.jsonl.gz
+#
+# Each archival pass appends one gzip member (a complete gzip stream) to
+# the newest segment; concatenated members read back as one stream, so a
+# segment is append-only and every pass is durable on its own. A new
+# segment starts once the current one reaches ARCHIVE_SEGMENT_MAX_BYTES.
+#
+# One JSON line per archived goal:
+#   {"goal": {...}, "plans": [...], "archived_at": "..."}
+
+MANIFEST_NAME = "manifest.json"
+
+
+def archive_directory(state):
+    """
+    ARCHIVE_DIR next to this state's files, so every agent of the
+    multi-agent runtime archives into its own agents/<agent_id>/archive.
+    """
+    store = get_attachment(state, "state_store")
+    base = getattr(store, "directory", None) or "."
+    return os.path.join(base, ARCHIVE_DIR)
+
+
+def manifest_path(archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, MANIFEST_NAME)
+
+
+def load_manifest(archive_dir=ARCHIVE_DIR):
+    try:
+        with open(manifest_path(archive_dir), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"segments": []}
+
+
+def save_manifest(manifest, archive_dir=ARCHIVE_DIR):
+    path = manifest_path(archive_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+        file.flush()
+        if STATE_FSYNC:
+            os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_records(records, archive_dir=ARCHIVE_DIR):
+    """
+    Append records as one gzip member and update the manifest.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    segments = manifest["segments"]
+
+    if not segments or segments[-1]["bytes"] >= ARCHIVE_SEGMENT_MAX_BYTES:
+        segments.append({
+            "name": f"segment_{len(segments) + 1:06d}.jsonl.gz",
+            "records": 0,
+            "bytes": 0,
+            "first_updated_at": None,
+            "last_updated_at": None,
+        })
+    segment = segments[-1]
+
+    payload = "".join(json.dumps(r, separators=(",", ":"), default=json_default) + "\n" for r in records)
+    member = gzip.compress(payload.encode("utf-8"))
+
+    path = os.path.join(archive_dir, segment["name"])
+    with open(path, "ab") as file:
+        file.write(member)
+        file.flush()
+        if STATE_FSYNC:
+            os.fsync(file.fileno())
+
+    stamps = [r["goal"].get("updated_at") or r["goal"].get("created_at") or "" for r in records]
+    segment["records"] += len(records)
+    segment["bytes"] = os.path.getsize(path)
+    segment["first_updated_at"] = min(filter(None, [segment["first_updated_at"], *stamps]), default=None)
+    segment["last_updated_at"] = max(filter(None, [segment["last_updated_at"], *stamps]), default=None)
+
+    save_manifest(manifest, archive_dir)
+
+
+# ======================================================
+# ROLLUPS (hot-state counters for archived goals)
+# ======================================================
+
+def add_to_rollups(state, goals):
+    rollups = state.setdefault("archive_rollups", {
+        "goals": 0,
+        "by_status": {},
+        "by_type": {},
+        "by_mission": {},
+        "by_agent": {},
+        "by_week": {},
+        "score_sum": 0,
+    })
+
+    for goal in goals:
+        status = goal.get("status")
+        week = (goal.get("updated_at") or goal.get("created_at") or "")[:10]
+        if week:
+            year, number, _ = datetime.fromisoformat(week).isocalendar()
+            week = f"{year}-W{number:02d}"
+
+        rollups["goals"] += 1
+        rollups["score_sum"] += goal.get("score", 0)
+        rollups["by_status"][status] = rollups["by_status"].get(status, 0) + 1
+
+        # {key: {status: count}}
+        for bucket, key in (
+            ("by_type", goal.get("normalized_type") or goal.get("type")),
+            ("by_mission", goal.get("mission_id")),
+            ("by_agent", goal.get("owner_agent_id")),
+            ("by_week", week),
+        ):
+            if key:
+                counts = rollups[bucket].setdefault(key, {})
+                counts[status] = counts.get(status, 0) + 1
+
+    mark_dirty(state, "archive_rollups")
+    return rollups
+
+
+def archived_count(state, status):
+    rollups = state.get("archive_rollups")
+    if not rollups:
+        return 0
+    return rollups["by_status"].get(status, 0)
+
+
+# ======================================================
+# ARCHIVAL
+# ======================================================
+
+def archivable_goals(state, now, limit=ARCHIVE_BATCH_MAX):
+    cutoff = (now - timedelta(hours=ARCHIVE_AFTER_HOURS)).timestamp()
+    found = []
+    for status in registry.TERMINAL_GOAL_STATUSES:
+        for goal in registry.goals_with_status(state, status):
+            if (goal.updated_at or goal.created_at or 0) < cutoff:
+                found.append(goal)
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def archive_goals(state, now=None, archive_dir=None):
+    """
+    Move terminal goals older than ARCHIVE_AFTER_HOURS (and their plans)
+    out of hot state into the state's archive (archive_directory unless
+    archive_dir is given). Returns the number archived.
+
+    The archive is written (and fsynced) before the goals leave state, so
+    a crash in between can only duplicate records, never lose them;
+    queries de-duplicate by goal_id.
+    """
+    now = now or datetime.now()
+    goals = archivable_goals(state, now)
+    if not goals:
+        return 0
+
+    goal_ids = {g["goal_id"] for g in goals}
+    plans_by_goal = {}
+    for plan in state.get("plans", []):
+        if plan.get("goal_id") in goal_ids:
+            plans_by_goal.setdefault(plan["goal_id"], []).append(plan)
+
+    archived_at = now.isoformat()
+    append_records([
+        {"goal": goal, "plans": plans_by_goal.get(goal["goal_id"], []), "archived_at": archived_at}
+        for goal in goals
+    ], archive_dir or archive_directory(state))
+
+    registry.remove_goals(state, goal_ids)
+    add_to_rollups(state, goals)
+
+    missions = state.get("missions", {})
+    for mission_id, mission_goal_ids in missions.items():
+        kept = [g for g in mission_goal_ids if g not in goal_ids]
+        if len(kept) != len(mission_goal_ids):
+            missions[mission_id] = kept
+            mark_dirty(state, "missions", mission_id)
+
+    log(f"[ARCHIVE] Archived {len(goals)} goals")
+    return len(goals)
+
+
+# ======================================================
+# QUERY API
+# ======================================================
+
+def iter_archive(archive_dir=ARCHIVE_DIR, since=None, until=None):
+    """
+    Yields archived records, skipping segments outside [since, until]
+    (ISO timestamps compared on goal updated_at).
+    """
+    seen = set()
+    for segment in load_manifest(archive_dir)["segments"]:
+        if since and segment["last_updated_at"] and segment["last_updated_at"] < since:
+            continue
+        if until and segment["first_updated_at"] and segment["first_updated_at"] > until:
+            continue
+
+        path = os.path.join(archive_dir, segment["name"])
+        try:
+            file = gzip.open(path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            continue
+
+        with file:
+            try:
+                for line in file:
+                    record = json.loads(line)
+                    goal_id = record["goal"]["goal_id"]
+                    if goal_id in seen:
+                        continue
+                    seen.add(goal_id)
+                    yield record
+            except (EOFError, gzip.BadGzipFile, ValueError):
+                # Torn last member from a crash mid-append
+                log(f"[ARCHIVE] Truncated segment {segment['name']}")
+
+
+def query(goal_id=None, status=None, goal_type=None, mission_id=None,
+          since=None, until=None, limit=None, archive_dir=ARCHIVE_DIR):
+    """
+    Archived records matching every given filter, oldest segment first.
+    """
+    results = []
+    for record in iter_archive(archive_dir, since, until):
+        goal = record["goal"]
+        stamp = goal.get("updated_at") or goal.get("created_at") or ""
+        if goal_id and goal["goal_id"] != goal_id:
+            continue
+        if status and goal.get("status") != status:
+            continue
+        if goal_type and goal_type not in (goal.get("type"), goal.get("normalized_type")):
+            continue
+        if mission_id and goal.get("mission_id") != mission_id:
+            continue
+        if since and stamp < since:
+            continue
+        if until and stamp > until:
+            continue
+
+        results.append(record)
+        if limit and len(results) >= limit:
+            break
+    return results
+
+
+def get_goal(goal_id, archive_dir=ARCHIVE_DIR):
+    found = query(goal_id=goal_id, limit=1, archive_dir=archive_dir)
+    return found[0] if found else None
+
+
+if __name__ == "__main__":
+    # python archive.py [status] [limit] [archive dir, e.g. agents/<agent_id>/archive]
+    status = sys.argv[1] if len(sys.argv) > 1 else None
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    archive_dir = sys.argv[3] if len(sys.argv) > 3 else ARCHIVE_DIR
+    for record in query(status=status, limit=limit, archive_dir=archive_dir):
+        goal = record["goal"]
+        print(f"{goal.get('updated_at')}  {goal.get('status'):<9}  {goal['goal_id']}  {goal.get('description')}")
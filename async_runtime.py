@@ -0,0 +1,276 @@
+import asyncio
+import time
+from collections import deque
+
+from logger import log
+from config import (
+    ASYNC_MAX_CONCURRENT_INTENTS,
+    ASYNC_INTENT_TIMEOUT_SECONDS,
+    SCHEDULER_MAX_SLEEP_SECONDS,
+    TASK_MIN_INTERVAL_SECONDS,
+    INTENT_BATCH_BUDGET_MS,
+)
+from batching import drain_queue
+from durable_queue import get_intent_queue
+from backpressure import get_backpressure
+from memory import load_state, save_state
+import scheduler
+import tasks
+import metrics
+from worker_pool import get_pools
+
+
+# ======================================================
+# ASYNC RUNTIME
+# ======================================================
+
+class AsyncRuntime:
+    """
+    asyncio flavour of run_all_tasks + intent_executor_task.
+
+    - Every write to state happens on the loop thread: sync tasks and
+      inline sync actions (cheap by definition) run there directly,
+      coroutine tasks and actions are awaited there, and "thread" /
+      "process" targets run in the shared warm worker pools on a scratch
+      state whose change set is merged on the loop thread. Plugin actions
+      without a declared target go to the thread pool; an inline sync
+      action cannot be timed out, so it is flagged once and on overruns.
+    - Intents are leased from the durable queue (fairly across priorities) as
+      long as there are free slots (max_concurrent) and run concurrently,
+      each under its own timeout (ActionSpec.timeout_seconds or
+      intent_timeout). An attempt that cannot be interrupted keeps its
+      slot and lease until it stops; only then is its step retried.
+    - Action outcomes (step completed / retry / failed) are applied on the
+      loop thread at the start of the next pass, never in the middle of a
+      task, so plan bookkeeping stays single-threaded.
+    """
+
+    def __init__(self, agent, missions, max_concurrent=ASYNC_MAX_CONCURRENT_INTENTS,
+                 intent_timeout=ASYNC_INTENT_TIMEOUT_SECONDS):
+        self.agent = agent
+        self.missions = missions
+        self.max_concurrent = max_concurrent
+        self.intent_timeout = intent_timeout
+
+        self.in_flight = set()
+        self.running_keys = set()    # idempotency keys of in-flight intents
+        self.blocking_flagged = set()  # inline sync actions already warned about
+        self.outcomes = deque()
+        self.wakeup = None
+        self.state = None
+
+        # intent_executor keeps its registry slot (priority, pause/disable,
+        # cooldown) but dispatches instead of running one intent inline
+        self.task_overrides = {"intent_executor": self.dispatch_intents}
+
+    # ---------- MAIN LOOP ----------
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        scheduler.add_wake_callback(lambda: loop.call_soon_threadsafe(self.wakeup.set))
+
+        log(f"[ASYNC] Runtime started. Max concurrent intents: {self.max_concurrent}")
+
+        while True:
+            delay = await self.tick()
+
+            if delay is None:
+                delay = SCHEDULER_MAX_SLEEP_SECONDS
+            delay = min(max(delay, 0), SCHEDULER_MAX_SLEEP_SECONDS)
+
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            self.wakeup.clear()
+
+    async def tick(self):
+        tick_started = time.perf_counter()
+        state = load_state()
+        self.state = state
+        now = time.time()
+
+        self.apply_outcomes(state)
+
+        timers, mono_now = tasks.begin_tick(state, self.agent)
+
+        if tasks.is_globally_paused(state):
+            log("[CONTROL] Global pause is ON. Skipping all tasks.")
+            save_state(state)
+            return TASK_MIN_INTERVAL_SECONDS
+
+        for spec in timers.pop_due(mono_now):
+            if tasks.should_skip_task(state, timers, spec, mono_now):
+                continue
+
+            started = time.perf_counter()
+            try:
+                await self.run_task(state, spec)
+                metrics.record_task(spec.name, time.perf_counter() - started)
+                tasks.record_task_success(state, timers, spec, now, mono_now)
+
+            except Exception as e:
+                metrics.record_task(spec.name, time.perf_counter() - started, failed=True)
+                tasks.record_task_failure(state, timers, spec, now, mono_now, e)
+
+        save_state(state)
+
+        depths = tasks.queue_depths(state)
+        depths["action_pool"] = len(self.in_flight)
+        metrics.record_tick(time.perf_counter() - tick_started, depths)
+
+        return timers.next_delay(time.monotonic())
+
+    async def run_task(self, state, spec):
+        override = self.task_overrides.get(spec.name)
+        if override is None:
+            call, is_async = spec.call, spec.is_async
+        else:
+            call, is_async = spec.adapt(override), asyncio.iscoroutinefunction(override)
+
+        if is_async:
+            await call(state, self.agent)
+        else:
+            call(state, self.agent)
+
+    # ---------- INTENTS ----------
+
+    async def dispatch_intents(self, state):
+        intent_queue = get_intent_queue(state)
+        for intent in intent_queue.redeliver_expired(running=self.running_keys):
+            tasks.fail_intent(state, intent, TimeoutError(f"Lease expired {intent_queue.max_deliveries} times"))
+
+        free_slots = self.max_concurrent - len(self.in_flight)
+        if free_slots <= 0:
+            return
+
+        throttled = []
+        throttled_actions = set()
+
+        def launch(intent):
+            # One rate-limited intent holds back the rest of its action this pass
+            if intent.get("action") in throttled_actions or not self.launch_intent(state, intent):
+                throttled.append(intent)
+                throttled_actions.add(intent.get("action"))
+
+        drain_queue(
+            state,
+            "intent_queue",
+            intent_queue,
+            launch,
+            free_slots,
+            INTENT_BATCH_BUDGET_MS,
+        )
+
+        # Rate-limited intents give their lease back for a later pass
+        for intent in throttled:
+            intent_queue.release(intent)
+        if throttled:
+            scheduler.notify("intent")
+
+    def launch_intent(self, state, intent):
+        if tasks.intent_already_done(state, intent):
+            get_intent_queue(state).ack(intent)
+            return True
+
+        if not tasks.intent_allowed(intent, state):
+            get_intent_queue(state).ack(intent)
+            return True
+
+        entry = tasks.resolve_action(intent.get("action"))
+        if not get_backpressure(state).allow_action(entry):
+            return False
+
+        log("[INTENT] Executing action: %s", intent.get("action"), step_id=intent.get("plan_step_id"))
+
+        job = asyncio.create_task(self.run_intent(intent, entry, state))
+        self.running_keys.add(intent["idempotency_key"])
+        self.in_flight.add(job)
+        job.add_done_callback(self.in_flight.discard)
+        return True
+
+    async def run_intent(self, intent, entry, state):
+        action_name = intent.get("action")
+        payload = intent.get("payload", {})
+        timeout = entry.timeout_seconds or self.intent_timeout
+        started = time.perf_counter()
+        future = None
+
+        try:
+            if entry.target != "inline":
+                # Shielded: a timeout must not drop our handle on the worker
+                future = get_pools().submit(entry, action_name, payload, state)
+                changes = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            else:
+                if asyncio.iscoroutinefunction(entry.fn):
+                    # Cancelled at its next await on timeout
+                    await asyncio.wait_for(entry.fn(payload, state), timeout)
+                else:
+                    self.run_blocking(entry, payload, state, timeout)
+                metrics.record_action(action_name, time.perf_counter() - started)
+                changes = None
+            self.outcomes.append((intent, changes, None))
+
+        except asyncio.TimeoutError:
+            metrics.record_action(action_name, time.perf_counter() - started, failed=True)
+            if future is not None and not future.cancel():
+                # Already running in a worker, which cannot be interrupted:
+                # hold the slot until it stops so the retry never overlaps it
+                log(
+                    "[INTENT] Action %s exceeded %ss, waiting for the running attempt",
+                    action_name, timeout, level="WARNING", step_id=intent.get("plan_step_id"),
+                )
+                await asyncio.wait({asyncio.wrap_future(future)})
+            self.outcomes.append((
+                intent,
+                None,
+                TimeoutError(f"Action '{action_name}' exceeded {timeout}s"),
+            ))
+
+        except Exception as e:
+            metrics.record_action(action_name, time.perf_counter() - started, failed=True)
+            self.outcomes.append((intent, None, e))
+
+        finally:
+            self.running_keys.discard(intent["idempotency_key"])
+
+        # Free slot + outcome to record: run the dispatcher again
+        scheduler.notify("intent")
+
+    def run_blocking(self, entry, payload, state, timeout):
+        """
+        Inline sync action: runs on the loop thread, which nothing can
+        interrupt, so the loop stalls for as long as it takes.
+        """
+        if entry.timeout_seconds is None and entry.name not in self.blocking_flagged:
+            self.blocking_flagged.add(entry.name)
+            log(
+                "[ASYNC] Action %s is sync and inline with no timeout_seconds; it blocks "
+                "the event loop while it runs (declare target \"thread\" to move it off)",
+                entry.name, level="WARNING",
+            )
+
+        started = time.perf_counter()
+        entry.fn(payload, state)
+        seconds = time.perf_counter() - started
+        if seconds > timeout:
+            log(
+                "[ASYNC] Action %s blocked the event loop for %.1fs (timeout %ss)",
+                entry.name, seconds, timeout, level="WARNING",
+            )
+
+    def apply_outcomes(self, state):
+        while self.outcomes:
+            intent, changes, error = self.outcomes.popleft()
+            if changes is not None:
+                tasks.apply_intent_result(state, intent, changes, error)
+            elif error is None:
+                tasks.complete_intent(state, intent)
+            else:
+                tasks.fail_intent(state, intent, error)
+
+
+def run_async(agent, missions):
+    asyncio.run(AsyncRuntime(agent, missions).run())
@@ -0,0 +1,264 @@
+import time
+
+from logger import log
+from config import (
+    EVENT_RATE_LIMITS,
+    MISSION_GOAL_RATE_LIMITS,
+    ACTION_RATE_LIMITS,
+    ACTION_COST_TOKENS,
+    BACKPRESSURE_WATERMARKS,
+    BACKPRESSURE_SHED_MIN_PRIORITY,
+)
+from priority_queue import DEFAULT_PRIORITY
+from state_store import get_attachment, set_attachment
+import scheduler
+
+
+# ======================================================
+# TOKEN BUCKETS
+# ======================================================
+
+class TokenBucket:
+    """
+    `rate` tokens per second, holding at most `burst`.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, cost=1, now=None, peek=False):
+        """
+        Spend cost tokens if there are enough; with peek, only report
+        whether there are.
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+        # Anything dearer than the burst still passes on a full bucket
+        cost = min(cost, self.burst)
+        if self.tokens < cost:
+            return False
+        if not peek:
+            self.tokens -= cost
+        return True
+
+
+UNLIMITED = object()
+
+
+class RateLimiter:
+    """
+    One TokenBucket per key from limits {key: (per second, burst)}; "*"
+    covers keys not listed, and a key without a limit is never throttled.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits or {}
+        self.buckets = {}
+        self.throttled = {}    # key -> denied takes
+
+    def allow(self, key, cost=1, now=None, peek=False):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            limit = self.limits.get(key, self.limits.get("*"))
+            bucket = self.buckets[key] = UNLIMITED if limit is None else TokenBucket(*limit)
+
+        if bucket is UNLIMITED or bucket.take(cost, now, peek):
+            return True
+
+        self.throttled[key] = self.throttled.get(key, 0) + 1
+        return False
+
+
+# ======================================================
+# WATERMARKS
+# ======================================================
+
+class Watermark:
+    """
+    Engaged once the depth reaches `high`, released once it is back down
+    to `low` (the gap keeps it from flapping).
+    """
+
+    __slots__ = ("name", "high", "low", "depth", "engaged", "engagements")
+
+    def __init__(self, name, high, low):
+        self.name = name
+        self.high = high
+        self.low = low
+        self.depth = 0
+        self.engaged = False
+        self.engagements = 0
+
+    def update(self, depth):
+        """
+        True when this depth engages the mark, False when it releases it,
+        else None.
+        """
+        self.depth = depth
+        if not self.engaged and depth >= self.high:
+            self.engaged = True
+            self.engagements += 1
+            return True
+        if self.engaged and depth <= self.low:
+            self.engaged = False
+            return False
+        return None
+
+
+# Watermark -> (what engaging it does, trigger re-armed on release)
+EFFECTS = {
+    "event_queue": ("pausing the listener, shedding low-priority events", "watch"),
+    "pending_goals": ("events wait in the event queue", "event"),
+    "intent_queue": ("pausing plan dispatch", "plan"),
+}
+
+
+# ======================================================
+# BACKPRESSURE
+# ======================================================
+
+class Backpressure:
+    """
+    Rate limits and watermarks of one state (agent). Each stage slows
+    the one feeding it:
+
+        intent_queue high   → plan_executor dispatches no new steps
+        pending_goals high  → event_handler leaves events queued, where
+                              they coalesce by EVENT_DEDUP_KEY
+        event_queue high    → event_listener stops polling (changes
+                              coalesce in the watcher) and new events of
+                              priority >= BACKPRESSURE_SHED_MIN_PRIORITY
+                              are shed
+
+    Token buckets cap events handled per type, goals created per mission
+    and intents started per action (an action takes ACTION_COST_TOKENS of
+    its cost class); throttled work is put back and retried.
+    """
+
+    def __init__(self):
+        self.events = RateLimiter(EVENT_RATE_LIMITS)
+        self.missions = RateLimiter(MISSION_GOAL_RATE_LIMITS)
+        self.actions = RateLimiter(ACTION_RATE_LIMITS)
+        self.marks = {
+            name: Watermark(name, high, low)
+            for name, (high, low) in BACKPRESSURE_WATERMARKS.items()
+        }
+        self.shed = {}    # event type -> events dropped at intake
+
+    def engaged(self, name):
+        mark = self.marks.get(name)
+        return mark is not None and mark.engaged
+
+    def update(self, depths):
+        """
+        Move the watermarks to the current depths (every pass; the
+        event_queue mark also on intake).
+        """
+        for name, mark in self.marks.items():
+            depth = depths.get(name)
+            if depth is None:
+                continue
+
+            change = mark.update(depth)
+            effect, trigger = EFFECTS.get(name, ("", None))
+            if change:
+                log(
+                    "[BACKPRESSURE] %s at %d (high %d): %s",
+                    name, depth, mark.high, effect, level="WARNING",
+                )
+            elif change is False:
+                log("[BACKPRESSURE] %s down to %d (low %d): released", name, depth, mark.low)
+                if trigger:
+                    scheduler.notify(trigger)
+
+    # ---------- STAGES ----------
+
+    def listener_paused(self):
+        return self.engaged("event_queue")
+
+    def shed_event(self, event, depth):
+        """
+        True (and counted) when a new event is dropped at intake. depth is
+        the event queue's, so a flood inside one poll engages the mark
+        without waiting for the next pass.
+        """
+        self.update({"event_queue": depth})
+        if not self.engaged("event_queue"):
+            return False
+        if event.get("priority", DEFAULT_PRIORITY) < BACKPRESSURE_SHED_MIN_PRIORITY:
+            return False
+
+        event_type = event["type"]
+        self.shed[event_type] = self.shed.get(event_type, 0) + 1
+        log("[BACKPRESSURE] Shed %s event", event_type, level="DEBUG")
+        return True
+
+    def events_paused(self):
+        return self.engaged("pending_goals")
+
+    def event_allowed(self, event):
+        """
+        Whether the event's type has a token left (nothing is spent).
+        """
+        return self.events.allow(event["type"], peek=True)
+
+    def admit_event(self, event, goals):
+        """
+        Spend the tokens of an event and of the goals it creates (one per
+        goal from its mission's bucket), all or nothing.
+        """
+        per_mission = {}
+        for goal in goals:
+            per_mission[goal.mission_id] = per_mission.get(goal.mission_id, 0) + 1
+
+        if not self.event_allowed(event):
+            return False
+        for mission_id, count in per_mission.items():
+            if not self.missions.allow(mission_id, count, peek=True):
+                return False
+
+        self.events.allow(event["type"])
+        for mission_id, count in per_mission.items():
+            self.missions.allow(mission_id, count)
+        return True
+
+    def plans_paused(self):
+        return self.engaged("intent_queue")
+
+    def allow_action(self, entry):
+        return self.actions.allow(entry.name, ACTION_COST_TOKENS.get(entry.cost, 1))
+
+    # ---------- REPORT ----------
+
+    def report_lines(self):
+        lines = ["Backpressure: " + ", ".join(
+            f"{mark.name} {mark.depth}/{mark.high}{' ENGAGED' if mark.engaged else ''}"
+            for mark in self.marks.values()
+        )]
+
+        engagements = {m.name: m.engagements for m in self.marks.values() if m.engagements}
+        if engagements:
+            lines.append(f"Watermarks engaged (times): {engagements}")
+
+        for label, limiter in (("events", self.events), ("missions", self.missions), ("actions", self.actions)):
+            if limiter.throttled:
+                lines.append(f"Throttled {label}: {limiter.throttled}")
+
+        if self.shed:
+            lines.append(f"Shed events: {self.shed}")
+        return lines
+
+
+def get_backpressure(state):
+    pressure = get_attachment(state, "backpressure")
+    if pressure is None:
+        pressure = Backpressure()
+        set_attachment(state, "backpressure", pressure)
+    return pressure
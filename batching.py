@@ -0,0 +1,93 @@
+import time
+
+
+# ======================================================
+# BATCH DRAINING
+# ======================================================
+
+DEFAULT_PRIORITY = 10
+
+
+def item_priority(item):
+    return item.get("priority", DEFAULT_PRIORITY)
+
+
+def drain_queue(state, queue_key, queue, handle, max_items, budget_ms, priority_of=item_priority):
+    """
+    Take up to max_items from a queue object exposing pop_fair() and len()
+    (e.g. PriorityEventQueue, DurableIntentQueue), or stop once budget_ms
+    of handling time is spent, and call handle(item) for each one. Items
+    are removed only as they are handled, so a raising handler leaves the
+    rest queued. Returns the number of items handled.
+    """
+    if not queue:
+        return 0
+
+    return _drain(
+        state, queue_key, queue.pop_fair(), lambda: len(queue),
+        handle, max_items, budget_ms, priority_of,
+    )
+
+
+def _drain(state, queue_key, items, finish, handle, max_items, budget_ms, priority_of):
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+    handled = 0
+    per_priority = {}
+    budget_hit = False
+
+    try:
+        while handled < max_items:
+            if time.perf_counter() >= deadline:
+                budget_hit = True
+                break
+
+            item = next(items, None)
+            if item is None:
+                break
+
+            handled += 1
+            priority = priority_of(item)
+            per_priority[priority] = per_priority.get(priority, 0) + 1
+
+            handle(item)
+
+    finally:
+        backlog = finish()
+        record_batch(
+            state, queue_key, handled, time.perf_counter() - started,
+            backlog, budget_hit, per_priority,
+        )
+
+    return handled
+
+
+# ======================================================
+# METRICS
+# ======================================================
+
+def record_batch(state, queue_key, items, seconds, backlog, budget_hit, per_priority):
+    metrics = state.get("batch_metrics", {})
+    m = metrics.get(queue_key, {
+        "batches": 0,
+        "items": 0,
+        "budget_hits": 0,
+        "max_items": 0,
+        "max_ms": 0.0,
+    })
+
+    elapsed_ms = round(seconds * 1000, 3)
+
+    m["batches"] += 1
+    m["items"] += items
+    m["budget_hits"] += 1 if budget_hit else 0
+    m["max_items"] = max(m["max_items"], items)
+    m["max_ms"] = max(m["max_ms"], elapsed_ms)
+    m["last_items"] = items
+    m["last_ms"] = elapsed_ms
+    m["last_backlog"] = backlog
+    m["last_by_priority"] = {str(p): n for p, n in sorted(per_priority.items())}
+    m["avg_items"] = round(m["items"] / m["batches"], 2)
+
+    metrics[queue_key] = m
+    state["batch_metrics"] = metrics
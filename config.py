@@ -1,4 +1,135 @@
 # config.py
+import os
 
 AGENT_NAME = "Life Operations Agent"
 LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# ---------- LOGGING ----------
+LOG_LEVEL = "INFO"                  # DEBUG | INFO | WARNING | ERROR
+LOG_CONSOLE_FORMAT = "text"         # text | json
+LOG_FILE = "agent_log.jsonl"        # JSON-lines copy of every record (None = off)
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+LOG_ASYNC = True                    # write from a background thread
+LOG_BUFFER_SIZE = 10000             # records held before LOG_OVERFLOW applies
+LOG_OVERFLOW = "drop_oldest"        # drop_oldest | drop_new | block
+
+# ---------- STATE STORE ----------
+STATE_BACKEND = "json"         # json (snapshot + journal) | sqlite (indexed tables, see sqlite_store.py)
+MEMORY_FILE = "agent_state.json"
+JOURNAL_FILE = "agent_state.journal"
+STATE_DB_FILE = "agent_state.db"   # sqlite backend; migrated from MEMORY_FILE on first use
+STATE_COMPACT_EVERY = 200      # journal batches before folding into a snapshot
+STATE_FSYNC = True
+
+# ---------- DURABLE INTENT QUEUE (see durable_queue.py) ----------
+INTENT_QUEUE_DIR = "intent_queue"               # segment directory, next to the state files
+INTENT_QUEUE_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+INTENT_QUEUE_GROUP_COMMIT_MAX = 1000            # buffered records that force an early fsync
+INTENT_LEASE_SECONDS = 300                      # undelivered outcome after this = redeliver
+INTENT_MAX_DELIVERIES = 5                       # then the intent is failed (dead letter)
+
+# ---------- SCHEDULER ----------
+TASK_MIN_INTERVAL_SECONDS = 5     # periodic floor (the old fixed tick)
+SCHEDULER_MAX_SLEEP_SECONDS = 5   # upper bound on a single idle wait
+
+# ---------- RUNTIME MODE ----------
+RUNTIME_MODE = "sync"                # sync | async | sharded (many agents, see runtime.py)
+ASYNC_MAX_CONCURRENT_INTENTS = 8     # intents in flight at once (async mode)
+ASYNC_INTENT_TIMEOUT_SECONDS = 60    # per-intent deadline (async mode; pool actions in every mode)
+
+# ---------- MULTI-AGENT RUNTIME (RUNTIME_MODE = "sharded") ----------
+RUNTIME_SHARDS = os.cpu_count() or 1    # shard processes; each hosts a share of the agents
+RUNTIME_AGENTS_FILE = "agents.json"     # agent specs, re-read when it changes (None = only the built-in agent)
+RUNTIME_AGENTS_POLL_SECONDS = 2         # how often the supervisor checks RUNTIME_AGENTS_FILE
+RUNTIME_DRAIN_SECONDS = 10              # wait for a removed agent's in-flight actions
+RUNTIME_SHARD_MAX_RESTARTS = 5          # crashed shard restarts before the runtime gives up
+AGENT_STATE_DIR = "agents"              # per-agent state: agents/<agent_id>/agent_state.json + journal
+
+# ---------- BATCH DRAINING (per task run) ----------
+EVENT_BATCH_MAX_ITEMS = 50
+EVENT_BATCH_BUDGET_MS = 250
+INTENT_BATCH_MAX_ITEMS = 25
+INTENT_BATCH_BUDGET_MS = 500
+
+# ---------- EVENT QUEUE ----------
+EVENT_DEDUP_KEY = "type+file"    # type | type+file | callable(event) -> key
+
+# ---------- BACKPRESSURE (see backpressure.py) ----------
+# Rate limits are {key: (per second, burst)}; "*" = keys not listed, no limit = unthrottled
+EVENT_RATE_LIMITS = {"*": (5, 50)}              # events handled per event type
+MISSION_GOAL_RATE_LIMITS = {"*": (2, 20)}       # goals created per mission (None = goals without one)
+ACTION_RATE_LIMITS = {"*": (20, 40)}            # tokens per action, spent on each intent started
+ACTION_COST_TOKENS = {"low": 1, "medium": 2, "high": 4}   # tokens by the action's cost class
+BACKPRESSURE_WATERMARKS = {                     # (high, low): engaged at >= high, released at <= low
+    "event_queue": (1000, 200),                 # pause the listener, shed low-priority events
+    "pending_goals": (2000, 500),               # leave events queued (coalesced by dedup key)
+    "intent_queue": (500, 100),                 # pause plan dispatch
+}
+BACKPRESSURE_SHED_MIN_PRIORITY = 10             # event_queue high: shed new events with priority >= this
+                                                # (watcher events have the default 10; lower = more urgent)
+
+# ---------- FILE WATCHER ----------
+WATCH_GLOBS = ["event_trigger.txt"]     # e.g. "repos/**/*.py"
+WATCH_BACKEND = "auto"                  # auto | inotify | polling
+WATCH_COALESCE_MS = 200                 # quiet period before a burst is reported
+WATCH_POLL_MAX_DIRS = 500               # directories stat'ed per polling pass (0 = all)
+WATCH_IGNORE_DIRS = [".git", "__pycache__", "node_modules", ".venv", "venv"]
+
+# ---------- FILE FINGERPRINTS ----------
+FINGERPRINT_CHUNK_BYTES = 1024 * 1024
+FINGERPRINT_MMAP_THRESHOLD = 64 * 1024 * 1024   # hash via mmap at or above this size
+
+# ---------- FILE ANALYSIS ----------
+ANALYZER_BLOCK_BYTES = 1024 * 1024           # unit of incremental re-analysis
+ANALYZER_AST_MAX_BYTES = 8 * 1024 * 1024     # skip AST metrics above this
+ANALYSIS_CACHE_MAX = 256                     # results kept by content hash
+
+# ---------- ACTION WORKERS ----------
+ACTION_THREAD_WORKERS = 4                                   # target "thread"
+ACTION_PROCESS_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # target "process"
+ACTION_PROCESS_START_METHOD = "forkserver"                  # fork | forkserver | spawn
+
+# ---------- ACTION PLUGINS (see action_plugins.py) ----------
+ACTION_PLUGIN_DIRS = ["plugins"]                     # *.json manifests; modules imported on first dispatch
+ACTION_PLUGIN_ENTRY_POINT_GROUP = "life_agent.actions"  # entry points loading to a manifest dict
+ACTION_COLD_START_BUDGET_MS = 500                    # python action_plugins.py bench fails above this
+
+# ---------- POLICIES ----------
+# Compiled per agent from Agent.bound_policies and allowed_action_categories;
+# every bound policy must allow an intent (allow-lists intersect, windows
+# and gates add up)
+POLICIES = {
+    "default": {
+        "allow_categories": ["analysis", "reporting"],    # action categories (manifest metadata); None = any
+        "allow_actions": None,                            # explicit action names on top; None = any
+        "deny_windows": [(0, 6)],                         # local hours [start, end), may wrap midnight
+        "health_gate": True,                              # deny while any task is disabled
+        "pause_gate": True,                               # deny during global_pause
+    },
+}
+
+# ---------- GOAL SCORING ----------
+GOAL_SCORERS = []                   # extra factors on the base score: "age_decay", "mission_weight"
+GOAL_AGE_HALF_LIFE_HOURS = 24       # age_decay: score halves every N hours
+GOAL_MISSION_WEIGHTS = {}           # mission_weight: {mission_id: factor}
+
+# ---------- GOAL CONCURRENCY ----------
+MAX_ACTIVE_GOALS_PER_AGENT = 4      # goals an agent runs at once
+MAX_ACTIVE_GOALS_PER_MISSION = 4    # per mission (goals without a mission are only agent-limited)
+PLAN_SCHEDULING = "score"           # order plans get dispatched in: score | round_robin
+PLAN_DISPATCH_MAX_STEPS = 50        # steps started per plan_executor run, across all plans
+
+# ---------- ARCHIVE ----------
+ARCHIVE_DIR = "archive"                       # next to the state files (agents/<agent_id>/archive when sharded)
+ARCHIVE_AFTER_HOURS = 72                      # completed/failed goals older than this leave hot state
+ARCHIVE_BATCH_MAX = 500                       # goals moved per archival run
+ARCHIVE_SEGMENT_MAX_BYTES = 8 * 1024 * 1024   # start a new segment past this size
+
+# ---------- METRICS ----------
+METRICS_ENABLED = True
+METRICS_EXPORT_INTERVAL_SECONDS = 15      # how often the files below are rewritten
+METRICS_PROM_FILE = "agent_metrics.prom"  # Prometheus text format (None = off)
+METRICS_JSON_FILE = "agent_metrics.json"  # same data as JSON (None = off)
+METRICS_HTTP_PORT = None                  # e.g. 9108 → http://127.0.0.1:9108/metrics
+METRICS_TICK_BUDGET_MS = 1000             # slower passes count as overruns
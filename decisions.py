@@ -1,19 +1,8 @@
+import time
 from datetime import datetime
 from logger import log
 from goal import Goal
-
-
-def is_quiet_hours():
-    hour = datetime.now().hour
-    return 0 <= hour < 6
-
-
-
-def system_unhealthy(state):
-    return any(
-        key.startswith("disabled_") and value
-        for key, value in state.items()
-    )
+import policy_engine
 
 
 def decide_intents(event, state, agent):
@@ -24,11 +13,12 @@ def decide_intents(event, state, agent):
     intents = []
     goals = []
 
-    if is_quiet_hours():
+    # Same compiled windows / cached health flag the intent policy uses
+    if policy_engine.policy_for(agent).in_quiet_hours():
         log("[DECISION] Quiet hours active. Deferring non-critical actions.")
         return intents, goals
 
-    if system_unhealthy(state):
+    if not policy_engine.is_healthy(state):
         log("[DECISION] System unhealthy. Limiting actions.")
         return intents, goals
 
@@ -49,7 +39,7 @@ def decide_intents(event, state, agent):
             type="analyze_file",
             description=f"Analyze changes in {event['file']}",
             status="pending",
-            created_at=datetime.now().isoformat(),
+            created_at=time.time(),
             owner_agent_id=agent.agent_id,
             related_intent=intent
         )
@@ -59,6 +49,4 @@ def decide_intents(event, state, agent):
 
         goals.append(goal)
 
-        log(f"[GOAL CREATED] {goal.description}")
-
     return intents, goals
\ No newline at end of file
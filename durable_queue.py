@@ -0,0 +1,443 @@
+import json
+import os
+import time
+from collections import deque
+
+from logger import log
+from config import (
+    INTENT_QUEUE_DIR,
+    INTENT_QUEUE_SEGMENT_MAX_BYTES,
+    INTENT_QUEUE_GROUP_COMMIT_MAX,
+    INTENT_LEASE_SECONDS,
+    INTENT_MAX_DELIVERIES,
+    STATE_FSYNC,
+)
+from batching import item_priority
+from memory import register_save_hook, register_commit_hook
+from state_store import get_attachment, set_attachment
+import registry
+
+
+# ======================================================
+# IDEMPOTENCY KEYS
+# ======================================================
+
+def idempotency_key(intent, entry_id):
+    """
+    One key per attempt at a plan step, so a redelivered copy of the same
+    attempt is recognised while a retry (next attempt) is not.
+    """
+    plan_step_id = intent.get("plan_step_id")
+    if plan_step_id:
+        return f"{plan_step_id}#{intent.get('attempt', 0)}"
+    return f"intent#{entry_id}"
+
+
+# ======================================================
+# DURABLE INTENT QUEUE
+# ======================================================
+#
+# Segmented append-only log of JSON lines:
+#     {"e": id, "i": intent}   enqueued
+#     {"l": id, "u": until}    leased (delivered) until epoch `until`
+#     {"r": id}                lease released, ready again
+#     {"a": id}                acked (done, failed for good, or dead)
+#
+# Records are buffered and written with one fsync per flush (group
+# commit): once per tick from the save hook, or early when
+# INTENT_QUEUE_GROUP_COMMIT_MAX records pile up. Acks are only written
+# after the agent state is committed, so a crash can cause a redelivery
+# but never lose an intent whose outcome was not saved.
+
+class Entry:
+    __slots__ = ("intent", "segment", "lease_until", "deliveries")
+
+    def __init__(self, intent, segment):
+        self.intent = intent
+        self.segment = segment
+        self.lease_until = None
+        self.deliveries = 0
+
+
+class DurableIntentQueue:
+    """
+    At-least-once intent queue: pop_fair() leases intents, ack() settles
+    them, and leases that expire (or belonged to a crashed run) are
+    redelivered. Used from the tick thread only.
+    """
+
+    def __init__(self, directory, fsync=STATE_FSYNC, lease_seconds=INTENT_LEASE_SECONDS,
+                 max_deliveries=INTENT_MAX_DELIVERIES,
+                 segment_max_bytes=INTENT_QUEUE_SEGMENT_MAX_BYTES,
+                 group_commit_max=INTENT_QUEUE_GROUP_COMMIT_MAX):
+        self.directory = directory
+        self.fsync = fsync
+        self.lease_seconds = lease_seconds
+        self.max_deliveries = max_deliveries
+        self.segment_max_bytes = segment_max_bytes
+        self.group_commit_max = group_commit_max
+
+        self.entries = {}        # id -> Entry (ready or leased)
+        self.keys = {}           # idempotency key -> id
+        self.levels = {}         # priority -> deque of ready ids
+        self.ready_count = 0
+        self.live = {}           # segment number -> live entries
+        self.segments = []       # segment numbers, oldest first
+        self.next_id = 1
+
+        self.buffer = []         # encoded enqueue / lease / release records
+        self.ack_buffer = []     # encoded acks, written after the state commit
+        self.file = None
+        self.file_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.recover()
+
+    def __len__(self):
+        return self.ready_count
+
+    def __bool__(self):
+        return self.ready_count > 0
+
+    def leased(self):
+        return len(self.entries) - self.ready_count
+
+    # ---------- PRODUCER ----------
+
+    def put(self, intent):
+        """
+        Enqueue an intent. Returns False when one with the same
+        idempotency key is already queued or in flight.
+        """
+        entry_id = self.next_id
+        key = intent.get("idempotency_key") or idempotency_key(intent, entry_id)
+        if key in self.keys:
+            return False
+
+        self.next_id += 1
+        intent["idempotency_key"] = key
+        self.entries[entry_id] = Entry(intent, self.current_segment())
+        self.keys[key] = entry_id
+        self.live[self.current_segment()] += 1
+        self.make_ready(entry_id)
+        self.append({"e": entry_id, "i": intent})
+        return True
+
+    # ---------- CONSUMER ----------
+
+    def pop_fair(self):
+        """
+        Generator leasing ready intents in weighted round-robin over the
+        priorities (most urgent gets the most slots); an intent is only
+        leased as it is yielded.
+        """
+        while self.ready_count:
+            ordered = sorted(p for p, level in self.levels.items() if level)
+            for weight, priority in zip(range(len(ordered), 0, -1), ordered):
+                level = self.levels[priority]
+                for _ in range(min(weight, len(level))):
+                    entry_id = level.popleft()
+                    self.ready_count -= 1
+                    yield self.lease(entry_id)
+
+    def lease(self, entry_id, now=None):
+        entry = self.entries[entry_id]
+        entry.lease_until = (now or time.time()) + self.lease_seconds
+        entry.deliveries += 1
+        self.append({"l": entry_id, "u": round(entry.lease_until, 3)})
+        return entry.intent
+
+    def ack(self, intent):
+        """
+        Settle a delivered intent (whatever its outcome). Idempotent.
+        """
+        entry_id = self.keys.pop(intent.get("idempotency_key"), None)
+        if entry_id is None:
+            return
+        entry = self.entries.pop(entry_id)
+        if entry.lease_until is None:
+            self.discard_ready(entry_id, entry)
+        self.live[entry.segment] -= 1
+        self.ack_buffer.append(encode({"a": entry_id}))
+
+    def release(self, intent):
+        """
+        Put a leased intent back (e.g. it could not be started).
+        """
+        entry_id = self.keys.get(intent.get("idempotency_key"))
+        entry = self.entries.get(entry_id)
+        if entry is None or entry.lease_until is None:
+            return
+        entry.lease_until = None
+        self.make_ready(entry_id)
+        self.append({"r": entry_id})
+
+    def redeliver_expired(self, now=None, running=()):
+        """
+        Make intents whose lease ran out ready again. Returns the intents
+        that have now been delivered max_deliveries times; the caller
+        fails and acks them (dead letters).
+
+        running: idempotency keys this process is still executing; their
+        leases are extended instead, so a slow attempt never overlaps its
+        own redelivery. (Not logged: recovery voids every lease anyway.)
+        """
+        now = now or time.time()
+        dead = []
+        for entry_id, entry in self.entries.items():
+            if entry.lease_until is None or entry.lease_until > now:
+                continue
+            if entry.intent.get("idempotency_key") in running:
+                entry.lease_until = now + self.lease_seconds
+                continue
+            if entry.deliveries >= self.max_deliveries:
+                dead.append(entry.intent)
+                continue
+            log(
+                "[QUEUE] Lease expired, redelivering %s", entry.intent.get("action"),
+                level="WARNING", step_id=entry.intent.get("plan_step_id"),
+            )
+            entry.lease_until = None
+            self.make_ready(entry_id)
+            self.append({"r": entry_id})
+        return dead
+
+    def make_ready(self, entry_id):
+        priority = item_priority(self.entries[entry_id].intent)
+        level = self.levels.get(priority)
+        if level is None:
+            level = self.levels[priority] = deque()
+        level.append(entry_id)
+        self.ready_count += 1
+
+    def discard_ready(self, entry_id, entry):
+        level = self.levels.get(item_priority(entry.intent))
+        if level is not None and entry_id in level:
+            level.remove(entry_id)
+            self.ready_count -= 1
+
+    def live_keys(self):
+        return self.keys.keys()
+
+    # ---------- LOG ----------
+
+    def append(self, record):
+        self.buffer.append(encode(record))
+        if len(self.buffer) >= self.group_commit_max:
+            self.flush(acks=False)
+
+    def flush(self, acks=True):
+        """
+        Write buffered records with a single fsync. acks=False holds the
+        acks back until the agent state that justifies them is committed.
+        """
+        lines = self.buffer
+        self.buffer = []
+        if acks:
+            lines += self.ack_buffer
+            self.ack_buffer = []
+        if not lines:
+            return
+
+        data = b"".join(lines)
+        self.file.write(data)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.file_bytes += len(data)
+
+        if acks:
+            self.drop_settled_segments()
+        if self.file_bytes >= self.segment_max_bytes:
+            self.roll()
+
+    def current_segment(self):
+        return self.segments[-1]
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"segment_{number:06d}.log")
+
+    def roll(self):
+        if self.file is not None:
+            self.file.close()
+        number = self.segments[-1] + 1 if self.segments else 1
+        self.segments.append(number)
+        self.live[number] = 0
+        self.file = open(self.segment_path(number), "ab")
+        self.file_bytes = self.file.tell()
+
+    def drop_settled_segments(self):
+        # Only a settled prefix goes: later segments may still hold the
+        # acks of entries logged in earlier ones, never the reverse
+        while len(self.segments) > 1 and not self.live[self.segments[0]]:
+            number = self.segments.pop(0)
+            del self.live[number]
+            try:
+                os.remove(self.segment_path(number))
+            except FileNotFoundError:
+                pass
+
+    def recover(self):
+        """
+        Replay every segment. Leases held by the previous run are void
+        (that process is gone), so those intents are ready again.
+        """
+        numbers = sorted(
+            int(name[len("segment_"):-len(".log")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment_") and name.endswith(".log")
+        )
+
+        for number in numbers:
+            self.segments.append(number)
+            self.live[number] = 0
+            path = self.segment_path(number)
+            valid_bytes = 0
+
+            with open(path, "rb") as file:
+                for raw in file:
+                    try:
+                        if not raw.endswith(b"\n"):
+                            raise ValueError("unterminated record")
+                        record = json.loads(raw)
+                    except ValueError:
+                        log(f"[QUEUE] Ignoring torn record in {path}")
+                        break
+                    self.replay(record, number)
+                    valid_bytes += len(raw)
+
+            if valid_bytes != os.path.getsize(path):
+                with open(path, "r+b") as file:
+                    file.truncate(valid_bytes)
+
+        redelivered = 0
+        for entry_id, entry in self.entries.items():
+            if entry.lease_until is not None:
+                entry.lease_until = None
+                redelivered += 1
+            self.make_ready(entry_id)
+
+        if self.segments:
+            self.file = open(self.segment_path(self.segments[-1]), "ab")
+            self.file_bytes = self.file.tell()
+        else:
+            self.roll()
+
+        if self.entries:
+            log(f"[QUEUE] Recovered {len(self.entries)} intents ({redelivered} redelivered)")
+        self.drop_settled_segments()
+
+    def replay(self, record, number):
+        if "e" in record:
+            entry_id = record["e"]
+            intent = record["i"]
+            self.entries[entry_id] = Entry(intent, number)
+            self.keys[intent["idempotency_key"]] = entry_id
+            self.live[number] += 1
+            self.next_id = max(self.next_id, entry_id + 1)
+            return
+
+        entry_id = record.get("l") or record.get("r") or record.get("a")
+        entry = self.entries.get(entry_id)
+        if entry is None:
+            return   # settled in a segment that has been dropped
+        if "l" in record:
+            entry.lease_until = record["u"]
+            entry.deliveries += 1
+        elif "r" in record:
+            entry.lease_until = None
+        else:
+            del self.entries[entry_id]
+            self.keys.pop(entry.intent["idempotency_key"], None)
+            self.live[entry.segment] -= 1
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def encode(record):
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+# ======================================================
+# STATE BINDING
+# ======================================================
+
+def queue_directory(state):
+    store = get_attachment(state, "state_store")
+    base = getattr(store, "directory", None) or "."
+    return os.path.join(base, INTENT_QUEUE_DIR)
+
+
+def get_intent_queue(state):
+    """
+    The durable intent queue of this state, opened (recovered, migrated
+    from state["intent_queue"] and reconciled) on first use.
+    """
+    queue = get_attachment(state, "intent_queue")
+    if queue is None:
+        queue = DurableIntentQueue(queue_directory(state))
+        set_attachment(state, "intent_queue", queue)
+
+        legacy = state.pop("intent_queue", None) or []
+        for intent in legacy:
+            queue.put(intent)
+        if legacy:
+            log(f"[QUEUE] Moved {len(legacy)} intents from state into the durable queue")
+
+        reconcile(state, queue)
+    return queue
+
+
+def reconcile(state, queue):
+    """
+    A step is in_progress only while an intent for it is queued or in
+    flight. Steps left in_progress without one (their dispatch never
+    reached the log, or its outcome was never saved) go back to pending
+    so the plan executor dispatches them again.
+    """
+    live = set(queue.live_keys())
+    reset = 0
+    for plan in list(registry.plans_with_status(state, "active")):
+        for step in plan["steps"]:
+            if step["status"] != "in_progress":
+                continue
+            key = f"{step['step_id']}#{step.get('retry_count', 0)}"
+            if key not in live:
+                registry.set_step_status(state, plan, step, "pending")
+                reset += 1
+    if reset:
+        log(f"[QUEUE] Reconciled {reset} in-progress steps without an intent", level="WARNING")
+
+
+def close_intent_queue(state):
+    queue = get_attachment(state, "intent_queue")
+    if queue is not None:
+        queue.close()
+        set_attachment(state, "intent_queue", None)
+
+
+def flush_enqueued(state):
+    """
+    Save hook: new intents and leases reach disk before the state that
+    refers to them.
+    """
+    queue = get_attachment(state, "intent_queue")
+    if queue is not None:
+        queue.flush(acks=False)
+
+
+def flush_acks(state):
+    """
+    Commit hook: acks only once the outcomes they settle are saved.
+    """
+    queue = get_attachment(state, "intent_queue")
+    if queue is not None:
+        queue.flush()
+
+
+register_save_hook(flush_enqueued)
+register_commit_hook(flush_acks)
@@ -1,47 +1,109 @@
 import os
 from logger import log
+import scheduler
+from config import (
+    WATCH_GLOBS,
+    WATCH_BACKEND,
+    WATCH_COALESCE_MS,
+    WATCH_POLL_MAX_DIRS,
+    WATCH_IGNORE_DIRS,
+)
+from priority_queue import get_event_queue
+from backpressure import get_backpressure
+from state_store import get_attachment, set_attachment
+from watcher import FileWatcher
+from fingerprint import content_changed, seed_fingerprints
 
 WATCH_FILE = "event_trigger.txt"
 
-def detect_file_event(state):
+_watcher = None
+
+
+def make_watcher(globs):
+    return FileWatcher(
+        globs,
+        backend=WATCH_BACKEND,
+        coalesce_ms=WATCH_COALESCE_MS,
+        poll_max_dirs=WATCH_POLL_MAX_DIRS,
+        ignore_dirs=WATCH_IGNORE_DIRS,
+    )
+
+
+def get_watcher(state=None):
     """
-    Detects changes in a watched file and records an event.
+    The state's own watcher (see set_watch_globs), else the shared one
+    over WATCH_GLOBS.
     """
-    if not os.path.exists(WATCH_FILE):
-        return
+    global _watcher
+    if state is not None:
+        watcher = get_attachment(state, "file_watcher")
+        if watcher is not None:
+            return watcher
 
-    last_mtime = state.get("watch_file_mtime")
-    current_mtime = os.path.getmtime(WATCH_FILE)
+    if _watcher is None:
+        _watcher = make_watcher(WATCH_GLOBS)
+    return _watcher
 
-    if last_mtime is None:
-        state["watch_file_mtime"] = current_mtime
-        return
 
-    if current_mtime != last_mtime:
-        log("[EVENT] File change detected")
-        state["watch_file_mtime"] = current_mtime
-        enqueue_event(state, {
-            "type": "file_changed",
-            "file": WATCH_FILE
-        })
+def set_watch_globs(state, globs):
+    """
+    Give this state (one agent of the multi-agent runtime) its own watcher.
+    """
+    close_watcher(state)
+    set_attachment(state, "file_watcher", make_watcher(globs))
+
 
-def enqueue_event(state, event):
+def close_watcher(state):
+    watcher = get_attachment(state, "file_watcher")
+    if watcher is not None:
+        watcher.close()
+        set_attachment(state, "file_watcher", None)
+
+
+def detect_file_event(state):
     """
-    Adds an event to the queue with deduplication and priority handling.
+    Detects changes in watched files and records one event per changed path.
     """
-    queue = state.get("event_queue", [])
+    # Carry over the baseline of the old single-file watcher
+    legacy_mtime = state.pop("watch_file_mtime", None)
+    if legacy_mtime is not None and "watch_mtimes" not in state and os.path.exists(WATCH_FILE):
+        state["watch_mtimes"] = {WATCH_FILE: [int(legacy_mtime * 1e9), os.path.getsize(WATCH_FILE)]}
+
+    watcher = get_watcher(state)
+    for path in watcher.poll(state):
+        # mtime moved but bytes identical (touch, checkout, re-save) → no event
+        if not content_changed(state, path):
+            log(f"[EVENT] Unchanged content, ignoring: {path}")
+            continue
+
+        emit_file_event(state, path)
+
+    # Once per run: fingerprint the baseline (first start, or files known
+    # from before fingerprints existed) so a later touch is recognised
+    if not get_attachment(state, "fingerprints_seeded"):
+        seeded = seed_fingerprints(state, list(state.get("watch_mtimes", {})))
+        if seeded:
+            log(f"[EVENT] Fingerprinted {seeded} baseline files")
+        set_attachment(state, "fingerprints_seeded", True)
 
-    # Deduplicate: skip if same type already queued
-    for existing in queue:
-        if existing["type"] == event["type"]:
-            return
 
-    # Default priority (lower = higher priority)
-    event.setdefault("priority", 10)
+def emit_file_event(state, path):
+    log(f"[EVENT] File change detected: {path}")
+    enqueue_event(state, {
+        "type": "file_changed",
+        "file": path
+    })
 
-    queue.append(event)
 
-    # Sort queue by priority
-    queue.sort(key=lambda e: e["priority"])
+def enqueue_event(state, event):
+    """
+    Adds an event to the queue with deduplication and priority handling.
+    """
+    queue = get_event_queue(state)
+    if get_backpressure(state).shed_event(event, len(queue)):
+        return
 
-    state["event_queue"] = queue
+    # Dedup (EVENT_DEDUP_KEY) and priority order (lower = higher priority,
+    # default 10, FIFO within a priority) live in the queue structure
+    if queue.push(event):
+        scheduler.notify("event")
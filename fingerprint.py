@@ -0,0 +1,117 @@
+import hashlib
+import mmap
+import os
+
+from config import FINGERPRINT_CHUNK_BYTES, FINGERPRINT_MMAP_THRESHOLD, ANALYZER_BLOCK_BYTES
+from state_store import mark_dirty, mark_removed
+
+
+# ======================================================
+# CONTENT HASHING
+# ======================================================
+
+def hash_file(path, block_size=None):
+    """
+    blake2b of the file contents without loading it whole: mmap for large
+    files, fixed-size buffered reads otherwise.
+
+    With block_size, returns (content_hash, block_hashes): the blake2b-128
+    of every block_size block as well, from the same read (the analyzer
+    uses them to re-read only changed blocks).
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    step = block_size or FINGERPRINT_CHUNK_BYTES
+    block_hashes = []
+
+    def update(data):
+        digest.update(data)
+        if block_size:
+            block_hashes.append(hashlib.blake2b(data, digest_size=16).hexdigest())
+
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+
+        if size >= FINGERPRINT_MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for offset in range(0, size, step):
+                    update(view[offset:offset + step])
+        else:
+            buffer = bytearray(step)
+            chunk = memoryview(buffer)
+            while True:
+                n = file.readinto(buffer)
+                if not n:
+                    break
+                update(chunk[:n])
+
+    if block_size:
+        return digest.hexdigest(), block_hashes
+    return digest.hexdigest()
+
+
+# ======================================================
+# FINGERPRINT CACHE
+# ======================================================
+
+def cheap_key(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def get_fingerprint(state, path):
+    """
+    Stored [size, mtime_ns, inode, content_hash, block_hashes] for path
+    (block_hashes per ANALYZER_BLOCK_BYTES block), or None.
+    """
+    return state.get("file_fingerprints", {}).get(path)
+
+
+def content_changed(state, path):
+    """
+    True when the file's content differs from the last fingerprint. The
+    file is only hashed when size, mtime_ns or inode moved; touch /
+    checkout / identical saves end up False. A file without a fingerprint
+    counts as changed: the watcher only reports it when it is new or its
+    stored signature moved (e.g. edited while the agent was down).
+    """
+    cache = state.setdefault("file_fingerprints", {})
+    previous = cache.get(path)
+
+    try:
+        key = cheap_key(os.stat(path))
+    except OSError:
+        if cache.pop(path, None) is not None:
+            mark_removed(state, "file_fingerprints", path)
+        return False
+
+    if previous and previous[:3] == key:
+        return False
+
+    try:
+        content_hash, block_hashes = hash_file(path, ANALYZER_BLOCK_BYTES)
+    except OSError:
+        return False
+
+    cache[path] = key + [content_hash, block_hashes]
+    mark_dirty(state, "file_fingerprints", path)
+
+    return previous is None or previous[3] != content_hash
+
+
+def seed_fingerprints(state, paths):
+    """
+    Fingerprint the paths that have none yet (e.g. the watcher's baseline),
+    so their first touch compares against real content. Returns the count.
+    """
+    cache = state.setdefault("file_fingerprints", {})
+    seeded = 0
+    for path in paths:
+        if path in cache:
+            continue
+        try:
+            key = cheap_key(os.stat(path))
+            cache[path] = key + list(hash_file(path, ANALYZER_BLOCK_BYTES))
+        except OSError:
+            continue
+        mark_dirty(state, "file_fingerprints", path)
+        seeded += 1
+    return seeded
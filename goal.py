@@ -1,15 +1,25 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
-from datetime import datetime
 
+from records import Record
 
-@dataclass
-class Goal:
+
+@dataclass(slots=True)
+class Goal(Record):
     goal_id: str
     type: str
     description: str
     status: str                 # pending | active | completed | failed
-    created_at: str
+    created_at: float           # epoch (ISO string in JSON)
     owner_agent_id: str         # NEW
     related_intent: Optional[dict] = None
-    updated_at: Optional[str] = None
+    updated_at: Optional[float] = None
+    mission_id: Optional[str] = None
+    activated_at: Optional[float] = None
+    timeout_seconds: Optional[int] = None
+    score: Optional[float] = None
+    priority_weight: Optional[float] = None
+    normalized_type: Optional[str] = None
+    extra: dict = field(default_factory=dict)
+
+    TIMESTAMPS = ("created_at", "updated_at", "activated_at")
@@ -1,30 +1,22 @@
 from logger import log
+import scoring
 
 
 def select_active_goal(state):
 
-    goals = state.get("goals", [])
+    # Several goals can be active at once (see tasks.activate_next_goal);
+    # older states also stored a single "active_goal_id", now dropped
+    state.pop("active_goal_id", None)
 
-    if not goals:
-        return
+    # Best open goal straight from the ranker heap; only goals whose
+    # status/type changed since the last pass get rescored first
+    ranker = scoring.get_ranker(state)
+    ranker.refresh(state)
 
-    best_goal = None
-    best_score = -1
-
-    for g in goals:
-
-        if g.get("status") in ["completed", "failed"]:
-            continue
-
-        score = g.get("score", 0)
-
-        if score > best_score:
-            best_score = score
-            best_goal = g
+    best_goal, best_score = ranker.best()
 
     if best_goal:
-        state["active_goal_id"] = best_goal["goal_id"]
-
         log(
-            f"[GOAL SELECTED] {best_goal.get('description')} score={best_score}"
+            "[GOAL SELECTED] %s score=%s", best_goal.get("description"), best_score,
+            goal_id=best_goal["goal_id"],
         )
\ No newline at end of file
@@ -1,6 +1,315 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
 from datetime import datetime
-from config import LOG_TIME_FORMAT
 
-def log(message):
-    timestamp = datetime.now().strftime(LOG_TIME_FORMAT)
-    print(f"[{timestamp}] {message}")
+from config import (
+    LOG_TIME_FORMAT,
+    LOG_LEVEL,
+    LOG_CONSOLE_FORMAT,
+    LOG_FILE,
+    LOG_FILE_MAX_BYTES,
+    LOG_FILE_BACKUPS,
+    LOG_BUFFER_SIZE,
+    LOG_OVERFLOW,
+    LOG_ASYNC,
+)
+
+
+# ======================================================
+# LEVELS
+# ======================================================
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+_min_level = LEVELS[LOG_LEVEL]
+
+
+def set_level(level):
+    global _min_level
+    _min_level = LEVELS[level]
+
+
+def enabled(level):
+    return LEVELS[level] >= _min_level
+
+
+# ======================================================
+# FORMATTING (writer side)
+# ======================================================
+
+_ts_cache = (None, "")   # (whole second, formatted) — one strftime per second
+
+
+def format_time(ts):
+    global _ts_cache
+    second = int(ts)
+    cached_second, text = _ts_cache
+    if cached_second != second:
+        text = datetime.fromtimestamp(second).strftime(LOG_TIME_FORMAT)
+        _ts_cache = (second, text)
+    return text
+
+
+def render_message(record):
+    _, _, message, args, _, _ = record
+    if args:
+        try:
+            return message % args
+        except (TypeError, ValueError):
+            return f"{message} {args!r}"
+    return message
+
+
+def render_exception(error):
+    return "".join(traceback.format_exception(type(error), error, error.__traceback__))
+
+
+def to_text(record):
+    ts, level, _, _, fields, error = record
+    line = f"[{format_time(ts)}] "
+    if level != "INFO":
+        line += f"{level} "
+    line += render_message(record)
+    if fields:
+        line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+    if error is not None:
+        line += "\n" + render_exception(error).rstrip("\n")
+    return line + "\n"
+
+
+def to_json(record):
+    ts, level, _, _, fields, error = record
+    data = {
+        "ts": datetime.fromtimestamp(ts).isoformat(timespec="milliseconds"),
+        "level": level,
+        "msg": render_message(record),
+    }
+    if fields:
+        data.update(fields)
+    if error is not None:
+        data["exc"] = render_exception(error)
+    return json.dumps(data, default=str) + "\n"
+
+
+# ======================================================
+# SINKS
+# ======================================================
+
+class RotatingFile:
+    """
+    Append-only JSON-lines file rotated by size:
+    agent_log.jsonl → .1 → .2 ... up to `backups` files.
+    """
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+
+    def write(self, text):
+        if self.max_bytes and self.size and self.size + len(text) > self.max_bytes:
+            self.rotate()
+        self.file.write(text)
+        self.size += len(text)
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = 0
+
+    def flush(self):
+        self.file.flush()
+
+
+def write_records(records, file_sink):
+    console = "".join(
+        (to_json if LOG_CONSOLE_FORMAT == "json" else to_text)(r) for r in records
+    )
+    if console:
+        sys.stdout.write(console)
+        sys.stdout.flush()
+
+    if file_sink is not None:
+        for record in records:
+            file_sink.write(to_json(record))
+        file_sink.flush()
+
+
+# ======================================================
+# BACKGROUND WRITER
+# ======================================================
+
+class LogWriter:
+    """
+    Bounded ring buffer drained by a daemon thread. Callers only append a
+    tuple; timestamps, %-formatting, tracebacks and I/O happen on the
+    writer thread, one write per batch.
+
+    When the buffer is full, LOG_OVERFLOW decides: "drop_oldest",
+    "drop_new", or "block" (caller waits for room — backpressure).
+    """
+
+    def __init__(self, capacity=LOG_BUFFER_SIZE, overflow=LOG_OVERFLOW):
+        self.capacity = capacity
+        self.overflow = overflow
+        self.buffer = deque()
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.cond = threading.Condition()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.file_sink = RotatingFile(_log_file, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS) if _log_file else None
+
+        thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        thread.start()
+
+    def put(self, record):
+        with self.cond:
+            if len(self.buffer) >= self.capacity:
+                if self.overflow == "block":
+                    while len(self.buffer) >= self.capacity:
+                        self.cond.wait()
+                elif self.overflow == "drop_new":
+                    self.dropped += 1
+                    return
+                else:
+                    self.buffer.popleft()
+                    self.dropped += 1
+
+            self.buffer.append(record)
+            self.idle.clear()
+            self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.buffer:
+                    self.idle.set()
+                    self.cond.wait()
+                records = list(self.buffer)
+                self.buffer.clear()
+                dropped = self.dropped - self.reported_dropped
+                self.reported_dropped = self.dropped
+                self.cond.notify_all()
+
+            if dropped:
+                records.append((
+                    time.time(), "WARNING", "[LOG] Dropped %d records (buffer full)",
+                    (dropped,), None, None,
+                ))
+
+            try:
+                write_records(records, self.file_sink)
+            except Exception:
+                # Logging must never take the agent down
+                pass
+
+    def flush(self, timeout=5.0):
+        with self.cond:
+            self.cond.notify_all()
+        self.idle.wait(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+_log_file = LOG_FILE
+# Set in pool worker processes (see use_sync_writes)
+_sync_writes = False
+
+
+def _reset_after_fork():
+    # The writer thread does not survive a fork; the child starts its own
+    global _writer
+    _writer = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def use_sync_writes():
+    """
+    Write straight to stdout, without the writer thread or LOG_FILE: for
+    action pool workers, whose atexit hooks may not run.
+    """
+    global _sync_writes
+    _sync_writes = True
+
+
+def set_log_file(path):
+    """
+    Send this process's JSON-lines copy to path (e.g. one file per shard,
+    so processes never rotate the same file). Call before logging.
+    """
+    global _log_file
+    _log_file = path
+    if _writer is not None:
+        with _writer.cond:
+            if _writer.file_sink is not None:
+                _writer.file_sink.file.close()
+            _writer.file_sink = RotatingFile(path, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS) if path else None
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = LogWriter()
+                atexit.register(_writer.flush)
+    return _writer
+
+
+# ======================================================
+# PUBLIC API
+# ======================================================
+
+def log(message, *args, level="INFO", **fields):
+    """
+    log("[TAG] text") keeps working as before. Extras are lazy:
+    log("[PLAN] Step %s", step_id, step_id=step_id, level="DEBUG")
+    only %-formats on the writer thread, and only if the level is enabled.
+    """
+    if LEVELS[level] < _min_level:
+        return
+    _emit((time.time(), level, message, args, fields, None))
+
+
+def log_exception(message, error, *args, level="ERROR", **fields):
+    """
+    Like log(), with the traceback of `error` rendered by the writer.
+    """
+    if LEVELS[level] < _min_level:
+        return
+    _emit((time.time(), level, message, args, fields, error))
+
+
+def _emit(record):
+    if LOG_ASYNC and not _sync_writes:
+        get_writer().put(record)
+    else:
+        write_records([record], None)
+
+
+def dropped_count():
+    return _writer.dropped if _writer else 0
+
+
+def flush():
+    if _writer is not None:
+        _writer.flush()
@@ -1,9 +1,11 @@
 from logger import log
-from config import AGENT_NAME
-from scheduler import run_every
+from config import AGENT_NAME, SCHEDULER_MAX_SLEEP_SECONDS, RUNTIME_MODE
+from scheduler import run_event_driven
 from tasks import run_all_tasks
 from agent import Agent
 from mission import Mission
+import metrics
+from worker_pool import get_pools
 
 
 # =========================
@@ -37,7 +39,27 @@ SYSTEM_MISSIONS = [
 
 def start_agent():
     log(f"{AGENT_NAME} started")
-    run_every(5, lambda: run_all_tasks(SYSTEM_AGENT, SYSTEM_MISSIONS))
+    metrics.start_http_server()
+
+    try:
+        if RUNTIME_MODE == "async":
+            from async_runtime import run_async
+            run_async(SYSTEM_AGENT, SYSTEM_MISSIONS)
+            return
+
+        if RUNTIME_MODE == "sharded":
+            # Each shard shuts down its own pools
+            from runtime import run_sharded
+            run_sharded(SYSTEM_AGENT, SYSTEM_MISSIONS)
+            return
+
+        run_event_driven(
+            lambda: run_all_tasks(SYSTEM_AGENT, SYSTEM_MISSIONS),
+            SCHEDULER_MAX_SLEEP_SECONDS,
+        )
+    finally:
+        # Queued actions are cancelled; running ones finish first
+        get_pools().shutdown(wait=True)
 
 
 if __name__ == "__main__":
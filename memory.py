@@ -1,15 +1,122 @@
-import json
 import os
+import time
 
-MEMORY_FILE = "agent_state.json"
+from logger import log
+from config import (
+    MEMORY_FILE,
+    JOURNAL_FILE,
+    STATE_BACKEND,
+    STATE_DB_FILE,
+    STATE_COMPACT_EVERY,
+    STATE_FSYNC,
+    AGENT_STATE_DIR,
+)
+from state_store import JournaledStateStore, mark_dirty, mark_removed, get_attachment, set_attachment
+import metrics
 
-def load_state():
-    if not os.path.exists(MEMORY_FILE):
-        return {}
 
-    with open(MEMORY_FILE, "r") as file:
-        return json.load(file)
+def make_store(directory="."):
+    """
+    A store for the state files in directory, per STATE_BACKEND.
+    """
+    if STATE_BACKEND == "sqlite":
+        import sqlite_store
+
+        db_path = os.path.join(directory, STATE_DB_FILE)
+        if not os.path.exists(db_path) and sqlite_store.has_legacy_state(directory):
+            sqlite_store.migrate(directory)
+        return sqlite_store.SqliteStateStore(db_path, fsync=STATE_FSYNC)
+
+    if STATE_BACKEND != "json":
+        log(f"[STATE] Unknown STATE_BACKEND {STATE_BACKEND!r}; using json", level="WARNING")
+
+    return JournaledStateStore(
+        os.path.join(directory, MEMORY_FILE),
+        os.path.join(directory, JOURNAL_FILE),
+        compact_every=STATE_COMPACT_EVERY,
+        fsync=STATE_FSYNC,
+    )
+
+
+# State is held in memory across ticks; only changed keys hit disk.
+_store = None
+
+# Per-agent partitions (multi-agent runtime): agent_id -> store
+_partitions = {}
+
+# Called with the state right before each commit (flush in-memory structures)
+_save_hooks = []
+
+# Called with the state right after each commit (work that must follow it)
+_commit_hooks = []
+
+
+def register_save_hook(hook):
+    if hook not in _save_hooks:
+        _save_hooks.append(hook)
+
+
+def register_commit_hook(hook):
+    if hook not in _commit_hooks:
+        _commit_hooks.append(hook)
+
+
+def get_store(partition=None):
+    """
+    The default store, or the one under AGENT_STATE_DIR/<partition>/.
+    """
+    global _store
+    if partition is None:
+        if _store is None:
+            _store = make_store()
+        return _store
+
+    store = _partitions.get(partition)
+    if store is None:
+        directory = os.path.join(AGENT_STATE_DIR, partition)
+        os.makedirs(directory, exist_ok=True)
+        store = _partitions[partition] = make_store(directory)
+    return store
+
+
+def load_state(partition=None):
+    started = time.perf_counter()
+    store = get_store(partition)
+    state = store.load()
+    set_attachment(state, "state_store", store)
+    metrics.record_state_io("load", time.perf_counter() - started)
+    return state
+
+
+def close_state(partition):
+    """
+    Forget a partition's in-memory state (after its final save).
+    """
+    store = _partitions.pop(partition, None)
+    if store is not None:
+        store.close()
+
+
+def read_state():
+    """
+    Read-only copy of the persisted state (safe while the agent runs).
+    """
+    if STATE_BACKEND == "sqlite":
+        import sqlite_store
+        return sqlite_store.SqliteStateStore(STATE_DB_FILE).load(read_only=True)
+    return JournaledStateStore(MEMORY_FILE, JOURNAL_FILE).load(read_only=True)
+
 
 def save_state(state):
-    with open(MEMORY_FILE, "w") as file:
-        json.dump(state, file, indent=4)
+    started = time.perf_counter()
+    store = get_attachment(state, "state_store") or get_store()
+    for hook in _save_hooks:
+        hook(state)
+    store.commit(state)
+    for hook in _commit_hooks:
+        hook(state)
+    metrics.record_state_io("save", time.perf_counter() - started, store.last_commit_bytes)
+
+
+def compact_state():
+    get_store().compact()
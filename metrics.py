@@ -0,0 +1,359 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logger import log
+from config import (
+    METRICS_ENABLED,
+    METRICS_EXPORT_INTERVAL_SECONDS,
+    METRICS_PROM_FILE,
+    METRICS_JSON_FILE,
+    METRICS_HTTP_PORT,
+    METRICS_TICK_BUDGET_MS,
+    MEMORY_FILE,
+    JOURNAL_FILE,
+)
+
+
+# ======================================================
+# INSTRUMENTS
+# ======================================================
+
+# Upper bounds in seconds (+Inf implied): 0.5ms .. 60s
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Upper bounds in bytes: 256B .. 64MiB
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram: observe() is one bisect and a few additions.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th observation
+        (the max for the overflow bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+# Process-local, not part of agent state: metrics are never journaled
+_histograms = {}   # (name, labels) -> Histogram
+_counters = {}     # (name, labels) -> number
+_gauges = {}       # (name, labels) -> number
+_lock = threading.Lock()
+_last_export = 0.0
+
+HELP = {
+    "agent_task_duration_seconds": "Run time of each scheduler task",
+    "agent_action_duration_seconds": "Run time of each action",
+    "agent_tick_duration_seconds": "Run time of a full scheduler pass",
+    "agent_tick_overruns_total": "Scheduler passes slower than METRICS_TICK_BUDGET_MS",
+    "agent_task_failures_total": "Task runs that raised",
+    "agent_action_failures_total": "Actions that raised or timed out",
+    "agent_queue_depth": "Items waiting in a queue at the end of a pass",
+    "agent_state_load_seconds": "Time to load state",
+    "agent_state_save_seconds": "Time to commit state (journal append or snapshot)",
+    "agent_state_commit_bytes": "Bytes written per state commit",
+    "agent_state_file_bytes": "Size of the state snapshot and journal files",
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def inc(name, amount=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+# ======================================================
+# RECORDING HELPERS
+# ======================================================
+
+def record_task(name, seconds, failed=False):
+    observe("agent_task_duration_seconds", seconds, task=name)
+    if failed:
+        inc("agent_task_failures_total", task=name)
+
+
+def record_action(name, seconds, failed=False):
+    if seconds is not None:
+        observe("agent_action_duration_seconds", seconds, action=name)
+    if failed:
+        inc("agent_action_failures_total", action=name)
+
+
+def record_state_io(kind, seconds, nbytes=None):
+    observe(f"agent_state_{kind}_seconds", seconds)
+    if nbytes:
+        observe("agent_state_commit_bytes", nbytes, buckets=SIZE_BUCKETS)
+
+
+def record_tick(seconds, queue_depths):
+    """
+    End of a scheduler pass: tick duration, overruns, queue gauges; exports
+    the files when METRICS_EXPORT_INTERVAL_SECONDS has passed.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    observe("agent_tick_duration_seconds", seconds)
+    inc("agent_tick_overruns_total", 1 if seconds * 1000 > METRICS_TICK_BUDGET_MS else 0)
+    for queue, depth in queue_depths.items():
+        set_gauge("agent_queue_depth", depth, queue=queue)
+
+    maybe_export()
+
+
+# ======================================================
+# EXPORT
+# ======================================================
+
+def snapshot():
+    with _lock:
+        return {
+            "histograms": {
+                key: h.to_dict() | {"buckets": list(h.counts), "bounds": h.bounds}
+                for key, h in _histograms.items()
+            },
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+        }
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def to_prometheus():
+    data = snapshot()
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), h in sorted(data["histograms"].items()):
+        describe(name, "histogram")
+        cumulative = 0
+        for bound, n in zip(list(h["bounds"]) + ["+Inf"], h["buckets"]):
+            cumulative += n
+            lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_label_text(labels)} {h['sum']}")
+        lines.append(f"{name}_count{_label_text(labels)} {h['count']}")
+
+    for (name, labels), value in sorted(data["counters"].items()):
+        describe(name, "counter")
+        lines.append(f"{name}{_label_text(labels)} {value}")
+
+    for (name, labels), value in sorted(data["gauges"].items()):
+        describe(name, "gauge")
+        lines.append(f"{name}{_label_text(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def to_json():
+    data = snapshot()
+
+    def flat(key):
+        name, labels = key
+        return name + _label_text(labels)
+
+    return json.dumps({
+        "generated_at": time.time(),
+        "histograms": {
+            flat(key): {k: v for k, v in h.items() if k not in ("buckets", "bounds")}
+            for key, h in sorted(data["histograms"].items())
+        },
+        "counters": {flat(key): v for key, v in sorted(data["counters"].items())},
+        "gauges": {flat(key): v for key, v in sorted(data["gauges"].items())},
+    }, indent=2)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+def set_export_files(prom_file, json_file):
+    """
+    Redirect the file export (each shard process writes its own files).
+    """
+    global METRICS_PROM_FILE, METRICS_JSON_FILE
+    METRICS_PROM_FILE, METRICS_JSON_FILE = prom_file, json_file
+
+
+def maybe_export(force=False):
+    global _last_export
+
+    now = time.monotonic()
+    if not force and now - _last_export < METRICS_EXPORT_INTERVAL_SECONDS:
+        return
+    _last_export = now
+
+    for kind, path in (("snapshot", MEMORY_FILE), ("journal", JOURNAL_FILE)):
+        try:
+            set_gauge("agent_state_file_bytes", os.path.getsize(path), file=kind)
+        except OSError:
+            pass
+
+    try:
+        if METRICS_PROM_FILE:
+            _write_atomic(METRICS_PROM_FILE, to_prometheus())
+        if METRICS_JSON_FILE:
+            _write_atomic(METRICS_JSON_FILE, to_json())
+    except OSError as e:
+        log(f"[METRICS] Export failed: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=METRICS_HTTP_PORT):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json on localhost.
+    """
+    if not METRICS_ENABLED or not port:
+        return None
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    log(f"[METRICS] Serving http://127.0.0.1:{port}/metrics")
+    return server
+
+
+# ======================================================
+# HEALTH SUMMARY
+# ======================================================
+
+def summary_lines(top=3):
+    """
+    Short human-readable digest for health_report_task.
+    """
+    data = snapshot()
+    hist = data["histograms"]
+    lines = []
+
+    tick = hist.get(("agent_tick_duration_seconds", ()))
+    if tick:
+        overruns = data["counters"].get(("agent_tick_overruns_total", ()), 0)
+        lines.append(
+            f"ticks={tick['count']} p50={tick['p50'] * 1000:.1f}ms "
+            f"p95={tick['p95'] * 1000:.1f}ms max={tick['max'] * 1000:.1f}ms overruns={overruns}"
+        )
+
+    for name, label in (("agent_task_duration_seconds", "tasks"), ("agent_action_duration_seconds", "actions")):
+        rows = [(dict(labels), h) for (n, labels), h in hist.items() if n == name]
+        rows.sort(key=lambda row: row[1]["p95"], reverse=True)
+        if rows:
+            lines.append(f"slowest {label}: " + ", ".join(
+                f"{next(iter(labels.values()))} p95={h['p95'] * 1000:.1f}ms (n={h['count']})"
+                for labels, h in rows[:top]
+            ))
+
+    depths = {dict(labels)["queue"]: v for (n, labels), v in data["gauges"].items() if n == "agent_queue_depth"}
+    if depths:
+        lines.append("queues: " + ", ".join(f"{q}={d}" for q, d in sorted(depths.items())))
+
+    save = hist.get(("agent_state_save_seconds", ()))
+    written = hist.get(("agent_state_commit_bytes", ()))
+    if save:
+        avg_bytes = written["sum"] / written["count"] if written else 0
+        lines.append(
+            f"state save p95={save['p95'] * 1000:.2f}ms avg={avg_bytes:.0f}B/commit"
+        )
+
+    return lines
@@ -1,14 +1,18 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List
-from datetime import datetime
 
+from records import Record
 
-@dataclass
-class Mission:
+
+@dataclass(slots=True)
+class Mission(Record):
     mission_id: str
     name: str
     description: str
     active: bool
-    created_at: str
+    created_at: float   # epoch (ISO string in JSON)
     owned_by_agent_id: str
     goal_ids: List[str]
+    extra: dict = field(default_factory=dict)
+
+    TIMESTAMPS = ("created_at",)
@@ -1,20 +1,29 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional
-from datetime import datetime
 
+from records import Record
 
-@dataclass
-class PlanStep:
+
+@dataclass(slots=True)
+class PlanStep(Record):
     step_id: str
     action: str
     payload: dict
-    status: str  # pending | completed | failed
+    status: str  # pending | in_progress | completed | failed
+    retry_count: int = 0
+    max_retries: int = 2
+    depends_on: Optional[List[str]] = None   # step_ids (None = legacy chain)
+    extra: dict = field(default_factory=dict)
 
 
-@dataclass
-class Plan:
+@dataclass(slots=True)
+class Plan(Record):
     plan_id: str
     goal_id: str
-    created_at: str
+    created_at: float   # epoch (ISO string in JSON)
     steps: List[PlanStep]
     status: str  # pending | active | completed | failed
+    extra: dict = field(default_factory=dict)
+
+    TIMESTAMPS = ("created_at",)
+    NESTED = {"steps": PlanStep}
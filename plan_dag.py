@@ -0,0 +1,67 @@
+# ======================================================
+# PLAN DAG
+# ======================================================
+#
+# A step may list the step_ids it waits for in "depends_on". Plans written
+# before dependencies existed (no step has the key) run as a chain: each
+# step depends on the one before it.
+
+def dependencies(plan):
+    """
+    {step_id: [step_ids it waits for]}
+    """
+    steps = plan.get("steps", [])
+
+    if not any("depends_on" in s for s in steps):
+        return {
+            s["step_id"]: [steps[i - 1]["step_id"]] if i else []
+            for i, s in enumerate(steps)
+        }
+
+    return {s["step_id"]: list(s.get("depends_on", [])) for s in steps}
+
+
+def ready_steps(plan):
+    """
+    Pending steps whose dependencies have all completed, in plan order.
+    """
+    status = {s["step_id"]: s["status"] for s in plan.get("steps", [])}
+    deps = dependencies(plan)
+
+    return [
+        s for s in plan.get("steps", [])
+        if s["status"] == "pending"
+        and all(status.get(d) == "completed" for d in deps[s["step_id"]])
+    ]
+
+
+def is_complete(plan):
+    return all(s["status"] == "completed" for s in plan.get("steps", []))
+
+
+def validate(plan):
+    """
+    Raises ValueError for unknown dependencies or cycles (Kahn's algorithm).
+    """
+    deps = dependencies(plan)
+    waiting = {step_id: len(d) for step_id, d in deps.items()}
+    dependents = {step_id: [] for step_id in deps}
+
+    for step_id, step_deps in deps.items():
+        for dep in step_deps:
+            if dep not in dependents:
+                raise ValueError(f"Step {step_id} depends on unknown step {dep}")
+            dependents[dep].append(step_id)
+
+    ready = [step_id for step_id, n in waiting.items() if n == 0]
+    visited = 0
+    while ready:
+        step_id = ready.pop()
+        visited += 1
+        for child in dependents[step_id]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                ready.append(child)
+
+    if visited != len(deps):
+        raise ValueError(f"Plan {plan.get('plan_id')} has a dependency cycle")
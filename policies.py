@@ -1,19 +1,16 @@
-from datetime import datetime
 from logger import log
+import policy_engine
 
 
 # ---------- GLOBAL POLICY RULES ----------
+# Declared in config.POLICIES, compiled and cached by policy_engine.
 
-def is_quiet_hours():
-    hour = datetime.now().hour
-    return 0 <= hour < 6
+def is_quiet_hours(agent=None):
+    return policy_engine.policy_for(agent).in_quiet_hours()
 
 
 def system_unhealthy(state):
-    return any(
-        key.startswith("disabled_") and value
-        for key, value in state.items()
-    )
+    return not policy_engine.is_healthy(state)
 
 
 def policy_allows_intent(intent, state):
@@ -21,43 +18,24 @@ def policy_allows_intent(intent, state):
     Returns True if intent is allowed, False otherwise.
     Policy decisions are FINAL.
     """
+    reason = policy_engine.policy_for_state(state).check(intent, state)
+    if reason is None:
+        return True
 
-    # 1) Never act during global pause
-    if state.get("global_pause"):
-        log("[POLICY] Global pause active. Intent denied.")
-        return False
+    log_denial(reason, intent)
+    return False
 
-    # 2) No heavy actions during quiet hours
-    if is_quiet_hours():
-        log("[POLICY] Quiet hours. Intent denied.")
-        return False
 
-    # 3) System health gate
-    if system_unhealthy(state):
-        log("[POLICY] System unhealthy. Intent denied.")
-        return False
-
-    # 4) Explicit allow-list (important)
-    allowed_intents = {
-        "analyze_file",
-        "log_result",
-    }
-
-    action_name = intent.get("action")
-
-    if not action_name:
-        log("[POLICY ERROR] Intent missing 'action' field.")
-        return False
-
-    if action_name not in allowed_intents:
-        log(f"[POLICY] Intent '{action_name}' not allowed.")
-        return False
-
-    return True
+def log_denial(reason, intent):
+    message = policy_engine.DENY_REASONS[reason]
+    if reason == "not_allowed":
+        log(message, intent.get("action"))
+    else:
+        log(message)
 
 
 def policy_allows_override(state):
     """
     Human override must be explicit and temporary.
     """
-    return state.get("allow_override", False)
\ No newline at end of file
+    return state.get("allow_override", False)
@@ -0,0 +1,211 @@
+import time
+
+from logger import log
+from config import POLICIES
+from state_store import get_attachment, set_attachment
+from action_plugins import get_registry
+
+
+# ======================================================
+# HEALTH FLAG (cached per state)
+# ======================================================
+#
+# A task is disabled when state["disabled_<task>"] is truthy. The set of
+# disabled tasks is built with one scan when a state is first seen and is
+# then kept current by set_task_disabled, so health checks never scan state.
+
+def disabled_tasks(state):
+    """
+    The (cached) set of disabled task names. Do not mutate.
+    """
+    disabled = get_attachment(state, "disabled_tasks")
+    if disabled is None:
+        disabled = {
+            key[len("disabled_"):]
+            for key, value in state.items()
+            if key.startswith("disabled_") and not key.startswith("disabled_at_") and value
+        }
+        set_attachment(state, "disabled_tasks", disabled)
+    return disabled
+
+
+def set_task_disabled(state, task_name, disabled, now=None):
+    """
+    The only way tasks get disabled / re-enabled; keeps the flag in sync.
+    now (datetime) is required when disabling.
+    """
+    state[f"disabled_{task_name}"] = disabled
+    if disabled:
+        state[f"disabled_at_{task_name}"] = now.isoformat()
+        disabled_tasks(state).add(task_name)
+    else:
+        state.pop(f"disabled_at_{task_name}", None)
+        disabled_tasks(state).discard(task_name)
+
+
+def is_healthy(state):
+    return not disabled_tasks(state)
+
+
+# ======================================================
+# CLOCK (local hour, recomputed once per hour)
+# ======================================================
+
+_hour = (None, 0.0)   # (local hour, epoch when it ends)
+
+
+def current_hour(now_ts=None):
+    global _hour
+    now_ts = time.time() if now_ts is None else now_ts
+    hour, valid_until = _hour
+    if hour is None or now_ts >= valid_until or now_ts < valid_until - 3600:
+        local = time.localtime(now_ts)
+        hour = local.tm_hour
+        valid_until = now_ts - local.tm_min * 60 - local.tm_sec + 3600
+        _hour = (hour, valid_until)
+    return hour
+
+
+# ======================================================
+# COMPILED POLICIES
+# ======================================================
+
+DENY_REASONS = {
+    "paused": "[POLICY] Global pause active. Intent denied.",
+    "quiet_hours": "[POLICY] Quiet hours. Intent denied.",
+    "unhealthy": "[POLICY] System unhealthy. Intent denied.",
+    "missing_action": "[POLICY ERROR] Intent missing 'action' field.",
+    "not_allowed": "[POLICY] Intent '%s' not allowed.",
+    "unknown_policy": "[POLICY ERROR] Unknown policy bound. Intent denied.",
+}
+
+
+def window_hours(start, end):
+    """
+    Local hours in [start, end); wraps past midnight when start > end.
+    """
+    if start <= end:
+        return set(range(start, end))
+    return set(range(start, 24)) | set(range(0, end))
+
+
+class CompiledPolicy:
+    """
+    The bound policies of one agent folded into a single rule set. Every
+    bound policy must allow an intent: allow-lists intersect, deny
+    windows and gates add up.
+
+    Allow-lists are action names: explicit allow_actions, plus the actions
+    whose manifest category is in a policy's allow_categories or in the
+    agent's allowed_action_categories (see action_plugins).
+    """
+
+    def __init__(self, names, categories=None):
+        self.names = tuple(names)
+        self.categories = categories
+        registry = get_registry()
+        self.allowed = registry.allowed_actions(categories)
+        self.quiet_hours = set()
+        self.health_gate = False
+        self.pause_gate = False
+        self.unknown = [name for name in self.names if name not in POLICIES]
+
+        for name in self.names:
+            rules = POLICIES.get(name)
+            if rules is None:
+                continue
+
+            allow = rules.get("allow_actions")
+            if allow is not None:
+                self.allowed &= frozenset(allow)
+
+            allow_categories = rules.get("allow_categories")
+            if allow_categories is not None:
+                self.allowed &= registry.allowed_actions(allow_categories)
+
+            for start, end in rules.get("deny_windows", []):
+                self.quiet_hours |= window_hours(start, end)
+
+            self.health_gate = self.health_gate or rules.get("health_gate", False)
+            self.pause_gate = self.pause_gate or rules.get("pause_gate", False)
+
+        self.quiet_hours = frozenset(self.quiet_hours)
+
+        if self.unknown:
+            log(f"[POLICY ERROR] Unknown policies {self.unknown}; every intent will be denied")
+
+    def in_quiet_hours(self, now_ts=None):
+        return bool(self.quiet_hours) and current_hour(now_ts) in self.quiet_hours
+
+    def gate(self, state, now_ts=None):
+        """
+        Reason the state-wide gates are closed, or None. Same answer for
+        every intent of a batch.
+        """
+        if self.unknown:
+            return "unknown_policy"
+        if self.pause_gate and state.get("global_pause"):
+            return "paused"
+        if self.in_quiet_hours(now_ts):
+            return "quiet_hours"
+        if self.health_gate and disabled_tasks(state):
+            return "unhealthy"
+        return None
+
+    def check(self, intent, state, gate=...):
+        """
+        None when the intent is allowed, else the deny reason.
+        """
+        reason = self.gate(state) if gate is ... else gate
+        if reason:
+            return reason
+
+        action_name = intent.get("action")
+        if not action_name:
+            return "missing_action"
+        if action_name not in self.allowed:
+            return "not_allowed"
+        return None
+
+    def check_batch(self, intents, state):
+        """
+        [reason or None] per intent; the gates are evaluated once.
+        """
+        gate = self.gate(state)
+        return [self.check(intent, state, gate) for intent in intents]
+
+
+_compiled = {}   # (policies, categories, registry version) -> CompiledPolicy
+
+DEFAULT_POLICIES = ("default",)
+
+
+def compile_policies(names, categories=None):
+    names = tuple(names)
+    categories = None if categories is None else tuple(categories)
+    # A re-read action registry recompiles the derived allow-lists
+    key = (names, categories, get_registry().version)
+    policy = _compiled.get(key)
+    if policy is None:
+        policy = _compiled[key] = CompiledPolicy(names, categories)
+    return policy
+
+
+def policy_for(agent=None):
+    """
+    Compiled rules for an agent (its bound_policies and
+    allowed_action_categories), or the default set.
+    """
+    names = getattr(agent, "bound_policies", None) or DEFAULT_POLICIES
+    return compile_policies(names, getattr(agent, "allowed_action_categories", None))
+
+
+def bind_agent(state, agent):
+    """
+    Remember which agent owns this state, for checks that only see state.
+    """
+    set_attachment(state, "policy", policy_for(agent))
+
+
+def policy_for_state(state):
+    return get_attachment(state, "policy") or policy_for(None)
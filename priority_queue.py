@@ -0,0 +1,183 @@
+import heapq
+from collections import deque
+
+from config import EVENT_DEDUP_KEY
+from memory import register_save_hook
+from state_store import get_attachment, set_attachment
+
+
+# ======================================================
+# DEDUP KEYS
+# ======================================================
+
+DEDUP_KEYS = {
+    "type": lambda event: event["type"],
+    "type+file": lambda event: (event["type"], event.get("file")),
+}
+
+
+def resolve_dedup_key(dedup_key):
+    """
+    Accepts a DEDUP_KEYS name or any callable event -> hashable key.
+    """
+    if callable(dedup_key):
+        return dedup_key
+    return DEDUP_KEYS[dedup_key]
+
+
+DEFAULT_PRIORITY = 10
+
+
+# ======================================================
+# PRIORITY EVENT QUEUE
+# ======================================================
+
+class PriorityEventQueue:
+    """
+    Heap of priority levels (lower = more urgent), each level a FIFO deque,
+    plus a dedup-key index of everything queued.
+
+    push / pop are O(log P) for P distinct priorities, dedup is O(1),
+    and order inside a priority is stable (FIFO).
+    """
+
+    def __init__(self, dedup_key=EVENT_DEDUP_KEY):
+        self.key_fn = resolve_dedup_key(dedup_key)
+        self.levels = {}       # priority -> deque of events
+        self.priorities = []   # heap of priorities with a non-empty level
+        self.keys = set()
+        self.size = 0
+        self.dirty = False
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def push(self, event):
+        """
+        Returns False (and drops the event) when an event with the same
+        dedup key is already queued.
+        """
+        key = self.key_fn(event)
+        if key in self.keys:
+            return False
+
+        priority = event.setdefault("priority", DEFAULT_PRIORITY)
+        level = self.levels.get(priority)
+        if level is None:
+            level = self.levels[priority] = deque()
+        if not level:
+            heapq.heappush(self.priorities, priority)
+
+        level.append(event)
+        self.keys.add(key)
+        self.size += 1
+        self.dirty = True
+        return True
+
+    def pop(self, priority=None):
+        """
+        Pop the oldest event of the most urgent (or the given) priority.
+        """
+        if not self.size:
+            return None
+
+        if priority is None:
+            priority = self.priorities[0]
+
+        level = self.levels[priority]
+        event = level.popleft()
+
+        if not level:
+            self.priorities.remove(priority)
+            heapq.heapify(self.priorities)
+
+        self.keys.discard(self.key_fn(event))
+        self.size -= 1
+        self.dirty = True
+        return event
+
+    def pop_fair(self):
+        """
+        Generator popping events in weighted round-robin over the priority
+        levels present when it starts (most urgent gets the most slots).
+        Events are only removed as they are yielded.
+        """
+        ordered = sorted(self.priorities)
+        weights = range(len(ordered), 0, -1)
+
+        while self.size:
+            progressed = False
+            for priority, weight in zip(ordered, weights):
+                for _ in range(weight):
+                    if not self.levels.get(priority):
+                        break
+                    progressed = True
+                    yield self.pop(priority)
+            if not progressed:
+                # Only levels added after we started remain
+                ordered = sorted(self.priorities)
+                weights = range(len(ordered), 0, -1)
+
+    def priority_counts(self):
+        return {p: len(self.levels[p]) for p in sorted(self.priorities)}
+
+    # ---------- SERIALIZATION ----------
+
+    def to_list(self):
+        """
+        Compact persisted form: events in dequeue order (priority, then FIFO).
+        Also what older code expects to find in state["event_queue"].
+        """
+        result = []
+        for priority in sorted(self.priorities):
+            result.extend(self.levels[priority])
+        return result
+
+    @classmethod
+    def from_list(cls, events, dedup_key=EVENT_DEDUP_KEY):
+        queue = cls(dedup_key)
+        for event in events or []:
+            queue.push(event)
+        queue.dirty = False
+        return queue
+
+
+# ======================================================
+# STATE BINDING
+# ======================================================
+
+def get_event_queue(state):
+    """
+    The live event queue for this state. Rebuilt from state["event_queue"]
+    if that list was replaced by someone else since we last wrote it.
+    """
+    bound = get_attachment(state, "event_queue")
+    persisted = state.get("event_queue")
+
+    if bound is None or bound[1] is not persisted:
+        queue = PriorityEventQueue.from_list(persisted)
+        bound = (queue, persisted)
+        set_attachment(state, "event_queue", bound)
+
+    return bound[0]
+
+
+def persist_event_queue(state):
+    """
+    Save hook: write the queue back once per commit, not once per push.
+    """
+    bound = get_attachment(state, "event_queue")
+    if bound is None or not bound[0].dirty:
+        return
+
+    queue = bound[0]
+    persisted = queue.to_list()
+    state["event_queue"] = persisted
+    queue.dirty = False
+    set_attachment(state, "event_queue", (queue, persisted))
+
+
+register_save_hook(persist_event_queue)
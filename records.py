@@ -0,0 +1,185 @@
+import sys
+from datetime import datetime
+from enum import StrEnum
+
+
+# ======================================================
+# STATUSES
+# ======================================================
+
+class Status(StrEnum):
+    """
+    Shared goal / plan / step statuses. Members are str, so they compare,
+    hash and serialize exactly like the plain strings they replace.
+    """
+
+    PENDING = "pending"
+    ACTIVE = "active"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __repr__(self):
+        # Logs and reports print them like the strings they replace
+        return repr(self.value)
+
+
+def to_status(value):
+    try:
+        return Status(value)
+    except ValueError:
+        # Unknown (e.g. newer) statuses survive as interned strings
+        return sys.intern(value) if isinstance(value, str) else value
+
+
+# ======================================================
+# TIMESTAMPS
+# ======================================================
+
+def to_epoch(value):
+    """
+    Epoch float from an epoch or an ISO string (None when missing/invalid).
+    """
+    if value is None or isinstance(value, float):
+        return value
+    if isinstance(value, int):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def to_iso(ts):
+    return None if ts is None else datetime.fromtimestamp(ts).isoformat()
+
+
+def timestamp(record, field):
+    """
+    Epoch of a timestamp field on a Record or a plain (JSON) dict.
+    """
+    if isinstance(record, Record):
+        return getattr(record, field)
+    return to_epoch(record.get(field))
+
+
+# ======================================================
+# RECORD BASE
+# ======================================================
+
+class Record:
+    """
+    Base for the slotted model dataclasses (Goal, Plan, PlanStep, Mission).
+
+    Attributes hold the typed form: timestamps (TIMESTAMPS) as epoch
+    floats, statuses as Status members, NESTED lists as records. Item
+    access (record["x"], .get, "x" in record) keeps working on the JSON
+    form, so timestamps read back as ISO strings there; keys that are not
+    fields live in `extra` and round-trip untouched.
+
+    to_json / from_json are the codec at the persistence boundary.
+    """
+
+    __slots__ = ()
+
+    TIMESTAMPS = ()
+    NESTED = {}      # field -> Record subclass of its list items
+
+    def __post_init__(self):
+        for name in self.TIMESTAMPS:
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, float):
+                setattr(self, name, to_epoch(value))
+        if hasattr(self, "status"):
+            self.status = to_status(self.status)
+
+    # ---------- dict-compatible access ----------
+
+    def __getitem__(self, key):
+        if key in self.__dataclass_fields__ and key != "extra":
+            value = getattr(self, key)
+            return to_iso(value) if key in self.TIMESTAMPS else value
+        try:
+            return self.extra[key]
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in self.__dataclass_fields__ and key != "extra":
+            if key in self.TIMESTAMPS:
+                value = to_epoch(value)
+            elif key == "status":
+                value = to_status(value)
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        if key in self.__dataclass_fields__ and key != "extra":
+            return getattr(self, key) is not None
+        return key in self.extra
+
+    def get(self, key, default=None):
+        # Like `in`, a field left at None counts as absent
+        if key not in self:
+            return default
+        return self[key]
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self.__dataclass_fields__ and key != "extra":
+            value = self[key]
+            setattr(self, key, None)
+            return value
+        return self.extra.pop(key, *default)
+
+    # ---------- JSON codec ----------
+
+    def to_json(self):
+        data = {}
+        for name in self.__dataclass_fields__:
+            if name == "extra":
+                continue
+            value = getattr(self, name)
+            if name in self.TIMESTAMPS:
+                value = to_iso(value)
+            elif name in self.NESTED and value is not None:
+                value = [item.to_json() for item in value]
+            data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        if isinstance(data, cls):
+            return data
+
+        fields = cls.__dataclass_fields__
+        known = {}
+        extra = {}
+        for key, value in data.items():
+            if key in fields and key != "extra":
+                known[key] = value
+            else:
+                extra[key] = value
+
+        for name, item_cls in cls.NESTED.items():
+            if known.get(name) is not None:
+                known[name] = [item_cls.from_json(item) for item in known[name]]
+
+        return cls(**known, extra=extra)
+
+
+def json_default(obj):
+    """
+    json.dump(default=...) hook: records serialize through to_json.
+    """
+    to_json = getattr(obj, "to_json", None)
+    if to_json is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return to_json()
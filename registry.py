@@ -0,0 +1,370 @@
+import time
+
+from state_store import (
+    TrackedState,
+    mark_dirty,
+    mark_removed,
+    get_attachment,
+    set_attachment,
+    register_record_type,
+)
+from records import to_status
+from goal import Goal
+from plan import Plan
+
+# Goals and plans live in state as records (see records.Record)
+register_record_type("goals", Goal.from_json)
+register_record_type("plans", Plan.from_json)
+
+
+# ======================================================
+# GOAL / PLAN / STEP INDEX
+# ======================================================
+
+TERMINAL_GOAL_STATUSES = ("completed", "failed")
+
+
+class StateIndex:
+    """
+    In-memory lookup tables over state["goals"] and state["plans"].
+
+    The lists in state stay the source of truth (they are what gets
+    persisted); the index only holds references to the same records.
+    Plain dicts found in the lists (hand-built states) are converted.
+    Status changes must go through set_goal_status / set_plan_status /
+    set_step_status so the status buckets stay consistent.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.goals_ref = state.get("goals")
+        self.plans_ref = state.get("plans")
+
+        self.goals_by_id = {}
+        self.goals_by_status = {}        # status -> {goal_id: goal}
+        self.goals_by_owner_status = {}  # (owner_agent_id, status) -> {goal_id: goal}
+        self.goals_by_mission_status = {}        # (mission_id, status) -> {goal_id: goal}
+        self.goals_by_owner_mission_status = {}  # (owner_agent_id, mission_id, status) -> {goal_id: goal}
+
+        self.plans_by_id = {}
+        self.plans_by_goal = {}          # goal_id -> latest plan
+        self.plans_by_status = {}        # status -> {plan_id: plan}
+        self.steps_by_id = {}            # step_id -> (plan, step)
+
+        goals = self.goals_ref or []
+        for i, goal in enumerate(goals):
+            if not isinstance(goal, Goal):
+                goal = goals[i] = Goal.from_json(goal)
+            self._index_goal(goal)
+
+        plans = self.plans_ref or []
+        for i, plan in enumerate(plans):
+            if not isinstance(plan, Plan):
+                plan = plans[i] = Plan.from_json(plan)
+            self._index_plan(plan)
+
+        self.goal_count = len(self.goals_ref or [])
+        self.plan_count = len(self.plans_ref or [])
+
+    def is_current(self, state):
+        goals = state.get("goals")
+        plans = state.get("plans")
+        return (
+            self.state is state
+            and self.goals_ref is goals
+            and self.plans_ref is plans
+            and self.goal_count == len(goals or [])
+            and self.plan_count == len(plans or [])
+        )
+
+    # ---------- GOALS ----------
+
+    def _index_goal(self, goal):
+        self.goals_by_id[goal.goal_id] = goal
+        self._bucket_goal(goal, goal.status)
+
+    def _goal_buckets(self, goal, status):
+        owner = goal.owner_agent_id
+        mission = goal.mission_id
+        return (
+            (self.goals_by_status, status),
+            (self.goals_by_owner_status, (owner, status)),
+            (self.goals_by_mission_status, (mission, status)),
+            (self.goals_by_owner_mission_status, (owner, mission, status)),
+        )
+
+    def _bucket_goal(self, goal, status):
+        goal_id = goal.goal_id
+        for table, key in self._goal_buckets(goal, status):
+            table.setdefault(key, {})[goal_id] = goal
+
+    def _unbucket_goal(self, goal, status):
+        goal_id = goal.goal_id
+        for table, key in self._goal_buckets(goal, status):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.pop(goal_id, None)
+                if not bucket:
+                    del table[key]
+
+    def move_goal(self, goal, old_status, new_status):
+        self._unbucket_goal(goal, old_status)
+        self._bucket_goal(goal, new_status)
+
+    def _unindex_goal(self, goal):
+        self.goals_by_id.pop(goal.goal_id, None)
+        self._unbucket_goal(goal, goal.status)
+
+    # ---------- PLANS ----------
+
+    def _index_plan(self, plan):
+        plan_id = plan.plan_id
+        self.plans_by_id[plan_id] = plan
+        self.plans_by_goal[plan.goal_id] = plan
+        self.plans_by_status.setdefault(plan.status, {})[plan_id] = plan
+
+        for step in plan.steps:
+            self.steps_by_id[step.step_id] = (plan, step)
+
+    def _unindex_plan(self, plan):
+        plan_id = plan.plan_id
+        self.plans_by_id.pop(plan_id, None)
+        if self.plans_by_goal.get(plan.goal_id) is plan:
+            del self.plans_by_goal[plan.goal_id]
+        self.plans_by_status.get(plan.status, {}).pop(plan_id, None)
+
+        for step in plan.steps:
+            self.steps_by_id.pop(step.step_id, None)
+
+    def move_plan(self, plan, old_status, new_status):
+        plan_id = plan.plan_id
+        self.plans_by_status.get(old_status, {}).pop(plan_id, None)
+        self.plans_by_status.setdefault(new_status, {})[plan_id] = plan
+
+    # ---------- PERSISTENCE HOOK ----------
+
+    def lookup_record(self, key, record_id):
+        if key == "goals":
+            return self.goals_by_id.get(record_id)
+        if key == "plans":
+            return self.plans_by_id.get(record_id)
+        return None
+
+
+def get_index(state):
+    """
+    Return the index for this state dict, rebuilding it when the goal or
+    plan lists were replaced or grew outside of add_goal/add_plan.
+    """
+    index = get_attachment(state, "index")
+
+    if index is None or not index.is_current(state):
+        index = StateIndex(state)
+        set_attachment(state, "index", index)
+
+        if isinstance(state, TrackedState):
+            state.record_resolver = index.lookup_record
+
+    return index
+
+
+# ======================================================
+# MUTATIONS (keep index + journal consistent)
+# ======================================================
+
+# Called as listener(state, goal) when a goal is added or its status/type
+# changes (e.g. to rescore just that goal)
+_goal_listeners = []
+
+
+def add_goal_listener(listener):
+    if listener not in _goal_listeners:
+        _goal_listeners.append(listener)
+
+
+def _goal_changed(state, goal):
+    for listener in _goal_listeners:
+        listener(state, goal)
+
+
+def add_goal(state, goal):
+    goal = Goal.from_json(goal)
+    index = get_index(state)
+    goals = state.setdefault("goals", [])
+    goals.append(goal)
+    mark_dirty(state, "goals", goal.goal_id)
+
+    index.goals_ref = goals
+    index.goal_count = len(goals)
+    index._index_goal(goal)
+    _goal_changed(state, goal)
+    return goal
+
+
+def add_plan(state, plan):
+    plan = Plan.from_json(plan)
+    index = get_index(state)
+    plans = state.setdefault("plans", [])
+    plans.append(plan)
+    mark_dirty(state, "plans", plan.plan_id)
+
+    index.plans_ref = plans
+    index.plan_count = len(plans)
+    index._index_plan(plan)
+    return plan
+
+
+def remove_goals(state, goal_ids):
+    """
+    Drop goals and their plans from state (one pass over each list) and
+    from the index. Returns (removed goals, removed plans).
+    """
+    index = get_index(state)
+    goal_ids = set(goal_ids)
+
+    goals = state.get("goals", [])
+    removed_goals = [g for g in goals if g["goal_id"] in goal_ids]
+    goals[:] = [g for g in goals if g["goal_id"] not in goal_ids]
+
+    plans = state.get("plans", [])
+    removed_plans = [p for p in plans if p.get("goal_id") in goal_ids]
+    plans[:] = [p for p in plans if p.get("goal_id") not in goal_ids]
+
+    for plan in removed_plans:
+        index._unindex_plan(plan)
+        mark_removed(state, "plans", plan["plan_id"])
+
+    for goal in removed_goals:
+        index._unindex_goal(goal)
+        mark_removed(state, "goals", goal["goal_id"])
+        _goal_changed(state, goal)
+
+    index.goal_count = len(goals)
+    index.plan_count = len(plans)
+
+    return removed_goals, removed_plans
+
+
+def set_goal_status(state, goal, status, now=None):
+    """
+    now: epoch seconds (defaults to the current time).
+    """
+    index = get_index(state)
+    old_status = goal.status
+    status = to_status(status)
+
+    goal.status = status
+    goal.updated_at = time.time() if now is None else now
+    mark_dirty(state, "goals", goal.goal_id)
+
+    if old_status != status:
+        index.move_goal(goal, old_status, status)
+        _goal_changed(state, goal)
+
+
+def set_goal_type(state, goal, goal_type):
+    if goal.type == goal_type:
+        return
+    goal.type = goal_type
+    mark_dirty(state, "goals", goal.goal_id)
+    _goal_changed(state, goal)
+
+
+def set_plan_status(state, plan, status):
+    index = get_index(state)
+    old_status = plan.status
+    status = to_status(status)
+
+    plan.status = status
+    mark_dirty(state, "plans", plan.plan_id)
+
+    if old_status != status:
+        index.move_plan(plan, old_status, status)
+
+
+def set_step_status(state, plan, step, status):
+    step.status = to_status(status)
+    mark_dirty(state, "plans", plan.plan_id)
+
+
+# ======================================================
+# LOOKUPS
+# ======================================================
+
+def find_goal(state, goal_id):
+    return get_index(state).goals_by_id.get(goal_id)
+
+
+def find_plan_and_step(state, step_id):
+    return get_index(state).steps_by_id.get(step_id, (None, None))
+
+
+def plan_for_goal(state, goal_id, status=None):
+    plan = get_index(state).plans_by_goal.get(goal_id)
+    if plan is None or (status and plan.get("status") != status):
+        return None
+    return plan
+
+
+def goals_with_status(state, status, owner_agent_id=None):
+    """
+    Snapshot list of goals in a status (safe to mutate statuses while iterating).
+    """
+    index = get_index(state)
+    if owner_agent_id is None:
+        bucket = index.goals_by_status.get(status, {})
+    else:
+        bucket = index.goals_by_owner_status.get((owner_agent_id, status), {})
+    return list(bucket.values())
+
+
+def count_goals(state, status, owner_agent_id=None):
+    index = get_index(state)
+    if owner_agent_id is None:
+        return len(index.goals_by_status.get(status, {}))
+    return len(index.goals_by_owner_status.get((owner_agent_id, status), {}))
+
+
+def count_mission_goals(state, mission_id, status):
+    return len(get_index(state).goals_by_mission_status.get((mission_id, status), {}))
+
+
+def pending_missions(state, owner_agent_id):
+    """
+    Missions (None = unassigned) with pending goals for this agent.
+    """
+    return [
+        mission_id
+        for (owner, mission_id, status), bucket in get_index(state).goals_by_owner_mission_status.items()
+        if owner == owner_agent_id and status == "pending" and bucket
+    ]
+
+
+def next_pending_goal(state, owner_agent_id, mission_id=...):
+    """
+    Oldest pending goal of the agent, optionally within one mission.
+    """
+    index = get_index(state)
+    if mission_id is ...:
+        bucket = index.goals_by_owner_status.get((owner_agent_id, "pending"))
+    else:
+        bucket = index.goals_by_owner_mission_status.get((owner_agent_id, mission_id, "pending"))
+    if not bucket:
+        return None
+    return next(iter(bucket.values()))
+
+
+def plans_with_status(state, status):
+    return list(get_index(state).plans_by_status.get(status, {}).values())
+
+
+def open_goals(state):
+    """
+    All goals that are not completed/failed.
+    """
+    index = get_index(state)
+    result = []
+    for status, bucket in index.goals_by_status.items():
+        if status not in TERMINAL_GOAL_STATUSES:
+            result.extend(bucket.values())
+    return result
@@ -0,0 +1,526 @@
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import wait
+
+import logger
+from logger import log
+from config import (
+    RUNTIME_SHARDS,
+    RUNTIME_AGENTS_FILE,
+    RUNTIME_AGENTS_POLL_SECONDS,
+    RUNTIME_DRAIN_SECONDS,
+    RUNTIME_SHARD_MAX_RESTARTS,
+    SCHEDULER_MAX_SLEEP_SECONDS,
+    ACTION_PROCESS_WORKERS,
+    ACTION_PROCESS_START_METHOD,
+    LOG_FILE,
+    METRICS_PROM_FILE,
+    METRICS_JSON_FILE,
+    WATCH_GLOBS,
+    AGENT_STATE_DIR,
+    MEMORY_FILE,
+    JOURNAL_FILE,
+    STATE_DB_FILE,
+    INTENT_QUEUE_DIR,
+    ARCHIVE_DIR,
+)
+from agent import Agent
+from mission import Mission
+import scheduler
+import metrics
+import tasks
+from memory import load_state, save_state, close_state
+from events import enqueue_event, set_watch_globs, close_watcher
+from durable_queue import close_intent_queue
+from worker_pool import get_pools, configure_pools
+
+
+# ======================================================
+# MULTI-AGENT RUNTIME
+# ======================================================
+#
+# supervisor (main process)
+#   ├── shard 0 ── agents whose crc32(agent_id) % shards == 0
+#   ├── shard 1 ── ...
+#   └── shard N-1
+#
+# Every shard process runs the usual event-driven loop over the agents it
+# hosts. Each agent has its own state partition (agents/<agent_id>/),
+# task timers and file watcher; the process pools are shared per shard.
+#
+# The supervisor owns the agent table. It tells shards which agents to
+# host and routes goals between them: a goal belongs to the agent that
+# owns its mission, otherwise to its owner_agent_id.
+#
+# An agent spec is {"agent": Agent, "missions": [Mission], "watch": [globs]}.
+
+def shard_for(agent_id, shards):
+    return zlib.crc32(agent_id.encode("utf-8")) % shards
+
+
+def make_spec(agent, missions=(), watch=()):
+    return {"agent": agent, "missions": list(missions), "watch": list(watch)}
+
+
+def spec_from_json(data):
+    """
+    {"agent_id": ..., <Agent fields>, "watch": [...], "missions": [...]}
+    """
+    data = dict(data)
+    watch = data.pop("watch", [])
+    missions = [
+        Mission(**{
+            "name": m["mission_id"],
+            "description": "",
+            "active": True,
+            "created_at": "",
+            "owned_by_agent_id": data["agent_id"],
+            "goal_ids": [],
+            **m,
+        })
+        for m in data.pop("missions", [])
+    ]
+    return make_spec(Agent(**data), missions, watch)
+
+
+def load_agent_specs(path=RUNTIME_AGENTS_FILE):
+    """
+    {agent_id: spec} from the agents file ({"agents": [...]}).
+    """
+    with open(path, "r") as file:
+        data = json.load(file)
+
+    specs = {}
+    for item in data.get("agents", []):
+        spec = spec_from_json(item)
+        specs[spec["agent"].agent_id] = spec
+    return specs
+
+
+def adopt_legacy_state(agent_id, directory="."):
+    """
+    Copy the single-agent state files (sync / async modes) into the
+    agent's partition the first time it runs sharded, so its goals,
+    missions and watch baselines carry over. The originals stay in place.
+    """
+    target = os.path.join(AGENT_STATE_DIR, agent_id)
+    if os.path.exists(target):
+        return False
+
+    names = [
+        name for name in (
+            MEMORY_FILE, JOURNAL_FILE, STATE_DB_FILE,
+            STATE_DB_FILE + "-wal", STATE_DB_FILE + "-shm",
+            INTENT_QUEUE_DIR, ARCHIVE_DIR,
+        )
+        if os.path.exists(os.path.join(directory, name))
+    ]
+    if not any(name in names for name in (MEMORY_FILE, STATE_DB_FILE)):
+        return False
+
+    os.makedirs(target)
+    for name in names:
+        source = os.path.join(directory, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(target, name))
+        else:
+            shutil.copy2(source, os.path.join(target, name))
+
+    log(f"[RUNTIME] Copied the single-agent state ({', '.join(names)}) into {target}/")
+    return True
+
+
+def mission_owners(specs):
+    return {
+        mission.mission_id: mission.owned_by_agent_id
+        for spec in specs.values()
+        for mission in spec["missions"]
+        if mission.active
+    }
+
+
+# ======================================================
+# SHARD (worker process)
+# ======================================================
+
+class Shard:
+    """
+    Hosts a set of agents in one process. Commands from the supervisor
+    arrive on `inbox` and are applied between passes; goals for agents
+    on other shards leave through `outbox`.
+    """
+
+    def __init__(self, index, shards, inbox, outbox):
+        self.index = index
+        self.inbox = inbox
+        self.outbox = outbox
+        self.agents = {}            # agent_id -> spec
+        self.agent_shards = {}      # agent_id -> shard (all agents)
+        self.mission_owners = {}    # mission_id -> agent_id
+        self.commands = deque()
+        self.running = True
+
+        tasks.set_goal_router(self.route_goal)
+        configure_pools(process_workers=max(1, ACTION_PROCESS_WORKERS // shards))
+
+        metrics.set_export_files(
+            METRICS_PROM_FILE and METRICS_PROM_FILE.replace(".prom", f".shard{index}.prom"),
+            METRICS_JSON_FILE and METRICS_JSON_FILE.replace(".json", f".shard{index}.json"),
+        )
+
+    # ---------- COMMANDS ----------
+
+    def read_inbox(self):
+        # Blocking reads on a thread; the loop applies them between passes
+        while True:
+            command = self.inbox.get()
+            self.commands.append(command)
+            scheduler.notify("runtime")
+            if command[0] == "stop":
+                return
+
+    def apply_commands(self):
+        while self.commands:
+            command = self.commands.popleft()
+            kind = command[0]
+
+            if kind == "add":
+                self.add_agent(command[1])
+            elif kind == "remove":
+                self.remove_agent(command[1])
+            elif kind == "routes":
+                self.agent_shards, self.mission_owners = command[1], command[2]
+            elif kind == "goal":
+                self.deliver_goal(command[1])
+            elif kind == "event":
+                agent_id, event = command[1], command[2]
+                if agent_id in self.agents:
+                    enqueue_event(self.state(agent_id), event)
+            elif kind == "stop":
+                self.running = False
+
+    def state(self, agent_id):
+        return load_state(agent_id)
+
+    def add_agent(self, spec):
+        agent_id = spec["agent"].agent_id
+        if agent_id in self.agents:
+            self.remove_agent(agent_id)
+
+        self.agents[agent_id] = spec
+        set_watch_globs(self.state(agent_id), spec["watch"])
+        log(f"[RUNTIME] Shard {self.index} hosting agent {agent_id}")
+
+    def remove_agent(self, agent_id):
+        """
+        Finish (up to RUNTIME_DRAIN_SECONDS) the agent's in-flight actions,
+        save its state and let it go.
+        """
+        if self.agents.pop(agent_id, None) is None:
+            return
+
+        state = self.state(agent_id)
+        pools = get_pools()
+
+        in_flight = pools.in_flight(state)
+        if in_flight:
+            wait(in_flight, timeout=RUNTIME_DRAIN_SECONDS)
+        for intent, changes, error in pools.harvest(state):
+            tasks.apply_intent_result(state, intent, changes, error)
+        pools.discard(state)
+
+        close_watcher(state)
+        save_state(state)
+        close_intent_queue(state)
+        close_state(agent_id)
+        log(f"[RUNTIME] Shard {self.index} released agent {agent_id}")
+
+    # ---------- GOAL ROUTING ----------
+
+    def route_goal(self, state, agent, goal):
+        """
+        Goal router for tasks.handle_event: hand the goal to the agent that
+        owns its mission. Returns False to keep it with `agent`.
+        """
+        target = self.mission_owners.get(goal.get("mission_id")) or goal.get("owner_agent_id")
+        if not target or target == agent.agent_id or target not in self.agent_shards:
+            return False
+
+        goal["owner_agent_id"] = target
+        log(f"[RUNTIME] Goal {goal['goal_id']} routed {agent.agent_id} → {target}")
+
+        if target in self.agents:
+            self.deliver_goal(goal)
+        else:
+            self.outbox.put(("goal", goal))
+        return True
+
+    def deliver_goal(self, goal):
+        agent_id = goal.get("owner_agent_id")
+        if agent_id not in self.agents:
+            # Moved away meanwhile: back to the supervisor
+            self.outbox.put(("goal", goal))
+            return
+
+        tasks.adopt_goal(self.state(agent_id), goal)
+        scheduler.notify("plan")
+
+    # ---------- LOOP ----------
+
+    def tick(self):
+        """
+        One pass over every hosted agent; returns the shortest delay.
+        """
+        self.apply_commands()
+        if not self.running:
+            return None
+        triggers = scheduler.take_triggers()
+
+        delays = []
+        for agent_id, spec in list(self.agents.items()):
+            agent = spec["agent"]
+            if agent.status == "paused":
+                continue
+            delays.append(tasks.run_all_tasks(agent, spec["missions"], agent_id, triggers))
+
+        delays = [d for d in delays if d is not None]
+        return min(delays) if delays else None
+
+    def run(self):
+        threading.Thread(target=self.read_inbox, name="shard-inbox", daemon=True).start()
+
+        while True:
+            delay = self.tick()
+            if not self.running:
+                break
+            scheduler.wait_for_work(delay, SCHEDULER_MAX_SLEEP_SECONDS)
+
+        for agent_id in list(self.agents):
+            save_state(self.state(agent_id))
+        # Queued actions are cancelled; running ones finish first
+        get_pools().shutdown(wait=True)
+
+
+def _shard_main(index, shards, inbox, outbox):
+    # Ctrl+C reaches the whole process group; the supervisor stops shards
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if LOG_FILE:
+        # agent_log.jsonl -> agent_log.shard0.jsonl
+        base, ext = os.path.splitext(LOG_FILE)
+        logger.set_log_file(f"{base}.shard{index}{ext}")
+    Shard(index, shards, inbox, outbox).run()
+
+
+# ======================================================
+# SUPERVISOR (main process)
+# ======================================================
+
+class Runtime:
+    """
+    Starts the shard processes and keeps the agent table. add_agent /
+    remove_agent / submit_goal / submit_event work while running; with
+    RUNTIME_AGENTS_FILE set, edits to that file are applied live too.
+    """
+
+    def __init__(self, specs=None, shards=RUNTIME_SHARDS, agents_file=RUNTIME_AGENTS_FILE,
+                 legacy_agent_id=None):
+        self.shards = max(1, shards)
+        self.specs = dict(specs or {})
+        self.agents_file = agents_file
+        self.agents_file_mtime = None
+        self.legacy_agent_id = legacy_agent_id    # inherits ./agent_state.* (see adopt_legacy_state)
+        self.restarts = [0] * self.shards
+
+        self.context = multiprocessing.get_context(ACTION_PROCESS_START_METHOD)
+        self.outbox = self.context.Queue()
+        self.inboxes = [self.context.Queue() for _ in range(self.shards)]
+        self.processes = [self.make_process(i) for i in range(self.shards)]
+
+    def make_process(self, index):
+        return self.context.Process(
+            target=_shard_main,
+            args=(index, self.shards, self.inboxes[index], self.outbox),
+            name=f"shard-{index}",
+        )
+
+    def start(self):
+        specs = self.read_agents_file()
+        if specs is not None:
+            self.specs = specs
+        if self.legacy_agent_id in self.specs:
+            adopt_legacy_state(self.legacy_agent_id)
+
+        for process in self.processes:
+            process.start()
+
+        self.broadcast_routes()
+        for spec in self.specs.values():
+            self.send(spec["agent"].agent_id, ("add", spec))
+
+        log(f"[RUNTIME] {len(self.specs)} agents on {self.shards} shards")
+
+    def send(self, agent_id, command):
+        index = shard_for(agent_id, self.shards)
+        if self.processes[index].exitcode is not None:
+            # Don't leave the command in a dead shard's inbox
+            self.check_shards()
+        self.inboxes[index].put(command)
+
+    def broadcast_routes(self):
+        agent_shards = {agent_id: shard_for(agent_id, self.shards) for agent_id in self.specs}
+        owners = mission_owners(self.specs)
+        for inbox in self.inboxes:
+            inbox.put(("routes", agent_shards, owners))
+
+    # ---------- LIVE CHANGES ----------
+
+    def add_agent(self, spec):
+        agent_id = spec["agent"].agent_id
+        self.specs[agent_id] = spec
+        self.broadcast_routes()
+        self.send(agent_id, ("add", spec))
+
+    def remove_agent(self, agent_id):
+        if self.specs.pop(agent_id, None) is None:
+            return
+        self.broadcast_routes()
+        self.send(agent_id, ("remove", agent_id))
+
+    def submit_goal(self, goal):
+        """
+        Route a goal dict (as goal.Goal(...).__dict__) to its agent.
+        """
+        owner = mission_owners(self.specs).get(goal.get("mission_id")) or goal.get("owner_agent_id")
+        if owner not in self.specs:
+            log(f"[RUNTIME] No agent for goal {goal.get('goal_id')} (owner {owner})", level="WARNING")
+            return False
+        goal["owner_agent_id"] = owner
+        self.send(owner, ("goal", goal))
+        return True
+
+    def submit_event(self, agent_id, event):
+        if agent_id not in self.specs:
+            return False
+        self.send(agent_id, ("event", agent_id, event))
+        return True
+
+    def read_agents_file(self):
+        """
+        Specs from the agents file, or None when it is missing, unchanged
+        since the last read, or invalid.
+        """
+        if not self.agents_file:
+            return None
+        try:
+            mtime = os.stat(self.agents_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self.agents_file_mtime:
+            return None
+        self.agents_file_mtime = mtime
+
+        try:
+            return load_agent_specs(self.agents_file)
+        except (ValueError, TypeError, KeyError) as e:
+            log(f"[RUNTIME] Ignoring invalid {self.agents_file}: {e}", level="ERROR")
+            return None
+
+    def reload_agents_file(self):
+        """
+        Apply additions, removals and changes in the agents file.
+        """
+        specs = self.read_agents_file()
+        if specs is None:
+            return
+
+        for agent_id in list(self.specs):
+            if agent_id not in specs:
+                self.remove_agent(agent_id)
+        for agent_id, spec in specs.items():
+            if self.specs.get(agent_id) != spec:
+                self.add_agent(spec)
+
+    # ---------- CRASHED SHARDS ----------
+
+    def check_shards(self):
+        """
+        Restart shards that died, with their agents, on a fresh inbox (a
+        shard killed inside inbox.get() leaves the old one locked). False
+        once a shard has crashed more than RUNTIME_SHARD_MAX_RESTARTS times.
+        """
+        for index, process in enumerate(self.processes):
+            if process.exitcode is None:
+                continue    # running (or not started yet)
+
+            agents = [agent_id for agent_id in self.specs if shard_for(agent_id, self.shards) == index]
+            log(
+                f"[RUNTIME] {process.name} exited with code {process.exitcode} "
+                f"(agents: {', '.join(agents) or 'none'})",
+                level="ERROR",
+            )
+            if self.restarts[index] >= RUNTIME_SHARD_MAX_RESTARTS:
+                log(f"[RUNTIME] {process.name} crashed {self.restarts[index] + 1} times; stopping", level="ERROR")
+                return False
+
+            self.restarts[index] += 1
+            process.close()
+            self.inboxes[index].cancel_join_thread()
+            self.inboxes[index].close()
+            self.inboxes[index] = self.context.Queue()
+            self.processes[index] = self.make_process(index)
+            self.processes[index].start()
+
+            agent_shards = {agent_id: shard_for(agent_id, self.shards) for agent_id in self.specs}
+            self.inboxes[index].put(("routes", agent_shards, mission_owners(self.specs)))
+            for agent_id in agents:
+                self.inboxes[index].put(("add", self.specs[agent_id]))
+            log(f"[RUNTIME] Restarted {process.name} ({self.restarts[index]}/{RUNTIME_SHARD_MAX_RESTARTS})")
+
+        return True
+
+    # ---------- LOOP ----------
+
+    def run(self):
+        self.start()
+        try:
+            while self.check_shards():
+                self.reload_agents_file()
+                try:
+                    message = self.outbox.get(timeout=RUNTIME_AGENTS_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+
+                if message[0] == "goal":
+                    self.submit_goal(message[1])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout=RUNTIME_DRAIN_SECONDS + 5):
+        for inbox in self.inboxes:
+            inbox.put(("stop",))
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                log(f"[RUNTIME] {process.name} did not stop; terminating", level="WARNING")
+                process.terminate()
+        log("[RUNTIME] Stopped")
+
+
+def run_sharded(default_agent, default_missions):
+    """
+    RUNTIME_MODE = "sharded": agents from RUNTIME_AGENTS_FILE, or just the
+    built-in agent (watching WATCH_GLOBS) when there is no such file.
+    """
+    specs = {}
+    if not (RUNTIME_AGENTS_FILE and os.path.exists(RUNTIME_AGENTS_FILE)):
+        specs[default_agent.agent_id] = make_spec(default_agent, default_missions, WATCH_GLOBS)
+    Runtime(specs, legacy_agent_id=default_agent.agent_id).run()
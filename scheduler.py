@@ -1,5 +1,9 @@
+import heapq
+import threading
 import time
+
 from logger import log
+from records import to_epoch
 
 def run_every(interval_seconds, task_function):
     """
@@ -10,3 +14,169 @@ def run_every(interval_seconds, task_function):
     while True:
         task_function()
         time.sleep(interval_seconds)
+
+
+# ======================================================
+# EVENT-DRIVEN LOOP
+# ======================================================
+
+_wakeup = threading.Event()
+_triggers = set()
+_triggers_lock = threading.Lock()
+_wake_callbacks = []
+
+
+def add_wake_callback(callback):
+    """
+    Extra wake-up hook (used by the asyncio runtime to set its own event).
+    """
+    _wake_callbacks.append(callback)
+
+
+def notify(trigger):
+    """
+    Signal that new work exists ("event", "intent", "plan").
+    Wakes the event-driven loop immediately.
+    """
+    with _triggers_lock:
+        _triggers.add(trigger)
+    _wakeup.set()
+
+    for callback in _wake_callbacks:
+        callback()
+
+
+def take_triggers():
+    with _triggers_lock:
+        triggers = set(_triggers)
+        _triggers.clear()
+    return triggers
+
+
+def run_event_driven(task_function, max_sleep_seconds):
+    """
+    Runs task_function, then sleeps until the delay it returns elapses
+    (its next due task) or notify() is called, whichever comes first.
+    """
+    log(f"Scheduler started. Event-driven, max sleep: {max_sleep_seconds} seconds")
+
+    while True:
+        wait_for_work(task_function(), max_sleep_seconds)
+
+
+def wait_for_work(delay, max_sleep_seconds):
+    """
+    Sleep for delay seconds (None = max_sleep_seconds) or until notify().
+    """
+    if delay is None:
+        delay = max_sleep_seconds
+
+    delay = min(max(delay, 0), max_sleep_seconds)
+
+    if delay > 0:
+        _wakeup.wait(delay)
+    _wakeup.clear()
+
+
+# ======================================================
+# TASK TIMERS (HEAP)
+# ======================================================
+
+class TaskRuntime:
+    """
+    Per-task scheduling record, all on the monotonic clock.
+    """
+
+    __slots__ = ("due", "last_run", "retries")
+
+    def __init__(self):
+        self.due = None        # current heap entry's due time (None = not scheduled)
+        self.last_run = None
+        self.retries = 0       # mirrors state[retry_count_<task>]
+
+
+class TaskTimers:
+    """
+    Min-heap of task due times on the monotonic clock, over a compiled
+    task_registry.DispatchTable.
+
+    Periodic tasks repeat every max(cooldown, min_interval). Tasks with a
+    "wake_on" trigger are pulled forward to last_run + cooldown when that
+    trigger fires. Heap entries are invalidated lazily through each
+    task's runtime record.
+    """
+
+    def __init__(self, table, min_interval):
+        self.table = table
+        self.min_interval = min_interval
+        self.heap = []
+        self.seq = 0
+        self.runtime = {spec.name: TaskRuntime() for spec in table}
+        self.periods = {spec.name: max(spec.cooldown_seconds, min_interval) for spec in table}
+
+    def period(self, name):
+        return self.periods[name]
+
+    def bootstrap(self, state, mono_now):
+        """
+        Seed due times once from the persisted last_run_* / retry_count_*.
+        """
+        wall_now = time.time()
+
+        for spec in self.table:
+            record = self.runtime[spec.name]
+            record.retries = state.get(spec.retry_key, 0)
+
+            # Epoch seconds; older states stored ISO strings
+            last_run = to_epoch(state.get(spec.last_run_key))
+            if not last_run:
+                self.schedule(spec, mono_now)
+                continue
+
+            # last_run may lie in the future when a failed task is backing off
+            elapsed = wall_now - last_run
+            record.last_run = mono_now - elapsed
+            self.schedule(spec, mono_now - elapsed + self.periods[spec.name])
+
+    def schedule(self, spec, due):
+        self.runtime[spec.name].due = due
+        self.seq += 1
+        heapq.heappush(self.heap, (due, self.table.rank[spec.name], self.seq, spec))
+
+    def trigger(self, trigger, mono_now):
+        for spec in self.table.wake_index.get(trigger, ()):
+            record = self.runtime[spec.name]
+            last_run = record.last_run
+            due = mono_now if last_run is None else max(mono_now, last_run + spec.cooldown_seconds)
+            if record.due is None or due < record.due:
+                self.schedule(spec, due)
+
+    def pop_due(self, mono_now):
+        """
+        Remove and return the TaskSpec of every task due by mono_now, in
+        priority order.
+        """
+        ready = []
+
+        while self.heap and self.heap[0][0] <= mono_now:
+            due, rank, _, spec = heapq.heappop(self.heap)
+            record = self.runtime[spec.name]
+            if record.due != due:
+                continue  # superseded entry
+            record.due = None
+            ready.append((rank, spec))
+
+        ready.sort(key=lambda entry: entry[0])
+        return [spec for _, spec in ready]
+
+    def completed(self, spec, mono_now, delay=None):
+        self.runtime[spec.name].last_run = mono_now
+        self.schedule(spec, mono_now + (self.periods[spec.name] if delay is None else delay))
+
+    def next_delay(self, mono_now):
+        while self.heap and self.runtime[self.heap[0][3].name].due != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+        if not self.heap:
+            return None
+        return max(self.heap[0][0] - mono_now, 0)
@@ -0,0 +1,240 @@
+import heapq
+import itertools
+from datetime import datetime
+
+from config import GOAL_SCORERS, GOAL_AGE_HALF_LIFE_HOURS, GOAL_MISSION_WEIGHTS
+from state_store import mark_dirty, get_attachment, set_attachment
+from records import timestamp
+import registry
+
+
+# ======================================================
+# BASE SCORE (status × type weight)
+# ======================================================
+
+def calculate_goal_score(goal):
+    status = goal.get("status")
+
+    if status == "completed":
+        return 100
+
+    if status == "active":
+        return 70
+
+    if status == "pending":
+        return 50
+
+    if status == "failed":
+        return 20
+
+    return 0
+GOAL_TYPE_PRIORITY = {
+    "career": 1.5,
+    "skill": 1.3,
+    "fitness": 1.1,
+    "misc": 1.0
+}
+GOAL_TYPE_MAP = {
+    "analyze_file": "skill",
+    "analyze_change": "skill",
+    "study": "skill",
+    "project": "career",
+    "placement": "career",
+    "job": "career",
+    "gym": "fitness",
+    "workout": "fitness",
+}
+
+
+def base_score(goal):
+    """
+    Returns (score, weight, normalized_type). Depends only on status and
+    type, so it is recomputed only when one of them changes.
+    """
+    raw_type = goal.get("type") or "misc"
+    normalized_type = GOAL_TYPE_MAP.get(raw_type, raw_type)
+    weight = GOAL_TYPE_PRIORITY.get(normalized_type, 1.0)
+    return int(calculate_goal_score(goal) * weight), weight, normalized_type
+
+
+# ======================================================
+# PLUGGABLE SCORERS
+# ======================================================
+
+class Scorer:
+    """
+    A multiplicative factor on top of the base score. max_factor must bound
+    fn's result: it lets the ranker skip goals that cannot win without
+    evaluating fn for them.
+    """
+
+    def __init__(self, name, fn, max_factor=1.0):
+        self.name = name
+        self.fn = fn
+        self.max_factor = max_factor
+
+
+def age_decay(goal, ranker, now):
+    # Older goals fade: 1.0 when created, 0.5 after one half-life
+    created = ranker.created_ts(goal)
+    if created is None:
+        return 1.0
+    age_hours = max(0.0, now - created) / 3600
+    return 0.5 ** (age_hours / GOAL_AGE_HALF_LIFE_HOURS)
+
+
+def mission_weight(goal, ranker, now):
+    return GOAL_MISSION_WEIGHTS.get(goal.get("mission_id"), 1.0)
+
+
+SCORERS = {
+    "age_decay": Scorer("age_decay", age_decay, max_factor=1.0),
+    "mission_weight": Scorer(
+        "mission_weight", mission_weight,
+        max_factor=max([1.0, *GOAL_MISSION_WEIGHTS.values()]),
+    ),
+}
+
+
+def register_scorer(scorer):
+    SCORERS[scorer.name] = scorer
+
+
+# ======================================================
+# GOAL RANKER
+# ======================================================
+
+class GoalRanker:
+    """
+    Max-heap of non-terminal goals keyed on base score.
+
+    Goals are rescored only when registry reports a status/type change
+    (see on_goal_changed); outdated heap entries are skipped lazily via a
+    per-goal version. best() pops candidates by upper bound
+    (base × Π max_factor) and evaluates the configured scorers only until
+    no remaining goal can beat the best exact score found.
+    """
+
+    def __init__(self, state, scorer_names=GOAL_SCORERS):
+        self.index = registry.get_index(state)
+        self.scorers = [SCORERS[name] for name in scorer_names]
+        self.max_multiplier = 1.0
+        for scorer in self.scorers:
+            self.max_multiplier *= scorer.max_factor
+
+        self.heap = []          # (-base, order, goal_id, version)
+        self.versions = {}      # goal_id -> version of its live heap entry
+        self.order = {}         # goal_id -> first-seen rank (tie-break)
+        self.created = {}       # goal_id -> created_at epoch (parsed lazily)
+        self.counter = itertools.count()
+        self.stale = set(self.index.goals_by_id)
+
+    def created_ts(self, goal):
+        goal_id = goal["goal_id"]
+        if goal_id not in self.created:
+            self.created[goal_id] = timestamp(goal, "created_at")
+        return self.created[goal_id]
+
+    def refresh(self, state):
+        """
+        Rescore the goals whose status/type changed. Returns how many.
+        """
+        count = 0
+        for goal_id in self.stale:
+            goal = self.index.goals_by_id.get(goal_id)
+            if goal is None:
+                self.versions.pop(goal_id, None)
+                continue
+
+            score, weight, normalized_type = base_score(goal)
+            if (
+                goal.get("score") != score
+                or goal.get("priority_weight") != weight
+                or goal.get("normalized_type") != normalized_type
+            ):
+                goal["score"] = score
+                goal["priority_weight"] = weight
+                goal["normalized_type"] = normalized_type
+                mark_dirty(state, "goals", goal_id)
+
+            if goal.get("status") in registry.TERMINAL_GOAL_STATUSES:
+                self.versions.pop(goal_id, None)
+            else:
+                version = next(self.counter)
+                order = self.order.setdefault(goal_id, version)
+                self.versions[goal_id] = version
+                heapq.heappush(self.heap, (-score, order, goal_id, version))
+            count += 1
+
+        self.stale.clear()
+
+        # Drop outdated entries once they outnumber the live ones
+        if len(self.heap) > 2 * len(self.versions) + 64:
+            self.heap = [e for e in self.heap if self.versions.get(e[2]) == e[3]]
+            heapq.heapify(self.heap)
+
+        return count
+
+    def final_score(self, goal, base, now):
+        if not self.scorers:
+            return base
+        score = base
+        for scorer in self.scorers:
+            score *= scorer.fn(goal, self, now)
+        return round(score, 3)
+
+    def best(self, now=None):
+        """
+        (goal, score) with the highest final score among open goals, or
+        (None, None).
+        """
+        now = now if now is not None else datetime.now().timestamp()
+        examined = []
+        best_goal, best_score = None, None
+
+        while self.heap:
+            neg_base, _, goal_id, version = self.heap[0]
+            if self.versions.get(goal_id) != version:
+                heapq.heappop(self.heap)
+                continue
+
+            if best_goal is not None and -neg_base * self.max_multiplier <= best_score:
+                break
+
+            entry = heapq.heappop(self.heap)
+            goal = self.index.goals_by_id.get(goal_id)
+            if goal is None or goal.get("status") in registry.TERMINAL_GOAL_STATUSES:
+                self.versions.pop(goal_id, None)
+                continue
+
+            examined.append(entry)
+            score = self.final_score(goal, -neg_base, now)
+
+            if best_goal is None or score > best_score:
+                best_goal, best_score = goal, score
+
+        for entry in examined:
+            heapq.heappush(self.heap, entry)
+
+        return best_goal, best_score
+
+
+def get_ranker(state):
+    """
+    The ranker for this state; rebuilt (full rescore) whenever the registry
+    index was rebuilt, e.g. on first use or after the goal list was replaced.
+    """
+    ranker = get_attachment(state, "goal_ranker")
+    if ranker is None or ranker.index is not registry.get_index(state):
+        ranker = GoalRanker(state)
+        set_attachment(state, "goal_ranker", ranker)
+    return ranker
+
+
+def on_goal_changed(state, goal):
+    ranker = get_attachment(state, "goal_ranker")
+    if ranker is not None:
+        ranker.stale.add(goal["goal_id"])
+
+
+registry.add_goal_listener(on_goal_changed)
@@ -0,0 +1,606 @@
+import json
+import os
+import sqlite3
+import sys
+
+from logger import log
+from config import MEMORY_FILE, JOURNAL_FILE, STATE_DB_FILE, AGENT_STATE_DIR
+from records import json_default, to_epoch
+from state_store import (
+    TrackedState,
+    JournaledStateStore,
+    RECORD_DECODERS,
+    collect_ops,
+)
+
+
+# ======================================================
+# SCHEMA
+# ======================================================
+#
+# Goals, plans and their steps, the event / intent queues and the per-task
+# runtime keys (last_run_*, retry_count_*, disabled_*, disabled_at_*) get
+# real tables; every other state key is one JSON row in `kv`. Each row
+# keeps its full JSON in `data`; the other columns are indexed copies.
+#
+# Dict-valued keys (watch_mtimes, file_fingerprints, missions, ...) keep
+# an empty "{}" row in `kv` and one `records` row per entry, so a changed
+# record is one row upsert / delete.
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (key, record_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS goals (
+    goal_id TEXT PRIMARY KEY,
+    owner_agent_id TEXT,
+    mission_id TEXT,
+    status TEXT,
+    type TEXT,
+    score REAL,
+    created_at REAL,
+    updated_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS goals_owner_status_score ON goals (owner_agent_id, status, score DESC);
+CREATE INDEX IF NOT EXISTS goals_mission_status ON goals (mission_id, status);
+CREATE INDEX IF NOT EXISTS goals_status_updated ON goals (status, updated_at);
+CREATE TABLE IF NOT EXISTS plans (
+    plan_id TEXT PRIMARY KEY,
+    goal_id TEXT,
+    status TEXT,
+    created_at REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_goal ON plans (goal_id);
+CREATE INDEX IF NOT EXISTS plans_status ON plans (status);
+CREATE TABLE IF NOT EXISTS plan_steps (
+    plan_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    step_id TEXT,
+    action TEXT,
+    status TEXT,
+    retry_count INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (plan_id, position)
+);
+CREATE INDEX IF NOT EXISTS plan_steps_status ON plan_steps (status);
+CREATE INDEX IF NOT EXISTS plan_steps_step ON plan_steps (step_id);
+CREATE TABLE IF NOT EXISTS events (
+    position INTEGER PRIMARY KEY,
+    type TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS intents (
+    position INTEGER PRIMARY KEY,
+    action TEXT,
+    plan_step_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS intents_step ON intents (plan_step_id);
+CREATE TABLE IF NOT EXISTS task_runtime (
+    task TEXT PRIMARY KEY,
+    last_run REAL,
+    retry_count INTEGER,
+    disabled INTEGER,
+    disabled_at TEXT
+);
+"""
+
+# Queue keys stored one row per item: key -> (table, extra column, item field)
+QUEUE_TABLES = {
+    "event_queue": ("events", "type", "type"),
+    "intent_queue": ("intents", "action", "action"),
+}
+
+# Task runtime keys; disabled_at_ must be matched before disabled_
+TASK_KEY_PREFIXES = (
+    ("last_run_", "last_run"),
+    ("retry_count_", "retry_count"),
+    ("disabled_at_", "disabled_at"),
+    ("disabled_", "disabled"),
+)
+
+
+def task_key(key):
+    """
+    (column, task name) for a task runtime key, else None.
+    """
+    for prefix, column in TASK_KEY_PREFIXES:
+        if key.startswith(prefix):
+            return column, key[len(prefix):]
+    return None
+
+
+def as_json(record):
+    return record.to_json() if hasattr(record, "to_json") else record
+
+
+def dumps(value):
+    return json.dumps(value, separators=(",", ":"), default=json_default)
+
+
+# ======================================================
+# SQLITE STORE
+# ======================================================
+
+class SqliteStateStore:
+    """
+    Agent state in a SQLite database (WAL mode).
+
+    Same contract as JournaledStateStore: the state lives in memory as a
+    TrackedState, and each commit turns its dirty keys and records into
+    row upserts / deletes inside one transaction. Nothing is rewritten
+    wholesale except keys that were replaced wholesale.
+    """
+
+    def __init__(self, db_path, fsync=True):
+        self.db_path = db_path
+        self.directory = os.path.dirname(db_path) or "."
+        self.fsync = fsync
+        self.state = None
+        self.last_commit_bytes = 0
+        self.conn = None
+
+    def connect(self, read_only=False):
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            return conn
+
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            self.conn.executescript(SCHEMA)
+            if version < SCHEMA_VERSION:
+                upgrade(self.conn, version)
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    # ---------- LOAD ----------
+
+    def load(self, read_only=False):
+        """
+        State rebuilt from the tables. read_only opens its own read-only
+        connection and does not keep the result (safe while an agent runs).
+        """
+        if self.state is not None and not read_only:
+            return self.state
+
+        if read_only and not os.path.exists(self.db_path):
+            return TrackedState()
+
+        conn = self.connect(read_only)
+        try:
+            data = read_tables(conn)
+        finally:
+            if read_only:
+                conn.close()
+
+        state = TrackedState(data)
+        if not read_only:
+            self.state = state
+        return state
+
+    # ---------- COMMIT ----------
+
+    def commit(self, state):
+        if state is not self.state:
+            # Foreign dict: adopt it and write every key
+            self.state = state if isinstance(state, TrackedState) else TrackedState(state)
+            self.write_all()
+            return
+
+        if not state.is_dirty():
+            self.last_commit_bytes = 0
+            return
+
+        conn = self.connect()
+        writer = RowWriter(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in collect_ops(state):
+                writer.apply(op)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.last_commit_bytes = writer.bytes
+        state.reset_dirty()
+
+    def write_all(self):
+        conn = self.connect()
+        writer = RowWriter(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("kv", "records", "goals", "plans", "plan_steps", "events", "intents", "task_runtime"):
+                conn.execute(f"DELETE FROM {table}")
+            for key, value in self.state.items():
+                writer.apply({"op": "set", "key": key, "value": value})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.last_commit_bytes = writer.bytes
+        self.state.reset_dirty()
+
+    def compact(self):
+        """
+        Fold the WAL back into the database file.
+        """
+        self.connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.last_commit_bytes = os.path.getsize(self.db_path)
+
+    # ---------- QUERIES ----------
+
+    def query_goals(self, owner_agent_id=None, status=None, mission_id=None,
+                    order_by_score=False, limit=None, read_only=False):
+        """
+        Goal JSON dicts matching every given filter, served by the indexes.
+        """
+        clauses, params = [], []
+        for column, value in (
+            ("owner_agent_id", owner_agent_id),
+            ("status", status),
+            ("mission_id", mission_id),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+
+        sql = "SELECT data FROM goals"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY score DESC, rowid" if order_by_score else " ORDER BY rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [json.loads(row[0]) for row in self.fetch(sql, params, read_only)]
+
+    def pending_goals(self, owner_agent_id, limit=None, read_only=False):
+        return self.query_goals(owner_agent_id, "pending", order_by_score=True,
+                                limit=limit, read_only=read_only)
+
+    def plans_for_goal(self, goal_id, read_only=False):
+        rows = self.fetch("SELECT plan_id FROM plans WHERE goal_id = ? ORDER BY rowid", (goal_id,), read_only)
+        return [self.plan(plan_id, read_only) for (plan_id,) in rows]
+
+    def plan(self, plan_id, read_only=False):
+        rows = self.fetch("SELECT data FROM plans WHERE plan_id = ?", (plan_id,), read_only)
+        if not rows:
+            return None
+        plan = json.loads(rows[0][0])
+        plan["steps"] = [
+            json.loads(data) for (data,) in self.fetch(
+                "SELECT data FROM plan_steps WHERE plan_id = ? ORDER BY position", (plan_id,), read_only
+            )
+        ]
+        return plan
+
+    def steps_with_status(self, status, read_only=False):
+        """
+        [(plan_id, step JSON)] for every step in the given status.
+        """
+        rows = self.fetch("SELECT plan_id, data FROM plan_steps WHERE status = ?", (status,), read_only)
+        return [(plan_id, json.loads(data)) for plan_id, data in rows]
+
+    def fetch(self, sql, params=(), read_only=False):
+        if not read_only:
+            return self.connect().execute(sql, params).fetchall()
+        conn = self.connect(read_only=True)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+
+# ======================================================
+# ROW MAPPING
+# ======================================================
+
+class RowWriter:
+    """
+    Applies journal ops (see state_store.collect_ops) as row changes.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.bytes = 0
+
+    def apply(self, op):
+        kind, key = op["op"], op["key"]
+
+        if key == "goals":
+            if kind == "set":
+                self.conn.execute("DELETE FROM goals")
+                for goal in op["value"] or []:
+                    self.put_goal(goal)
+            elif kind == "del":
+                self.conn.execute("DELETE FROM goals")
+            elif kind == "put":
+                self.put_goal(op["value"])
+            elif kind == "drop":
+                self.conn.execute("DELETE FROM goals WHERE goal_id = ?", (op["id"],))
+        elif key == "plans":
+            if kind in ("set", "del"):
+                self.conn.execute("DELETE FROM plans")
+                self.conn.execute("DELETE FROM plan_steps")
+                for plan in (op["value"] or []) if kind == "set" else []:
+                    self.put_plan(plan)
+            elif kind == "put":
+                self.put_plan(op["value"])
+            elif kind == "drop":
+                self.conn.execute("DELETE FROM plans WHERE plan_id = ?", (op["id"],))
+                self.conn.execute("DELETE FROM plan_steps WHERE plan_id = ?", (op["id"],))
+        elif key in QUEUE_TABLES:
+            table, column, field = QUEUE_TABLES[key]
+            self.conn.execute(f"DELETE FROM {table}")
+            if kind == "set":
+                self.put_queue(table, column, field, op["value"] or [])
+        elif task_key(key):
+            self.put_task_value(*task_key(key), op.get("value") if kind == "set" else None)
+        elif kind == "set":
+            self.put_kv(key, op["value"])
+        elif kind == "del":
+            self.conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            self.conn.execute("DELETE FROM records WHERE key = ?", (key,))
+        elif kind == "put":
+            # Record change inside a dict-valued key (e.g. one mission)
+            self.put_record(key, op["id"], op["value"])
+        elif kind == "drop":
+            self.conn.execute("DELETE FROM records WHERE key = ? AND record_id = ?", (key, op["id"]))
+
+    def put_goal(self, goal):
+        data = as_json(goal)
+        text = dumps(data)
+        self.bytes += len(text)
+        self.conn.execute(
+            "INSERT INTO goals (goal_id, owner_agent_id, mission_id, status, type, score,"
+            " created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (goal_id) DO UPDATE SET owner_agent_id = excluded.owner_agent_id,"
+            " mission_id = excluded.mission_id, status = excluded.status, type = excluded.type,"
+            " score = excluded.score, created_at = excluded.created_at,"
+            " updated_at = excluded.updated_at, data = excluded.data",
+            (
+                data.get("goal_id"), data.get("owner_agent_id"), data.get("mission_id"),
+                data.get("status"), data.get("normalized_type") or data.get("type"),
+                data.get("score"), to_epoch(data.get("created_at")),
+                to_epoch(data.get("updated_at")), text,
+            ),
+        )
+
+    def put_plan(self, plan):
+        data = dict(as_json(plan))
+        steps = data.pop("steps", None) or []
+        text = dumps(data)
+        self.bytes += len(text)
+        self.conn.execute(
+            "INSERT INTO plans (plan_id, goal_id, status, created_at, data) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (plan_id) DO UPDATE SET goal_id = excluded.goal_id,"
+            " status = excluded.status, created_at = excluded.created_at, data = excluded.data",
+            (data.get("plan_id"), data.get("goal_id"), data.get("status"), to_epoch(data.get("created_at")), text),
+        )
+
+        plan_id = data.get("plan_id")
+        self.conn.execute("DELETE FROM plan_steps WHERE plan_id = ? AND position >= ?", (plan_id, len(steps)))
+        for position, step in enumerate(steps):
+            step = as_json(step)
+            text = dumps(step)
+            self.bytes += len(text)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO plan_steps (plan_id, position, step_id, action, status,"
+                " retry_count, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (plan_id, position, step.get("step_id"), step.get("action"),
+                 step.get("status"), step.get("retry_count"), text),
+            )
+
+    def put_queue(self, table, column, field, items):
+        rows = []
+        for position, item in enumerate(items):
+            text = dumps(item)
+            self.bytes += len(text)
+            rows.append((position, item.get(field), item.get("plan_step_id"), text))
+
+        if table == "intents":
+            self.conn.executemany(
+                "INSERT INTO intents (position, action, plan_step_id, data) VALUES (?, ?, ?, ?)", rows
+            )
+        else:
+            self.conn.executemany(
+                f"INSERT INTO {table} (position, {column}, data) VALUES (?, ?, ?)",
+                [(position, value, text) for position, value, _, text in rows],
+            )
+
+    def put_task_value(self, column, task, value):
+        if column == "last_run":
+            value = to_epoch(value)
+        elif column == "disabled" and value is not None:
+            value = int(bool(value))
+        self.conn.execute(
+            f"INSERT INTO task_runtime (task, {column}) VALUES (?, ?)"
+            f" ON CONFLICT (task) DO UPDATE SET {column} = excluded.{column}",
+            (task, value),
+        )
+
+    def put_kv(self, key, value):
+        self.conn.execute("DELETE FROM records WHERE key = ?", (key,))
+        if isinstance(value, dict):
+            # Split into records under an empty shell (see SCHEMA)
+            rows = [(key, record_id, dumps(record)) for record_id, record in value.items()]
+            self.bytes += sum(len(text) for _, _, text in rows)
+            self.conn.executemany("INSERT INTO records (key, record_id, value) VALUES (?, ?, ?)", rows)
+            value = {}
+
+        text = dumps(value)
+        self.bytes += len(text)
+        self.conn.execute(
+            "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, text),
+        )
+
+    def put_record(self, key, record_id, value):
+        text = dumps(value)
+        self.bytes += len(text)
+        self.conn.execute("INSERT OR IGNORE INTO kv (key, value) VALUES (?, '{}')", (key,))
+        self.conn.execute(
+            "INSERT INTO records (key, record_id, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (key, record_id) DO UPDATE SET value = excluded.value",
+            (key, record_id, text),
+        )
+
+
+def read_tables(conn):
+    """
+    The state dict held in a database.
+    """
+    data = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM kv")}
+
+    # Read-only connections may still see a database from before `records`
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= 2:
+        for key, record_id, value in conn.execute("SELECT key, record_id, value FROM records"):
+            collection = data.get(key)
+            if isinstance(collection, dict):
+                collection[record_id] = json.loads(value)
+
+    for task, last_run, retry_count, disabled, disabled_at in conn.execute(
+        "SELECT task, last_run, retry_count, disabled, disabled_at FROM task_runtime"
+    ):
+        for column, value in (
+            ("last_run", last_run),
+            ("retry_count", retry_count),
+            ("disabled", None if disabled is None else bool(disabled)),
+            ("disabled_at", disabled_at),
+        ):
+            if value is not None:
+                data[f"{column}_{task}"] = value
+
+    for key, (table, _, _) in QUEUE_TABLES.items():
+        data[key] = [json.loads(row[0]) for row in conn.execute(f"SELECT data FROM {table} ORDER BY position")]
+
+    steps = {}
+    for plan_id, step in conn.execute("SELECT plan_id, data FROM plan_steps ORDER BY plan_id, position"):
+        steps.setdefault(plan_id, []).append(json.loads(step))
+
+    data["goals"] = [json.loads(row[0]) for row in conn.execute("SELECT data FROM goals ORDER BY rowid")]
+    data["plans"] = []
+    for plan_id, text in conn.execute("SELECT plan_id, data FROM plans ORDER BY rowid"):
+        plan = json.loads(text)
+        plan["steps"] = steps.get(plan_id, [])
+        data["plans"].append(plan)
+
+    for key, decode in RECORD_DECODERS.items():
+        if data.get(key):
+            data[key] = [decode(value) for value in data[key]]
+
+    return data
+
+
+def upgrade(conn, version):
+    """
+    Bring a database written by an older schema up to SCHEMA_VERSION.
+    """
+    if version < 2:
+        # Dict-valued kv blobs -> one records row per entry
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            writer = RowWriter(conn)
+            for key, text in conn.execute("SELECT key, value FROM kv").fetchall():
+                value = json.loads(text)
+                if isinstance(value, dict) and value:
+                    writer.put_kv(key, value)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# ======================================================
+# MIGRATION (JSON snapshot + journal -> SQLite)
+# ======================================================
+
+def legacy_paths(directory):
+    return os.path.join(directory, MEMORY_FILE), os.path.join(directory, JOURNAL_FILE)
+
+
+def has_legacy_state(directory):
+    return any(os.path.exists(path) for path in legacy_paths(directory))
+
+
+def migrate(directory=".", force=False):
+    """
+    One-shot copy of directory/MEMORY_FILE (+ journal) into
+    directory/STATE_DB_FILE. The JSON files are left in place.
+    Returns the database path, or None when there was nothing to do.
+    """
+    db_path = os.path.join(directory, STATE_DB_FILE)
+    if os.path.exists(db_path) and not force:
+        log(f"[STATE] {db_path} already exists; not migrating")
+        return None
+    if not has_legacy_state(directory):
+        return None
+
+    state = JournaledStateStore(*legacy_paths(directory)).load(read_only=True)
+    store = SqliteStateStore(db_path)
+    store.state = state
+    store.write_all()
+    store.compact()
+    store.close()
+
+    log(f"[STATE] Migrated {legacy_paths(directory)[0]} to {db_path} "
+        f"({len(state.get('goals', []))} goals, {len(state.get('plans', []))} plans)")
+    return db_path
+
+
+def migrate_all(force=False):
+    """
+    The default state directory and every agent partition under AGENT_STATE_DIR.
+    """
+    directories = ["."]
+    if os.path.isdir(AGENT_STATE_DIR):
+        directories += sorted(
+            os.path.join(AGENT_STATE_DIR, name) for name in os.listdir(AGENT_STATE_DIR)
+            if os.path.isdir(os.path.join(AGENT_STATE_DIR, name))
+        )
+    return [path for path in (migrate(d, force) for d in directories) if path]
+
+
+if __name__ == "__main__":
+    # python sqlite_store.py migrate [--force] [dir ...]
+    # python sqlite_store.py pending <agent_id> [limit]
+    import registry   # registers the goal / plan record types
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+
+    if command == "migrate":
+        force = "--force" in sys.argv
+        directories = [arg for arg in sys.argv[2:] if arg != "--force"]
+        if directories:
+            migrated = [path for path in (migrate(d, force) for d in directories) if path]
+        else:
+            migrated = migrate_all(force)
+        print(f"Migrated {len(migrated)} state file(s)")
+    elif command == "pending":
+        limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        store = SqliteStateStore(STATE_DB_FILE)
+        for goal in store.pending_goals(sys.argv[2], limit, read_only=True):
+            print(f"{goal.get('score')!s:>5}  {goal['goal_id']}  {goal.get('description')}")
+    else:
+        print("usage: python sqlite_store.py migrate [--force] [dir ...] | pending <agent_id> [limit]")
@@ -0,0 +1,450 @@
+import json
+import os
+
+from logger import log
+from records import json_default
+
+
+# ======================================================
+# DIRTY-TRACKING STATE
+# ======================================================
+
+# Collections stored as lists of records, journaled per record id
+RECORD_COLLECTIONS = {
+    "goals": "goal_id",
+    "plans": "plan_id",
+}
+
+# Collection key -> decode(json dict) -> record object, applied on load
+# and replay. Records are written back through records.json_default.
+RECORD_DECODERS = {}
+
+
+def register_record_type(key, decode):
+    RECORD_DECODERS[key] = decode
+
+
+class TrackedState(dict):
+    """
+    Agent state dict that remembers which keys changed since the last commit.
+
+    Top-level assignments are tracked automatically. In-place changes to
+    nested values (a goal's status, a step inside a plan, one entry of the
+    missions dict) must be reported with mark_dirty() so only that record
+    is journaled instead of the whole collection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty_keys = set()
+        self.dirty_records = {}
+        self.deleted_keys = set()
+        self.deleted_records = {}
+        # Optional fast (key, record_id) -> record lookup, set by registry
+        self.record_resolver = None
+        # In-memory helper structures (indexes, queues) bound to this state
+        self.attachments = {}
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._forget(key)
+
+    def pop(self, key, *default):
+        had_key = key in self
+        value = super().pop(key, *default)
+        if had_key:
+            self._forget(key)
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._forget(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self.keys()):
+            del self[key]
+
+    def mark_dirty(self, key, record_id=None):
+        if record_id is None:
+            self._touch(key)
+            return
+
+        if key in self.dirty_keys:
+            return
+
+        self.dirty_records.setdefault(key, set()).add(record_id)
+        self.deleted_records.get(key, set()).discard(record_id)
+
+    def mark_removed(self, key, record_id):
+        if key in self.dirty_keys:
+            return
+
+        self.deleted_records.setdefault(key, set()).add(record_id)
+        self.dirty_records.get(key, set()).discard(record_id)
+
+    def is_dirty(self):
+        return bool(
+            self.dirty_keys or self.deleted_keys
+            or any(self.dirty_records.values())
+            or any(self.deleted_records.values())
+        )
+
+    def reset_dirty(self):
+        self.dirty_keys = set()
+        self.dirty_records = {}
+        self.deleted_keys = set()
+        self.deleted_records = {}
+
+    def _touch(self, key):
+        self.dirty_keys.add(key)
+        self.deleted_keys.discard(key)
+        # A whole-key write supersedes any pending per-record changes
+        self.dirty_records.pop(key, None)
+        self.deleted_records.pop(key, None)
+
+    def _forget(self, key):
+        self.deleted_keys.add(key)
+        self.dirty_keys.discard(key)
+        self.dirty_records.pop(key, None)
+        self.deleted_records.pop(key, None)
+
+
+def mark_dirty(state, key, record_id=None):
+    """
+    Report an in-place change to state[key] (or one record inside it).
+    No-op for plain dicts, which are always saved in full.
+    """
+    if isinstance(state, TrackedState):
+        state.mark_dirty(key, record_id)
+
+
+def mark_removed(state, key, record_id):
+    if isinstance(state, TrackedState):
+        state.mark_removed(key, record_id)
+
+
+def get_attachment(state, name):
+    """
+    Fetch an in-memory helper object previously bound to this state.
+    """
+    if isinstance(state, TrackedState):
+        return state.attachments.get(name)
+
+    entry = _plain_attachments.get(name)
+    if entry and entry[0] is state:
+        return entry[1]
+    return None
+
+
+def set_attachment(state, name, value):
+    if isinstance(state, TrackedState):
+        state.attachments[name] = value
+    else:
+        # Plain dicts (ad-hoc/test states) keep only the latest binding
+        _plain_attachments[name] = (state, value)
+
+
+_plain_attachments = {}
+
+
+def iter_records(collection, key, record_ids):
+    """
+    Yield (record_id, record) for the requested ids, in one pass over a
+    list collection or by direct lookup in a dict-valued key.
+    """
+    if not collection:
+        return
+
+    if isinstance(collection, dict):
+        for record_id in record_ids:
+            if record_id in collection:
+                yield record_id, collection[record_id]
+        return
+
+    id_field = RECORD_COLLECTIONS.get(key)
+    for record in collection:
+        record_id = record.get(id_field)
+        if record_id in record_ids:
+            yield record_id, record
+
+
+def collect_ops(state):
+    """
+    The pending changes of a state as journal ops (del / set / drop / put),
+    shared by every backend.
+    """
+    ops = []
+
+    for key in state.deleted_keys:
+        ops.append({"op": "del", "key": key})
+
+    for key in state.dirty_keys:
+        ops.append({"op": "set", "key": key, "value": state[key]})
+
+    for key, record_ids in state.deleted_records.items():
+        for record_id in record_ids:
+            ops.append({"op": "drop", "key": key, "id": record_id})
+
+    for key, record_ids in state.dirty_records.items():
+        if not record_ids:
+            continue
+        if state.record_resolver is not None and key in RECORD_COLLECTIONS:
+            records = (
+                (record_id, state.record_resolver(key, record_id))
+                for record_id in record_ids
+            )
+        else:
+            records = iter_records(state.get(key), key, record_ids)
+
+        for record_id, record in records:
+            if record is None:
+                continue
+            ops.append({"op": "put", "key": key, "id": record_id, "value": record})
+
+    return ops
+
+
+# ======================================================
+# JOURNALED STORE
+# ======================================================
+
+class JournaledStateStore:
+    """
+    Keeps agent state in memory across ticks.
+
+    Each commit appends one JSON line with the changed keys/records to an
+    append-only journal. When the journal grows past compact_every batches
+    it is folded into a fresh snapshot (written atomically) and truncated.
+    Recovery = load snapshot + replay every complete journal line; a torn
+    final line from a crash is ignored.
+    """
+
+    def __init__(self, snapshot_path, journal_path, compact_every=200, fsync=True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.directory = os.path.dirname(snapshot_path) or "."
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.state = None
+        self.journal_batches = 0
+        self.seq = 0
+        self.last_commit_bytes = 0
+        self._replay_positions = {}
+        self._pending_drops = {}
+
+    # ---------- LOAD / RECOVERY ----------
+
+    def load(self, read_only=False):
+        """
+        State from snapshot + journal. read_only leaves the files alone
+        (no torn-tail truncation) and does not keep the result, for
+        inspecting the state of a running agent from another process.
+        """
+        if self.state is not None and not read_only:
+            return self.state
+        previous = self.state
+
+        data = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as file:
+                data = json.load(file)
+
+        for key, decode in RECORD_DECODERS.items():
+            if data.get(key):
+                data[key] = [decode(value) for value in data[key]]
+
+        self.state = TrackedState(data)
+        self._replay_positions = {}
+        replayed = self._replay_journal(truncate=not read_only)
+        self._replay_positions = {}
+        self.state.reset_dirty()
+
+        if read_only:
+            state, self.state = self.state, previous
+            return state
+
+        if replayed:
+            log(f"[STATE] Recovered {replayed} journal batches")
+
+        return self.state
+
+    def _replay_journal(self, truncate=True):
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        replayed = 0
+        valid_bytes = 0
+
+        with open(self.journal_path, "rb") as file:
+            for raw in file:
+                try:
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("unterminated batch")
+                    batch = json.loads(raw)
+                except ValueError:
+                    log("[STATE] Ignoring torn journal tail")
+                    break
+
+                for op in batch.get("ops", []):
+                    self._apply(op)
+                self._flush_drops()
+
+                self.seq = batch.get("seq", self.seq)
+                valid_bytes += len(raw)
+                replayed += 1
+
+        # Drop a torn tail so new batches start on a clean line
+        if truncate and valid_bytes != os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as file:
+                file.truncate(valid_bytes)
+
+        self.journal_batches = replayed
+        return replayed
+
+    def _apply(self, op):
+        state = self.state
+        kind = op["op"]
+        key = op["key"]
+
+        if kind != "drop":
+            self._flush_drops(key)
+
+        if kind == "set":
+            value = op["value"]
+            decode = RECORD_DECODERS.get(key)
+            if decode is not None and value:
+                value = [decode(item) for item in value]
+            dict.__setitem__(state, key, value)
+            self._replay_positions.pop(key, None)
+        elif kind == "del":
+            dict.pop(state, key, None)
+            self._replay_positions.pop(key, None)
+        elif kind == "put":
+            self._put_record(key, op["id"], op["value"])
+        elif kind == "drop":
+            self._drop_record(key, op["id"])
+
+    def _put_record(self, key, record_id, value):
+        collection = self.state.get(key)
+        decode = RECORD_DECODERS.get(key)
+        if decode is not None:
+            value = decode(value)
+
+        if key in RECORD_COLLECTIONS:
+            if collection is None:
+                collection = []
+                dict.__setitem__(self.state, key, collection)
+            positions = self._positions(key, collection)
+            if record_id in positions:
+                collection[positions[record_id]] = value
+            else:
+                positions[record_id] = len(collection)
+                collection.append(value)
+        else:
+            if collection is None:
+                collection = {}
+                dict.__setitem__(self.state, key, collection)
+            collection[record_id] = value
+
+    def _drop_record(self, key, record_id):
+        collection = self.state.get(key)
+        if collection is None:
+            return
+
+        if key in RECORD_COLLECTIONS:
+            # Batched: one pass over the list per key, not one per record
+            self._pending_drops.setdefault(key, set()).add(record_id)
+        else:
+            collection.pop(record_id, None)
+
+    def _flush_drops(self, key=None):
+        keys = [key] if key is not None else list(self._pending_drops)
+        for k in keys:
+            record_ids = self._pending_drops.pop(k, None)
+            if not record_ids:
+                continue
+            id_field = RECORD_COLLECTIONS[k]
+            collection = self.state.get(k) or []
+            collection[:] = [r for r in collection if r.get(id_field) not in record_ids]
+            self._replay_positions.pop(k, None)
+
+    def _positions(self, key, collection):
+        positions = self._replay_positions.get(key)
+        if positions is None:
+            id_field = RECORD_COLLECTIONS[key]
+            positions = {r.get(id_field): i for i, r in enumerate(collection)}
+            self._replay_positions[key] = positions
+        return positions
+
+    # ---------- COMMIT ----------
+
+    def commit(self, state):
+        if state is not self.state:
+            # Foreign dict (e.g. built by hand): adopt it and snapshot fully
+            self.state = state if isinstance(state, TrackedState) else TrackedState(state)
+            self.compact()
+            return
+
+        if not state.is_dirty():
+            self.last_commit_bytes = 0
+            return
+
+        ops = collect_ops(state)
+        self.seq += 1
+        line = json.dumps({"seq": self.seq, "ops": ops}, separators=(",", ":"), default=json_default) + "\n"
+
+        with open(self.journal_path, "a") as file:
+            file.write(line)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+        self.last_commit_bytes = len(line)
+        self.journal_batches += 1
+        state.reset_dirty()
+
+        if self.journal_batches >= self.compact_every:
+            self.compact()
+
+    def close(self):
+        # Every commit is already on disk; nothing to release
+        self.state = None
+
+    def compact(self):
+        """
+        Fold the journal into a new snapshot and truncate it.
+        """
+        tmp_path = self.snapshot_path + ".tmp"
+
+        with open(tmp_path, "w") as file:
+            json.dump(self.state, file, separators=(",", ":"), default=json_default)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Replaying the old journal over the new snapshot is idempotent,
+        # so a crash between replace and truncate is harmless.
+        with open(self.journal_path, "w") as file:
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+        self.last_commit_bytes = os.path.getsize(self.snapshot_path)
+        self.journal_batches = 0
+        self.state.reset_dirty()
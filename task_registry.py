@@ -0,0 +1,136 @@
+import asyncio
+from dataclasses import dataclass, field
+
+
+# ======================================================
+# TASK SPECS
+# ======================================================
+
+@dataclass(slots=True)
+class TaskSpec:
+    """
+    One registered task. Everything the dispatcher needs per run (state
+    keys, call signature) is worked out here once, not on every tick.
+    """
+
+    name: str
+    fn: object
+    priority: int = 50
+    cooldown_seconds: float = 0
+    max_retries: int = 0
+    wake_on: str = None
+    needs_agent: bool = False
+
+    # Compiled
+    seq: int = 0                    # registration order (breaks priority ties)
+    call: object = field(default=None, repr=False)      # call(state, agent)
+    is_async: bool = False
+    paused_key: str = ""
+    retry_key: str = ""
+    last_run_key: str = ""
+
+    def __post_init__(self):
+        self.call = self.adapt(self.fn)
+        self.is_async = asyncio.iscoroutinefunction(self.fn)
+        self.paused_key = f"paused_{self.name}"
+        self.retry_key = f"retry_count_{self.name}"
+        self.last_run_key = f"last_run_{self.name}"
+
+    def adapt(self, fn):
+        """
+        fn behind this task's uniform call(state, agent) signature.
+        """
+        if self.needs_agent:
+            return fn
+        return lambda state, agent: fn(state)
+
+
+# ======================================================
+# REGISTRATION
+# ======================================================
+
+_specs = {}      # name -> TaskSpec, in registration order
+_table = None    # compiled DispatchTable, rebuilt after a registration
+_seq = 0         # registrations so far
+
+
+def task(name, priority=50, cooldown_seconds=0, max_retries=0, wake_on=None, needs_agent=False):
+    """
+    Decorator registering fn as a scheduled task:
+
+        @task("heartbeat", priority=1)
+        def heartbeat_task(state): ...
+
+        @task("plan_executor", priority=5, cooldown_seconds=1, wake_on="plan", needs_agent=True)
+        def execute_plan_step(state, agent): ...
+    """
+    def register(fn):
+        register_task(TaskSpec(
+            name=name,
+            fn=fn,
+            priority=priority,
+            cooldown_seconds=cooldown_seconds,
+            max_retries=max_retries,
+            wake_on=wake_on,
+            needs_agent=needs_agent,
+        ))
+        return fn
+    return register
+
+
+def register_task(spec):
+    global _table, _seq
+    if spec.name in _specs:
+        raise ValueError(f"Task '{spec.name}' is already registered")
+    _seq += 1
+    spec.seq = _seq
+    _specs[spec.name] = spec
+    _table = None
+
+
+def unregister_task(name):
+    global _table
+    if _specs.pop(name, None) is not None:
+        _table = None
+
+
+# ======================================================
+# DISPATCH TABLE
+# ======================================================
+
+class DispatchTable:
+    """
+    Registered tasks compiled for the scheduler: ordered by priority, then
+    registration order (as the old TASK_REGISTRY list was), indexed by
+    name and by wake_on trigger.
+    """
+
+    def __init__(self, specs):
+        self.specs = tuple(sorted(specs, key=lambda s: (s.priority, s.seq)))
+        self.by_name = {spec.name: spec for spec in self.specs}
+        self.rank = {spec.name: rank for rank, spec in enumerate(self.specs)}
+
+        self.wake_index = {}
+        for spec in self.specs:
+            if spec.wake_on:
+                self.wake_index.setdefault(spec.wake_on, []).append(spec)
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __getitem__(self, name):
+        return self.by_name[name]
+
+
+def dispatch_table():
+    """
+    The compiled table of every registered task (compiled on first use
+    after a registration).
+    """
+    global _table
+    if _table is None:
+        _table = DispatchTable(_specs.values())
+    return _table
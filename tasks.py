@@ -1,16 +1,46 @@
 from datetime import datetime, timedelta
 from datetime import datetime, timedelta
-import traceback
+import time
 
 import goal
-from logger import log
+from plan import Plan, PlanStep
+import logger
+from logger import log, log_exception
 import goal_selector
-from config import AGENT_NAME
-from memory import load_state, save_state
+import plan_dag
+import scoring
+import archive
+import analytics
+from scoring import GOAL_TYPE_MAP, GOAL_TYPE_PRIORITY
+from config import (
+    AGENT_NAME,
+    TASK_MIN_INTERVAL_SECONDS,
+    EVENT_BATCH_MAX_ITEMS,
+    EVENT_BATCH_BUDGET_MS,
+    INTENT_BATCH_MAX_ITEMS,
+    INTENT_BATCH_BUDGET_MS,
+    MAX_ACTIVE_GOALS_PER_AGENT,
+    MAX_ACTIVE_GOALS_PER_MISSION,
+    PLAN_SCHEDULING,
+    PLAN_DISPATCH_MAX_STEPS,
+    ASYNC_INTENT_TIMEOUT_SECONDS,
+)
+from batching import drain_queue
+from priority_queue import get_event_queue
+from durable_queue import get_intent_queue
+from backpressure import get_backpressure
+import scheduler
+from task_registry import task, dispatch_table
+from memory import load_state, save_state, mark_dirty
+from state_store import get_attachment, set_attachment
+import registry
 from events import detect_file_event
 from decisions import decide_intents
 from policies import policy_allows_intent, policy_allows_override
-from actions import ACTION_REGISTRY
+import policy_engine
+import action_plugins
+from worker_pool import get_pools, apply_changes
+import metrics
 
 
 # ======================================================
@@ -29,132 +59,185 @@ def is_task_paused(state, task_name):
 # ======================================================
 
 def generate_plan_for_goal(goal):
-    plan_id = f"plan_{goal['goal_id']}"
+    plan_id = f"plan_{goal.goal_id}"
+    payload = (goal.related_intent or {}).get("payload", {})
 
+    # depends_on makes the plan a DAG: every step whose dependencies are
+    # completed is dispatched at once
     steps = [
-    {
-        "step_id": f"{plan_id}_step1",
-        "action": "analyze_file",
-        "payload": goal.get("related_intent", {}).get("payload", {}),
-        "status": "pending",
-        "retry_count": 0,
-        "max_retries": 2
-    },
-    {
-        "step_id": f"{plan_id}_step2",
-        "action": "log_result",
-        "payload": {"message": f"Analysis completed for {goal['goal_id']}"},
-        "status": "pending",
-        "retry_count": 0,
-        "max_retries": 2
-    }
-]
+        PlanStep(
+            step_id=f"{plan_id}_step1",
+            action="analyze_file",
+            payload=payload,
+            depends_on=[],
+            status="pending",
+        ),
+        PlanStep(
+            step_id=f"{plan_id}_step2",
+            action="log_result",
+            payload={
+                "message": f"Analysis completed for {goal.goal_id}",
+                "file": payload.get("file"),
+            },
+            depends_on=[f"{plan_id}_step1"],
+            status="pending",
+        ),
+    ]
 
-    return {
-        "plan_id": plan_id,
-        "goal_id": goal["goal_id"],
-        "created_at": datetime.now().isoformat(),
-        "steps": steps,
-        "status": "active"
-    }
+    plan = Plan(
+        plan_id=plan_id,
+        goal_id=goal.goal_id,
+        created_at=time.time(),
+        steps=steps,
+        status="active",
+    )
+    plan_dag.validate(plan)
+    return plan
+def scheduled_plans(state, agent):
+    """
+    Active plans of the agent's active goals in dispatch order:
+    "score" → best goal first, "round_robin" → rotating start so every
+    plan gets to go first in turn.
+    """
+    plans = []
+    for goal in registry.goals_with_status(state, "active", agent.agent_id):
+        plan = registry.plan_for_goal(state, goal.goal_id, status="active")
+        if plan:
+            plans.append((goal, plan))
+
+    if PLAN_SCHEDULING == "round_robin":
+        plans.sort(key=lambda gp: gp[0].activated_at or 0)
+        cursor = state.get("plan_rr_cursor", 0) % max(1, len(plans))
+        state["plan_rr_cursor"] = cursor + 1
+        plans = plans[cursor:] + plans[:cursor]
+    else:
+        plans.sort(key=lambda gp: gp[0].score or 0, reverse=True)
+
+    return [plan for _, plan in plans]
+
+
+@task("plan_executor", priority=5, cooldown_seconds=1, max_retries=1, wake_on="plan", needs_agent=True)
 def execute_plan_step(state, agent):
-    plans = state.get("plans", [])
-    goals = state.get("goals", [])
-
-    # Find active plan
-    active_goal_id = state.get("active_goal_id")
-
-    active_plan = next(
-    (
-        p for p in plans
-        if p["status"] == "active"
-        and p.get("goal_id") == active_goal_id
-    ),
-    None
-)
-    if not active_plan:
+    if get_backpressure(state).plans_paused():
+        # Released by the intent_queue watermark (re-arms "plan")
         return
 
-    # Find first step that is pending or in_progress
-    step = next(
-        (s for s in active_plan["steps"]
-         if s["status"] in ["pending", "in_progress"]),
-        None
-    )
+    # Every active plan of this agent, sharing PLAN_DISPATCH_MAX_STEPS
+    budget = PLAN_DISPATCH_MAX_STEPS
+
+    for plan in scheduled_plans(state, agent):
+        if budget <= 0:
+            # Leftover ready steps go out on the next run
+            scheduler.notify("plan")
+            break
+        budget -= advance_plan(state, plan, limit=budget)
+
+
+def advance_plan(state, plan, limit=None):
+    """
+    Dispatch the steps whose dependencies are completed (at most `limit`),
+    or complete the plan and its goal once all steps are. Also called
+    straight from complete_intent so dependents start in the same pass.
+    Returns the number of steps dispatched.
+    """
+    if plan.status != "active":
+        return 0
 
     # If no steps left → plan complete
-    if not step:
-        active_plan["status"] = "completed"
-
-        goal_id = active_plan["goal_id"]
-        for goal in goals:
-            if goal["goal_id"] == goal_id:
-                goal["status"] = "completed"
-                goal["updated_at"] = datetime.now().isoformat()
-                log(f"[GOAL COMPLETED] {goal['description']}")
-        return
+    if plan_dag.is_complete(plan):
+        registry.set_plan_status(state, plan, "completed")
+
+        goal = registry.find_goal(state, plan["goal_id"])
+        if goal:
+            registry.set_goal_status(state, goal, "completed")
+            log("[GOAL COMPLETED] %s", goal["description"], goal_id=goal["goal_id"])
 
-    # If step is pending → dispatch intent
-    if step["status"] == "pending":
-        intent_queue = state.get("intent_queue", [])
+        # A slot freed up → next pass activates the next goal
+        scheduler.notify("plan")
+        return 0
 
-        intent_queue.append({
+    # Ready steps → dispatch intents together
+    ready = plan_dag.ready_steps(plan)
+    if limit is not None:
+        ready = ready[:limit]
+    if not ready:
+        return 0
+
+    intent_queue = get_intent_queue(state)
+
+    for step in ready:
+        intent_queue.put({
             "action": step["action"],
             "payload": step["payload"],
-            "plan_step_id": step["step_id"]
+            "plan_step_id": step["step_id"],
+            # Part of the idempotency key: a retry is a new attempt
+            "attempt": step["retry_count"],
         })
+        registry.set_step_status(state, plan, step, "in_progress")
+        log("[PLAN] Step started: %s", step["step_id"], plan_id=plan["plan_id"])
 
-        state["intent_queue"] = intent_queue
-
-        step["status"] = "in_progress"
-        log(f"[PLAN] Step started: {step['step_id']}")
-        return
+    scheduler.notify("intent")
+    return len(ready)
 
 
 # ======================================================
 # GOAL MANAGEMENT (DAY 3 + DAY 5)
 # ======================================================
 
-def activate_next_goal(state, agent):
-    goals = state.get("goals", [])
-    plans = state.get("plans", [])
+def next_goal_to_activate(state, agent):
+    """
+    Oldest pending goal of the mission with the fewest active goals that
+    is still under MAX_ACTIVE_GOALS_PER_MISSION (missions take turns).
+    """
+    best, best_active = None, None
+    for mission_id in registry.pending_missions(state, agent.agent_id):
+        active = registry.count_mission_goals(state, mission_id, "active")
+        if mission_id is not None and active >= MAX_ACTIVE_GOALS_PER_MISSION:
+            continue
+        if best_active is None or active < best_active:
+            best, best_active = mission_id, active
 
-    has_active = any(
-        g["status"] == "active" and g["owner_agent_id"] == agent.agent_id
-        for g in goals
-    )
+    if best_active is None:
+        return None
+    return registry.next_pending_goal(state, agent.agent_id, best)
 
-    if has_active:
-        return
 
-    for goal in goals:
-        if goal["status"] == "pending" and goal["owner_agent_id"] == agent.agent_id:
-            goal["status"] = "active"
-            goal["updated_at"] = datetime.now().isoformat()
+def activate_next_goal(state, agent):
+    # Fill the agent's free slots, one goal at a time
+    while registry.count_goals(state, "active", agent.agent_id) < MAX_ACTIVE_GOALS_PER_AGENT:
+        goal = next_goal_to_activate(state, agent)
+        if not goal:
+            return
+        activate_goal(state, goal)
 
-            # ✅ ADD THESE 2 LINES
-            goal["activated_at"] = datetime.now().isoformat()
-            goal["timeout_seconds"] = 7 * 24 * 60 * 60  # 7 days
 
-            log(f"[GOAL ACTIVATED] {goal['description']}")
+def activate_goal(state, goal):
+    now = time.time()
 
-            # 🔑 DAY 5: Generate plan
-            plan = generate_plan_for_goal(goal)
-            plans.append(plan)
+    # ✅ ADD THESE 2 LINES
+    goal.activated_at = now
+    goal.timeout_seconds = 7 * 24 * 60 * 60  # 7 days
+    registry.set_goal_status(state, goal, "active", now)
 
-            state["plans"] = plans
-            return
+    log("[GOAL ACTIVATED] %s", goal["description"], goal_id=goal["goal_id"])
+
+    # 🔑 DAY 5: Generate plan
+    plan = generate_plan_for_goal(goal)
+    registry.add_plan(state, plan)
+    scheduler.notify("plan")
 
 
 # ======================================================
 # CORE TASKS
 # ======================================================
 
+@task("heartbeat", priority=1)
 def heartbeat_task(state):
     count = state.get("heartbeat_count", 0) + 1
     state["heartbeat_count"] = count
     log(f"{AGENT_NAME} heartbeat #{count}")
 
+@task("status", priority=5, cooldown_seconds=15, max_retries=1)
 def status_task(state):
     log(f"{AGENT_NAME} status OK")
 
@@ -171,197 +254,368 @@ def unstable_task(state):
 # EVENT SYSTEM TASKS
 # ======================================================
 
+@task("event_listener", priority=2, cooldown_seconds=2, wake_on="watch")
 def event_listener_task(state):
+    if get_backpressure(state).listener_paused():
+        # Changes coalesce in the watcher until the event_queue drains
+        return
     detect_file_event(state)
 
+@task("event_handler", priority=3, cooldown_seconds=1, wake_on="event", needs_agent=True)
 def event_handler_task(state, agent):
-    queue = state.get("event_queue", [])
-
-    if not queue:
+    if get_backpressure(state).events_paused():
+        # Released by the pending_goals watermark (re-arms "event")
         return
 
-    event = queue.pop(0)
-    log(f"[EVENT HANDLER] Processing event: {event['type']}")
+    queue = get_event_queue(state)
+    throttled = []
+    throttled_types = set()
+
+    def handle(event):
+        # One rate-limited event holds back the rest of its type this run
+        if event["type"] in throttled_types or not handle_event(state, agent, event):
+            throttled.append(event)
+            throttled_types.add(event["type"])
+
+    drain_queue(
+        state,
+        "event_queue",
+        queue,
+        handle,
+        EVENT_BATCH_MAX_ITEMS,
+        EVENT_BATCH_BUDGET_MS,
+    )
+
+    # Rate-limited events go back for a later run
+    for event in throttled:
+        queue.push(event)
+
+    if queue:
+        scheduler.notify("event")
+
+
+def handle_event(state, agent, event):
+    """
+    Turn an event into intents and goals. Returns False, leaving it
+    unhandled and its tokens unspent, when its event type or a goal's
+    mission is rate-limited.
+    """
+    pressure = get_backpressure(state)
+    if not pressure.event_allowed(event):
+        return False
+
+    log("[EVENT HANDLER] Processing event: %s", event["type"], level="DEBUG")
 
     intents, goals = decide_intents(event, state, agent)
+    if not pressure.admit_event(event, goals):
+        return False
 
     # ----- INTENTS -----
-    intent_queue = state.get("intent_queue", [])
-    intent_queue.extend(intents)
-    state["intent_queue"] = intent_queue
+    intent_queue = get_intent_queue(state)
+    for intent in intents:
+        intent_queue.put(intent)
+    if intents:
+        scheduler.notify("intent")
 
     # ----- GOALS + MISSIONS -----
-    goal_store = state.get("goals", [])
-    missions = state.get("missions", {})
-
     for goal in goals:
-        goal_dict = goal.__dict__
-        goal_store.append(goal_dict)
+        # Multi-agent runtime: goals of another agent's mission go there
+        if _goal_router is not None and _goal_router(state, agent, goal):
+            continue
+
+        adopt_goal(state, goal)
+
+    if goals:
+        # New goals can take free slots right away
+        scheduler.notify("plan")
+    return True
+
+
+def adopt_goal(state, goal):
+    """
+    Add a goal (Goal or its JSON dict) to this state and bind it to its
+    mission.
+    """
+    goal = registry.add_goal(state, goal)
+    log(f"[GOAL CREATED] {goal.description}")
 
-        mission_id = goal_dict.get("mission_id")
-        if mission_id:
-            missions.setdefault(mission_id, []).append(goal_dict["goal_id"])
+    mission_id = goal.mission_id
+    if mission_id:
+        missions = state.setdefault("missions", {})
+        missions.setdefault(mission_id, []).append(goal.goal_id)
+        mark_dirty(state, "missions", mission_id)
 
-    state["goals"] = goal_store
-    state["missions"] = missions
-    state["event_queue"] = queue
+
+# (state, agent, goal) -> True when the goal was handed to another agent
+_goal_router = None
+
+
+def set_goal_router(router):
+    global _goal_router
+    _goal_router = router
 
 
 # ======================================================
 # RECOVERY TASK
 # ======================================================
 
+@task("recovery", priority=90, cooldown_seconds=30)
 def recovery_task(state):
     now = datetime.now()
 
-    for key in list(state.keys()):
-        if key.startswith("disabled_") and not key.startswith("disabled_at_") and state.get(key):
-            task_name = key.replace("disabled_", "")
-            disabled_at_key = f"disabled_at_{task_name}"
-            disabled_at = state.get(disabled_at_key)
+    for task_name in list(policy_engine.disabled_tasks(state)):
+        disabled_at_key = f"disabled_at_{task_name}"
+        disabled_at = state.get(disabled_at_key)
 
-            if not disabled_at:
-                state[disabled_at_key] = now.isoformat()
-                continue
+        if not disabled_at:
+            state[disabled_at_key] = now.isoformat()
+            continue
 
-            disabled_time = datetime.fromisoformat(disabled_at)
+        disabled_time = datetime.fromisoformat(disabled_at)
 
-            if now - disabled_time > timedelta(seconds=60):
-                log(f"[RECOVERY] Re-enabling task '{task_name}'")
+        if now - disabled_time > timedelta(seconds=60):
+            log(f"[RECOVERY] Re-enabling task '{task_name}'")
 
-                state[f"disabled_{task_name}"] = False
-                state.pop(f"retry_count_{task_name}", None)
-                state.pop(disabled_at_key, None)
+            policy_engine.set_task_disabled(state, task_name, False)
+            state.pop(f"retry_count_{task_name}", None)
 
-def goal_timeout_task(state):
-    now = datetime.now()
-    goals = state.get("goals", [])
 
-    for goal in goals:
-        if goal["status"] == "active":
-            activated_at = goal.get("activated_at")
-            timeout_seconds = goal.get("timeout_seconds")
+# ======================================================
+# INTENT → ACTION EXECUTION
+# ======================================================
+def find_plan_and_step(state, step_id):
+    return registry.find_plan_and_step(state, step_id)
 
-            if not activated_at or not timeout_seconds:
-                continue
+def intent_allowed(intent, state):
+    if not policy_allows_intent(intent, state):
+        if policy_allows_override(state):
+            log(f"[OVERRIDE] Forcing action execution: {intent.get('action')}")
+        else:
+            log(f"[INTENT BLOCKED] {intent.get('action')}")
+            return False
+    return True
 
-            activated_time = datetime.fromisoformat(activated_at)
 
-            if (now - activated_time).total_seconds() > timeout_seconds:
-                goal["status"] = "failed"
-                goal["updated_at"] = now.isoformat()
-                log(f"[GOAL TIMEOUT] {goal['description']} exceeded time limit.")
+def resolve_action(action_name):
+    """
+    ActionSpec for action_name, its module imported on first use.
+    """
+    return action_plugins.resolve_action(action_name)
 
 
-def calculate_goal_score(goal):
-    status = goal.get("status")
+def intent_already_done(state, intent):
+    """
+    Idempotency check for a (re)delivered intent: its step attempt is no
+    longer the one in progress (completed, retried, failed or archived).
+    """
+    plan_step_id = intent.get("plan_step_id")
+    if not plan_step_id:
+        return False
 
-    if status == "completed":
-        return 100
+    _, step = find_plan_and_step(state, plan_step_id)
+    if not step:
+        return True
+    return step["status"] != "in_progress" or step["retry_count"] != intent.get("attempt", step["retry_count"])
 
-    if status == "active":
-        return 70
 
-    if status == "pending":
-        return 50
+def complete_intent(state, intent):
+    # ✅ SUCCESS
+    get_intent_queue(state).ack(intent)
+    plan_step_id = intent.get("plan_step_id")
+    if not plan_step_id:
+        return
 
-    if status == "failed":
-        return 20
+    plan, step = find_plan_and_step(state, plan_step_id)
+    if step:
+        registry.set_step_status(state, plan, step, "completed")
+        log("[PLAN] Step completed: %s", step["step_id"], plan_id=plan["plan_id"])
 
-    return 0
-GOAL_TYPE_PRIORITY = {
-    "career": 1.5,
-    "skill": 1.3,
-    "fitness": 1.1,
-    "misc": 1.0
-}
-GOAL_TYPE_MAP = {
-    "analyze_file": "skill",
-    "analyze_change": "skill",
-    "study": "skill",
-    "project": "career",
-    "placement": "career",
-    "job": "career",
-    "gym": "fitness",
-    "workout": "fitness",
-}
+        # Unblocked dependents go out now, not on the next plan_executor run
+        advance_plan(state, plan)
 
 
-# ======================================================
-# INTENT → ACTION EXECUTION
-# ======================================================
-def find_plan_and_step(state, step_id):
-    for plan in state.get("plans", []):
-        for step in plan.get("steps", []):
-            if step["step_id"] == step_id:
-                return plan, step
-    return None, None
+def fail_intent(state, intent, error):
+    get_intent_queue(state).ack(intent)
+    action_name = intent.get("action")
+    log_exception(
+        "[ACTION FAILURE] %s: %s", error, action_name, error,
+        step_id=intent.get("plan_step_id"),
+    )
 
-def intent_executor_task(state):
-    intents = state.get("intent_queue", [])
+    # ❌ FAILURE HANDLING
+    plan_step_id = intent.get("plan_step_id")
+    if not plan_step_id:
+        return
 
-    if not intents:
+    plan, step = find_plan_and_step(state, plan_step_id)
+    if not step:
         return
 
-    intent = intents.pop(0)
+    step["retry_count"] += 1
+    mark_dirty(state, "plans", plan["plan_id"])
+
+    if step["retry_count"] < step["max_retries"]:
+        registry.set_step_status(state, plan, step, "pending")
+        scheduler.notify("plan")
+        log(
+            "[PLAN RETRY] %s retry %d/%d", step["step_id"], step["retry_count"], step["max_retries"],
+            level="WARNING", plan_id=plan["plan_id"],
+        )
+    else:
+        registry.set_step_status(state, plan, step, "failed")
+        registry.set_plan_status(state, plan, "failed")
+        log("[PLAN FAILED] Step %s exceeded retries", step["step_id"], level="ERROR", plan_id=plan["plan_id"])
+
+        # Fail goal
+        goal = registry.find_goal(state, plan.get("goal_id"))
+        if goal:
+            registry.set_goal_status(state, goal, "failed")
+            log("[GOAL FAILED] %s", goal["description"], level="ERROR", goal_id=goal["goal_id"])
+
+
+def apply_intent_result(state, intent, changes, error):
+    """
+    Outcome of an action that ran in a worker pool: merge what it changed,
+    then complete or fail the intent exactly as an inline run would.
+    """
+    metrics.record_action(
+        intent.get("action"), changes["seconds"] if changes else None, failed=error is not None
+    )
 
-    if not policy_allows_intent(intent, state):
-        if policy_allows_override(state):
-            log(f"[OVERRIDE] Forcing action execution: {intent.get('action')}")
-        else:
-            log(f"[INTENT BLOCKED] {intent.get('action')}")
-            state["intent_queue"] = intents
-            return
+    if error is not None:
+        fail_intent(state, intent, error)
+        return
+
+    apply_changes(state, changes)
+
+    after_apply = resolve_action(intent.get("action")).after_apply
+    if after_apply:
+        after_apply(state)
+
+    complete_intent(state, intent)
+
+
+@task("intent_executor", priority=4, cooldown_seconds=1, max_retries=1, wake_on="intent")
+def intent_executor_task(state):
+    # Results from pool workers finished since the last run
+    for intent, changes, error in get_pools().harvest(state):
+        apply_intent_result(state, intent, changes, error)
+
+    # Intents still running in the pools keep their lease
+    intent_queue = get_intent_queue(state)
+    for intent in intent_queue.redeliver_expired(running=get_pools().running_keys(state)):
+        fail_intent(state, intent, TimeoutError(f"Lease expired {intent_queue.max_deliveries} times"))
+
+    # Repeat while completions keep unblocking plan steps, within one
+    # batch's item/time budget
+    started = time.perf_counter()
+    handled = 0
+    throttled = []
+    throttled_actions = set()
+
+    def handle(intent):
+        # One rate-limited intent holds back the rest of its action this run
+        if intent.get("action") in throttled_actions or not execute_intent(state, intent):
+            throttled.append(intent)
+            throttled_actions.add(intent.get("action"))
+
+    while handled < INTENT_BATCH_MAX_ITEMS and intent_queue:
+        remaining_ms = INTENT_BATCH_BUDGET_MS - (time.perf_counter() - started) * 1000
+        if remaining_ms <= 0:
+            break
+
+        count = drain_queue(
+            state,
+            "intent_queue",
+            intent_queue,
+            handle,
+            INTENT_BATCH_MAX_ITEMS - handled,
+            remaining_ms,
+        )
+        if not count:
+            break
+        handled += count
+
+    # Rate-limited intents give their lease back for a later run
+    for intent in throttled:
+        intent_queue.release(intent)
+
+    if intent_queue:
+        scheduler.notify("intent")
+
+
+def execute_intent(state, intent):
+    """
+    Returns False, leaving the intent leased, when its action is
+    rate-limited; the caller releases it.
+    """
+    if intent_already_done(state, intent):
+        log("[QUEUE] Skipping redelivered intent: %s", intent.get("action"), step_id=intent.get("plan_step_id"))
+        get_intent_queue(state).ack(intent)
+        return True
+
+    if not intent_allowed(intent, state):
+        get_intent_queue(state).ack(intent)
+        return True
 
     action_name = intent.get("action")
     payload = intent.get("payload", {})
-    plan_step_id = intent.get("plan_step_id")
 
-    log(f"[INTENT] Executing action: {action_name}")
+    entry = resolve_action(action_name)
+    if not get_backpressure(state).allow_action(entry):
+        return False
 
-    action_fn = ACTION_REGISTRY.get(action_name)
+    log("[INTENT] Executing action: %s", action_name, step_id=intent.get("plan_step_id"))
 
-    if not action_fn:
-     raise RuntimeError(f"No executor registered for action '{action_name}'")
+    if entry.target != "inline":
+        # Finishes in the background; picked up by the next harvest
+        pools = get_pools()
+        pools.track(
+            pools.submit(entry, action_name, payload, state),
+            intent,
+            state,
+            entry.timeout_seconds or ASYNC_INTENT_TIMEOUT_SECONDS,
+        )
+        return True
 
+    started = time.perf_counter()
     try:
-        action_fn(payload, state)
-
-        # ✅ SUCCESS
-        if plan_step_id:
-            plan, step = find_plan_and_step(state, plan_step_id)
-            if step:
-                step["status"] = "completed"
-                log(f"[PLAN] Step completed: {step['step_id']}")
+        entry.fn(payload, state)
+        metrics.record_action(action_name, time.perf_counter() - started)
+        complete_intent(state, intent)
 
     except Exception as e:
-        log(f"[ACTION FAILURE] {action_name}: {e}")
-        log(traceback.format_exc())
+        metrics.record_action(action_name, time.perf_counter() - started, failed=True)
+        fail_intent(state, intent, e)
+    return True
 
-        # ❌ FAILURE HANDLING
-        if plan_step_id:
-            plan, step = find_plan_and_step(state, plan_step_id)
 
-            if step:
-                step["retry_count"] += 1
+# ======================================================
+# GOAL TIMEOUT
+# ======================================================
 
-                if step["retry_count"] < step["max_retries"]:
-                    step["status"] = "pending"
-                    log(f"[PLAN RETRY] {step['step_id']} retry {step['retry_count']}/{step['max_retries']}")
-                else:
-                    step["status"] = "failed"
-                    plan["status"] = "failed"
-                    log(f"[PLAN FAILED] Step {step['step_id']} exceeded retries")
+# Same priority as intent_executor and registered after it, so it runs
+# second (ties go by registration order)
+@task("goal_timeout", priority=4, cooldown_seconds=60)
+def goal_timeout_task(state):
+    now = time.time()
+
+    for goal in registry.goals_with_status(state, "active"):
+        activated_at = goal.activated_at
+        timeout_seconds = goal.timeout_seconds
 
-                    # Fail goal
-                    goal_id = plan.get("goal_id")
-                    for goal in state.get("goals", []):
-                        if goal["goal_id"] == goal_id:
-                            goal["status"] = "failed"
-                            goal["updated_at"] = datetime.now().isoformat()
-                            log(f"[GOAL FAILED] {goal['description']}")
+        if not activated_at or not timeout_seconds:
+            continue
 
-    state["intent_queue"] = intents
+        if now - activated_at > timeout_seconds:
+            registry.set_goal_status(state, goal, "failed", now)
+            log(f"[GOAL TIMEOUT] {goal['description']} exceeded time limit.")
+
+            # Stop its steps; the other active goals keep running
+            plan = registry.plan_for_goal(state, goal.goal_id, status="active")
+            if plan:
+                registry.set_plan_status(state, plan, "failed")
+            scheduler.notify("plan")
 
 
 
@@ -369,15 +623,23 @@ def intent_executor_task(state):
 # HEALTH REPORT
 # ======================================================
 
+@task("health_report", priority=100, cooldown_seconds=30)
 def health_report_task(state):
-    disabled_tasks = [
-        key.replace("disabled_", "")
-        for key, value in state.items()
-        if key.startswith("disabled_") and value
-    ]
+    disabled_tasks = sorted(policy_engine.disabled_tasks(state))
 
     if disabled_tasks:
         log(f"[HEALTH] Disabled tasks: {disabled_tasks}")
+
+    for line in metrics.summary_lines():
+        log(f"[HEALTH] {line}")
+
+    for line in get_backpressure(state).report_lines():
+        log(f"[HEALTH] {line}")
+
+    dropped = logger.dropped_count()
+    if dropped:
+        log("[HEALTH] Log records dropped: %d", dropped, level="WARNING")
+@task("weekly_review", priority=95, cooldown_seconds=60)
 def weekly_review_task(state):
     now = datetime.now()
     last_review = state.get("last_weekly_review")
@@ -387,20 +649,17 @@ def weekly_review_task(state):
         if (now - last_review_time).days < 7:
             return
 
-    goals = state.get("goals", [])
-
-    completed = len([g for g in goals if g["status"] == "completed"])
-    failed = len([g for g in goals if g["status"] == "failed"])
-    active = len([g for g in goals if g["status"] == "active"])
-    scores = [g.get("score", 0) for g in goals]
-
-    avg_score = sum(scores) / len(scores) if scores else 0
+    # One columnar pass over hot goals + archive rollups
+    report = analytics.build_report(state)
+    by_status = report["by_status"]
 
     log("==== WEEKLY REVIEW ====")
-    log(f"Completed goals: {completed}")
-    log(f"Failed goals: {failed}")
-    log(f"Active goals: {active}")
-    log(f"Average goal score: {avg_score:.1f}")
+    log(f"Completed goals: {by_status.get('completed', 0)}")
+    log(f"Failed goals: {by_status.get('failed', 0)}")
+    log(f"Active goals: {by_status.get('active', 0)}")
+    log(f"Average goal score: {report['avg_score']:.1f}")
+    for line in analytics.format_report(report):
+        log(line)
     log("=======================")
 
     state["last_weekly_review"] = now.isoformat()
@@ -410,30 +669,23 @@ def weekly_review_task(state):
         for key, value in state.items()
         if key.startswith("retry_count_") and value > 0
     }
+@task("goal_scoring", priority=6, cooldown_seconds=5)
 def goal_scoring_task(state):
-    goals = state.get("goals", [])
-
-    for goal in goals:
-        base_score = calculate_goal_score(goal or {})
-
-        raw_type = goal.get("type") or "misc"
-
-        normalized_type = GOAL_TYPE_MAP.get(raw_type, raw_type)
-
-        weight = GOAL_TYPE_PRIORITY.get(normalized_type, 1.0)
-
-        final_score = int(base_score * weight)
+    # Only goals whose status/type changed since the last run are rescored
+    rescored = scoring.get_ranker(state).refresh(state)
 
-        goal["score"] = final_score
-        goal["priority_weight"] = weight
-        goal["normalized_type"] = normalized_type
-
-    log("[GOAL SCORING] Scores updated")
+    if rescored:
+        log("[GOAL SCORING] Rescored %d goals", rescored, level="DEBUG")
 
+@task("goal_select", priority=7, cooldown_seconds=5)
 def goal_select_task(state):
 
     goal_selector.select_active_goal(state)
 
+@task("archival", priority=80, cooldown_seconds=300, max_retries=3)
+def archival_task(state):
+    archive.archive_goals(state)
+
 def get_goal_priority_weight(goal):
     raw_type = goal.get("type", "misc")
 
@@ -442,119 +694,125 @@ def get_goal_priority_weight(goal):
     return GOAL_TYPE_PRIORITY.get(normalized_type, 1.0)
 
 
-
 # ======================================================
-# TASK REGISTRY
+# TASK DISPATCHER
 # ======================================================
+#
+# Tasks register themselves with @task (task_registry.py); the loop runs
+# the compiled dispatch table through each task's precomputed adapter.
 
-TASK_REGISTRY = [
-    {"name": "heartbeat", "priority": 1, "cooldown_seconds": 0, "max_retries": 0, "task": heartbeat_task},
-    {"name": "event_listener", "priority": 2, "cooldown_seconds": 2, "max_retries": 0, "task": event_listener_task},
-    {"name": "event_handler", "priority": 3, "cooldown_seconds": 1, "max_retries": 0, "task": event_handler_task},
-    {"name": "intent_executor", "priority": 4, "cooldown_seconds": 1, "max_retries": 1, "task": intent_executor_task},
-    {
-    "name": "goal_timeout",
-    "priority": 4,
-    "cooldown_seconds": 60,
-    "max_retries": 0,
-    "task": goal_timeout_task
-},
-    {
-    "name": "plan_executor",
-    "priority": 5,
-    "cooldown_seconds": 1,
-    "max_retries": 1,
-    "task": execute_plan_step
-},
-
-    {"name": "status", "priority": 5, "cooldown_seconds": 15, "max_retries": 1, "task": status_task},
-    {
-    "name": "goal_scoring",
-    "priority": 6,
-    "cooldown_seconds": 5,
-    "max_retries": 0,
-    "task": goal_scoring_task
-},
-    {
-    "name": "goal_select",
-    "priority": 7,
-    "cooldown_seconds": 5,
-    "max_retries": 0,
-    "task": goal_select_task
-},
-    
-    {"name": "recovery", "priority": 90, "cooldown_seconds": 30, "max_retries": 0, "task": recovery_task},
-    {"name": "health_report", "priority": 100, "cooldown_seconds": 30, "max_retries": 0, "task": health_report_task},
-    {
-    "name": "weekly_review",
-    "priority": 95,
-    "cooldown_seconds": 60,
-    "max_retries": 0,
-    "task": weekly_review_task
-}
-]
+def get_task_timers(state):
+    timers = get_attachment(state, "task_timers")
+    table = dispatch_table()
 
+    if timers is None or timers.table is not table:
+        timers = scheduler.TaskTimers(table, TASK_MIN_INTERVAL_SECONDS)
+        timers.bootstrap(state, time.monotonic())
+        set_attachment(state, "task_timers", timers)
 
-# ======================================================
-# TASK DISPATCHER
-# ======================================================
+    return timers
 
-def run_all_tasks(agent, missions):
-    state = load_state()
-    now = datetime.now()
+
+def begin_tick(state, agent, triggers=None):
+    """
+    Applies pending wake-up triggers and goal activation.
+    Returns the task timers and the monotonic time of this pass.
+    """
+    mono_now = time.monotonic()
+
+    timers = get_task_timers(state)
+    policy_engine.bind_agent(state, agent)
+    if triggers is None:
+        triggers = scheduler.take_triggers()
+    for trigger in triggers:
+        timers.trigger(trigger, mono_now)
+
+    get_backpressure(state).update(queue_depths(state))
 
     # 🔑 DAY 3 + 5: Goal activation + plan generation
     activate_next_goal(state, agent)
 
-    if is_globally_paused(state):
-        log("[CONTROL] Global pause is ON. Skipping all tasks.")
-        save_state(state)
-        return
+    return timers, mono_now
 
-    for task_info in sorted(TASK_REGISTRY, key=lambda t: t["priority"]):
-        name = task_info["name"]
-        task_fn = task_info["task"]
-        cooldown = task_info["cooldown_seconds"]
-        max_retries = task_info["max_retries"]
 
-        if is_task_paused(state, name):
-            continue
+def should_skip_task(state, timers, spec, mono_now):
+    if state.get(spec.paused_key, False) or spec.name in policy_engine.disabled_tasks(state):
+        timers.completed(spec, mono_now)
+        return True
+    return False
 
-        if state.get(f"disabled_{name}"):
-            continue
 
-        last_run_key = f"last_run_{name}"
-        last_run_time = state.get(last_run_key)
+def record_task_success(state, timers, spec, now, mono_now):
+    record = timers.runtime[spec.name]
+    if record.retries:
+        record.retries = 0
+        state[spec.retry_key] = 0
+    state[spec.last_run_key] = now
+    timers.completed(spec, mono_now)
 
-        if last_run_time:
-            last_run_time = datetime.fromisoformat(last_run_time)
-            if now - last_run_time < timedelta(seconds=cooldown):
-                continue
 
-        retry_key = f"retry_count_{name}"
-        retries = state.get(retry_key, 0)
+def record_task_failure(state, timers, spec, now, mono_now, error):
+    name = spec.name
+    cooldown = spec.cooldown_seconds
+    max_retries = spec.max_retries
+    record = timers.runtime[name]
 
-        try:
-            if name in ["event_handler", "plan_executor"]:
-                task_fn(state, agent)
-            else:
-                task_fn(state)
+    record.retries = retries = state.get(spec.retry_key, 0) + 1
+    state[spec.retry_key] = retries
+    log_exception("[ERROR] Task '%s' failed (%d/%d): %s", error, name, retries, max_retries, error, task=name)
 
-            state[retry_key] = 0
-            state[last_run_key] = now.isoformat()
+    backoff = cooldown * (2 ** retries)
+    state[spec.last_run_key] = now + backoff
+    timers.completed(spec, mono_now, delay=max(backoff + cooldown, TASK_MIN_INTERVAL_SECONDS))
 
-        except Exception as e:
-            retries += 1
-            state[retry_key] = retries
-            log(f"[ERROR] Task '{name}' failed ({retries}/{max_retries}): {e}")
-            log(traceback.format_exc())
+    if retries >= max_retries:
+        policy_engine.set_task_disabled(state, name, True, datetime.fromtimestamp(now))
+        log("[ESCALATION] Task '%s' disabled after repeated failures", name, level="ERROR", task=name)
+
+
+def queue_depths(state):
+    return {
+        "event_queue": len(get_event_queue(state)),
+        "intent_queue": len(get_intent_queue(state)),
+        "pending_goals": registry.count_goals(state, "pending"),
+        "action_pool": len(get_pools().pending),
+    }
 
-            backoff = cooldown * (2 ** retries)
-            state[last_run_key] = (now + timedelta(seconds=backoff)).isoformat()
 
-            if retries >= max_retries:
-                state[f"disabled_{name}"] = True
-                state[f"disabled_at_{name}"] = now.isoformat()
-                log(f"[ESCALATION] Task '{name}' disabled after repeated failures")
+def run_all_tasks(agent, missions, partition=None, triggers=None):
+    """
+    Runs every task that is due and returns the seconds until the next one.
+    partition selects the agent's own state (multi-agent runtime), where
+    the wake-up triggers are taken once per pass and shared by all agents.
+    """
+    tick_started = time.perf_counter()
+    state = load_state(partition)
+    now = time.time()
+    timers, mono_now = begin_tick(state, agent, triggers)
+
+    if is_globally_paused(state):
+        log("[CONTROL] Global pause is ON. Skipping all tasks.")
+        save_state(state)
+        return TASK_MIN_INTERVAL_SECONDS
+
+    for spec in timers.pop_due(mono_now):
+        if should_skip_task(state, timers, spec, mono_now):
+            continue
+
+        started = time.perf_counter()
+        try:
+            spec.call(state, agent)
+
+            metrics.record_task(spec.name, time.perf_counter() - started)
+            record_task_success(state, timers, spec, now, mono_now)
+
+        except Exception as e:
+            metrics.record_task(spec.name, time.perf_counter() - started, failed=True)
+            record_task_failure(state, timers, spec, now, mono_now, e)
 
     save_state(state)
+    metrics.record_tick(time.perf_counter() - tick_started, queue_depths(state))
+
+    # Work queued during this pass (new events, intents, plan steps)
+    # re-arms the matching tasks right away
+    return timers.next_delay(time.monotonic())
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The agent's modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # Logs, state files and queue segments land in the test's own directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
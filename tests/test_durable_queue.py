@@ -0,0 +1,128 @@
+import os
+
+from durable_queue import DurableIntentQueue, idempotency_key
+
+
+def open_queue(directory, **kwargs):
+    return DurableIntentQueue(str(directory), fsync=False, **kwargs)
+
+
+def step_intent(step_id="plan_1_step1", attempt=0, action="analyze_file"):
+    return {"action": action, "plan_step_id": step_id, "attempt": attempt, "payload": {}}
+
+
+def take(queue):
+    return next(queue.pop_fair())
+
+
+# ---------- IDEMPOTENCY KEYS ----------
+
+def test_key_is_step_and_attempt():
+    assert idempotency_key(step_intent(attempt=2), 7) == "plan_1_step1#2"
+    assert idempotency_key({"action": "log_result"}, 7) == "intent#7"
+
+
+def test_same_attempt_is_deduplicated_but_a_retry_is_not(tmp_path):
+    queue = open_queue(tmp_path / "q")
+    assert queue.put(step_intent())
+    assert not queue.put(step_intent())
+    assert queue.put(step_intent(attempt=1))
+    assert len(queue) == 2
+
+
+# ---------- ACK AFTER COMMIT ----------
+
+def test_crash_between_state_commit_and_ack_redelivers(tmp_path):
+    queue = open_queue(tmp_path / "q")
+    queue.put(step_intent())
+    queue.flush(acks=False)
+
+    intent = take(queue)
+    queue.ack(intent)
+    # Save hook ran, the process died before the commit hook wrote the ack
+    queue.flush(acks=False)
+
+    recovered = open_queue(tmp_path / "q")
+    assert len(recovered) == 1
+    redelivered = take(recovered)
+    assert redelivered["idempotency_key"] == intent["idempotency_key"] == "plan_1_step1#0"
+
+
+def test_committed_ack_is_not_redelivered(tmp_path):
+    queue = open_queue(tmp_path / "q")
+    queue.put(step_intent())
+    queue.ack(take(queue))
+    queue.flush()
+
+    recovered = open_queue(tmp_path / "q")
+    assert len(recovered) == 0
+    assert recovered.leased() == 0
+
+
+def test_lease_of_a_crashed_run_is_void(tmp_path):
+    queue = open_queue(tmp_path / "q")
+    queue.put(step_intent())
+    take(queue)
+    queue.flush(acks=False)
+    assert len(queue) == 0
+
+    recovered = open_queue(tmp_path / "q")
+    assert len(recovered) == 1
+    assert recovered.leased() == 0
+
+
+# ---------- LEASE EXPIRY ----------
+
+def test_expired_lease_of_a_running_attempt_is_extended(tmp_path):
+    queue = open_queue(tmp_path / "q", lease_seconds=10)
+    queue.put(step_intent())
+    intent = take(queue)
+    later = queue.entries[queue.keys[intent["idempotency_key"]]].lease_until + 1
+
+    assert queue.redeliver_expired(now=later, running={intent["idempotency_key"]}) == []
+    assert len(queue) == 0
+    assert queue.leased() == 1
+
+    # Once the attempt is no longer running, the extended lease still holds
+    assert queue.redeliver_expired(now=later + 5) == []
+    assert len(queue) == 0
+
+
+def test_expired_lease_is_redelivered_then_dead_lettered(tmp_path):
+    queue = open_queue(tmp_path / "q", lease_seconds=10, max_deliveries=2)
+    queue.put(step_intent())
+    entry = queue.entries[queue.keys["plan_1_step1#0"]]
+
+    take(queue)
+    assert queue.redeliver_expired(now=entry.lease_until + 1) == []
+    assert len(queue) == 1
+
+    take(queue)
+    dead = queue.redeliver_expired(now=entry.lease_until + 1)
+    assert [intent["idempotency_key"] for intent in dead] == ["plan_1_step1#0"]
+    assert len(queue) == 0
+
+
+# ---------- TORN SEGMENTS ----------
+
+def test_truncated_segment_replays_up_to_the_torn_record(tmp_path):
+    queue = open_queue(tmp_path / "q")
+    queue.put(step_intent("plan_1_step1"))
+    queue.put(step_intent("plan_1_step2"))
+    queue.flush()
+    path = queue.segment_path(queue.current_segment())
+    queue.file.close()
+
+    valid_size = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write(b'{"e":3,"i":{"action":"analy')
+
+    recovered = open_queue(tmp_path / "q")
+    assert len(recovered) == 2
+    assert os.path.getsize(path) == valid_size
+
+    # New records start on a clean line and survive the next recovery
+    assert recovered.put(step_intent("plan_1_step3"))
+    recovered.flush()
+    recovered.close()
+    assert len(open_queue(tmp_path / "q")) == 3
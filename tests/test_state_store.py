@@ -0,0 +1,64 @@
+import os
+
+from state_store import JournaledStateStore, mark_dirty, mark_removed
+
+
+def open_store(directory, **kwargs):
+    return JournaledStateStore(
+        str(directory / "agent_state.json"), str(directory / "agent_state.journal"), fsync=False, **kwargs
+    )
+
+
+def test_journal_replays_keys_and_records(tmp_path):
+    store = open_store(tmp_path)
+    state = store.load()
+    state["counter"] = 1
+    state["watch_mtimes"] = {"a.txt": [1, 2], "b.txt": [3, 4]}
+    store.commit(state)
+
+    state["watch_mtimes"]["a.txt"] = [5, 6]
+    mark_dirty(state, "watch_mtimes", "a.txt")
+    del state["watch_mtimes"]["b.txt"]
+    mark_removed(state, "watch_mtimes", "b.txt")
+    store.commit(state)
+
+    recovered = open_store(tmp_path).load()
+    assert recovered["counter"] == 1
+    assert recovered["watch_mtimes"] == {"a.txt": [5, 6]}
+
+
+def test_torn_journal_tail_is_ignored_and_truncated(tmp_path):
+    store = open_store(tmp_path)
+    state = store.load()
+    state["counter"] = 1
+    store.commit(state)
+
+    journal = tmp_path / "agent_state.journal"
+    valid_size = os.path.getsize(journal)
+    with open(journal, "a") as file:
+        file.write('{"seq":2,"ops":[{"op":"set","key":"counter","val')
+
+    # Inspecting a running agent leaves the torn tail in place
+    assert open_store(tmp_path).load(read_only=True)["counter"] == 1
+    assert os.path.getsize(journal) > valid_size
+
+    store = open_store(tmp_path)
+    state = store.load()
+    assert state["counter"] == 1
+    assert os.path.getsize(journal) == valid_size
+
+    # The next batch starts on a clean line
+    state["counter"] = 2
+    store.commit(state)
+    assert open_store(tmp_path).load()["counter"] == 2
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    store = open_store(tmp_path, compact_every=2)
+    state = store.load()
+    for value in range(3):
+        state["counter"] = value
+        store.commit(state)
+
+    assert os.path.exists(tmp_path / "agent_state.json")
+    assert open_store(tmp_path).load()["counter"] == 2
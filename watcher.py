@@ -0,0 +1,393 @@
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import struct
+import threading
+import time
+
+from logger import log
+import scheduler
+from state_store import mark_dirty, mark_removed
+
+
+# ======================================================
+# WATCH GLOBS
+# ======================================================
+
+def compile_glob(pattern):
+    """
+    Glob -> regex where "*" and "?" stay inside one path component and
+    "**" spans directories.
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def split_glob(pattern):
+    """
+    Returns (root directory without wildcards, whether subdirectories matter).
+    """
+    parts = pattern.split("/")
+    root = []
+    for part in parts[:-1]:
+        if any(ch in part for ch in "*?["):
+            return "/".join(root) or ("/" if pattern.startswith("/") else "."), True
+        root.append(part)
+    return "/".join(root) or ("/" if pattern.startswith("/") else "."), False
+
+
+class WatchSpec:
+    def __init__(self, globs, ignore_dirs=()):
+        self.patterns = []
+        self.roots = {}
+        self.ignore_dirs = set(ignore_dirs)
+
+        for pattern in globs:
+            pattern = os.path.normpath(pattern)
+            self.patterns.append(compile_glob(pattern))
+            root, recursive = split_glob(pattern)
+            self.roots[root] = self.roots.get(root, False) or recursive
+
+    def matches(self, path):
+        return any(p.match(path) for p in self.patterns)
+
+    def is_recursive(self, directory):
+        for root, recursive in self.roots.items():
+            if recursive and (root == "." or directory == root or directory.startswith(root + "/")):
+                return True
+        return False
+
+    def directories(self):
+        dirs = set()
+        for root, recursive in self.roots.items():
+            if not os.path.isdir(root):
+                continue
+            dirs.add(root)
+            if recursive:
+                for current, subdirs, _ in os.walk(root):
+                    subdirs[:] = [d for d in subdirs if d not in self.ignore_dirs]
+                    for d in subdirs:
+                        dirs.add(os.path.normpath(os.path.join(current, d)))
+        return dirs
+
+
+def join_path(directory, name):
+    return os.path.normpath(os.path.join(directory, name))
+
+
+# ======================================================
+# POLLING BACKEND (os.scandir)
+# ======================================================
+
+class PollingBackend:
+    """
+    Stats every matching file with os.scandir, a bounded number of
+    directories per call (max_dirs, 0 = all), rotating through the set.
+    Discovered subdirectories join the set and leave it once deleted;
+    the glob roots always stay.
+    """
+
+    name = "polling"
+
+    def __init__(self, spec, max_dirs=0):
+        self.spec = spec
+        self.max_dirs = max_dirs
+        self.roots = set(spec.roots)
+        self.dirs = sorted(spec.directories())
+        self.cursor = 0
+
+    def scan(self, full=False):
+        """
+        Returns ({path: signature} for files seen, set of directories
+        scanned). A deleted directory counts as scanned (and empty), so
+        its files are forgotten too.
+        """
+        if full or not self.max_dirs or self.max_dirs >= len(self.dirs):
+            batch = list(self.dirs)
+        else:
+            end = self.cursor + self.max_dirs
+            batch = self.dirs[self.cursor:end]
+            if end > len(self.dirs):
+                batch += self.dirs[:end - len(self.dirs)]
+            self.cursor = end % len(self.dirs)
+
+        seen = {}
+        scanned = set()
+        gone = set()
+
+        for directory in batch:
+            try:
+                entries = os.scandir(directory)
+            except (FileNotFoundError, NotADirectoryError):
+                if directory not in self.roots:
+                    gone.add(directory)
+                scanned.add(directory)
+                continue
+            except OSError:
+                continue
+
+            scanned.add(directory)
+            with entries:
+                for entry in entries:
+                    path = join_path(directory, entry.name)
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if (
+                                entry.name not in self.spec.ignore_dirs
+                                and self.spec.is_recursive(directory)
+                                and path not in self.dirs
+                            ):
+                                self.dirs.append(path)
+                            continue
+                        if not self.spec.matches(path):
+                            continue
+                        seen[path] = file_signature(entry.stat())
+                    except OSError:
+                        continue
+
+        if gone:
+            self.dirs = [directory for directory in self.dirs if directory not in gone]
+            self.cursor = self.cursor % len(self.dirs) if self.dirs else 0
+
+        return seen, scanned
+
+
+def file_signature(st):
+    return [st.st_mtime_ns, st.st_size]
+
+
+# ======================================================
+# INOTIFY BACKEND (Linux, ctypes)
+# ======================================================
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """
+    One inotify watch per directory. A reader thread collects changed paths
+    and calls scheduler.notify("watch") once a burst has been quiet for
+    coalesce_ms, so rapid successive writes produce a single wake-up.
+    Paths left pending (e.g. while backpressure pauses the listener) are
+    not notified again until a new event arrives or drain() is called.
+    """
+
+    name = "inotify"
+
+    def __init__(self, spec, coalesce_ms):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.libc = libc
+        self.spec = spec
+        self.coalesce = coalesce_ms / 1000.0
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.watches = {}   # wd -> directory
+        self.pending = {}   # path -> last event (monotonic)
+        self.overflow = False
+        self.notified = False   # this burst's wake-up has been sent
+        self.lock = threading.Lock()
+        self.closed = False
+
+        for directory in spec.directories():
+            self.add_watch(directory)
+
+        thread = threading.Thread(target=self._reader, name="inotify", daemon=True)
+        thread.start()
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            log(f"[WATCH] Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+            return
+        self.watches[wd] = directory
+
+    def _reader(self):
+        while not self.closed:
+            # Wake once a second to notice close()
+            burst = self.pending and not self.notified
+            ready, _, _ = select.select([self.fd], [], [], self.coalesce if burst else 1.0)
+
+            if ready:
+                self._read_events()
+                continue
+
+            # Quiet for coalesce_ms with paths pending → wake the listener once
+            if burst:
+                self.notified = True
+                scheduler.notify("watch")
+
+        os.close(self.fd)
+
+    def close(self):
+        self.closed = True
+
+    def _read_events(self):
+        try:
+            buffer = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        now = time.monotonic()
+
+        with self.lock:
+            while offset < len(buffer):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    self.overflow = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+
+                path = join_path(directory, os.fsdecode(name))
+
+                if mask & IN_ISDIR:
+                    if mask & IN_CREATE and self.spec.is_recursive(directory):
+                        self.add_watch(path)
+                    continue
+
+                if self.spec.matches(path):
+                    self.pending[path] = now
+                    self.notified = False
+
+    def drain(self):
+        """
+        Returns (changed paths, overflowed).
+        """
+        with self.lock:
+            paths = list(self.pending)
+            overflow = self.overflow
+            self.pending = {}
+            self.overflow = False
+            self.notified = False
+        return paths, overflow
+
+
+# ======================================================
+# FILE WATCHER
+# ======================================================
+
+class FileWatcher:
+    """
+    Watches every file matching the configured globs and reports changed
+    paths. Baseline signatures (mtime_ns, size) are kept in
+    state["watch_mtimes"] so changes made while the agent was down are
+    reported on the next start.
+    """
+
+    def __init__(self, globs, backend="auto", coalesce_ms=200, poll_max_dirs=0, ignore_dirs=()):
+        self.spec = WatchSpec(globs, ignore_dirs)
+        self.poller = PollingBackend(self.spec, poll_max_dirs)
+        self.inotify = None
+        self.initial_scan_done = False
+
+        if backend in ("auto", "inotify"):
+            try:
+                self.inotify = InotifyBackend(self.spec, coalesce_ms)
+            except (OSError, AttributeError) as e:
+                if backend == "inotify":
+                    raise
+                log(f"[WATCH] inotify unavailable ({e}); using polling")
+
+        self.backend = self.inotify.name if self.inotify else self.poller.name
+        log(f"[WATCH] Watching {len(self.poller.dirs)} directories via {self.backend}")
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+
+    def poll(self, state):
+        """
+        Returns the paths whose signature changed since the last call.
+        The very first scan with no stored baseline records it silently.
+        """
+        known = state.get("watch_mtimes")
+        baseline_only = known is None
+        if known is None:
+            known = state["watch_mtimes"] = {}
+
+        if self.inotify is None or not self.initial_scan_done:
+            changed = self._apply_scan(state, known, *self.poller.scan(full=not self.initial_scan_done))
+            self.initial_scan_done = True
+            return [] if baseline_only else changed
+
+        paths, overflow = self.inotify.drain()
+        if overflow:
+            log("[WATCH] inotify queue overflow; rescanning")
+            return self._apply_scan(state, known, *self.poller.scan(full=True))
+
+        changed = []
+        for path in paths:
+            try:
+                signature = file_signature(os.stat(path))
+            except OSError:
+                if known.pop(path, None) is not None:
+                    mark_removed(state, "watch_mtimes", path)
+                continue
+
+            if known.get(path) != signature:
+                known[path] = signature
+                mark_dirty(state, "watch_mtimes", path)
+                changed.append(path)
+
+        return changed
+
+    def _apply_scan(self, state, known, seen, scanned):
+        changed = []
+
+        for path, signature in seen.items():
+            if known.get(path) != signature:
+                known[path] = signature
+                mark_dirty(state, "watch_mtimes", path)
+                changed.append(path)
+
+        # Forget files that vanished from the directories we just scanned
+        for path in list(known):
+            if path not in seen and (os.path.dirname(path) or ".") in scanned:
+                del known[path]
+                mark_removed(state, "watch_mtimes", path)
+
+        return changed
@@ -0,0 +1,238 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import logger
+from logger import log
+from config import (
+    ACTION_THREAD_WORKERS,
+    ACTION_PROCESS_WORKERS,
+    ACTION_PROCESS_START_METHOD,
+)
+import scheduler
+from state_store import TrackedState, mark_dirty, mark_removed
+
+
+# ======================================================
+# WORKER SIDE
+# ======================================================
+
+def run_action_in_worker(action_name, payload, seed):
+    """
+    Runs one action against a scratch state seeded with the slice it
+    declared, and ships back only what it changed:
+        {"set": {key: value}, "del": [key],
+         "put": {key: {id: value}}, "drop": {key: [id]},
+         "seconds": run time in the worker}
+    Exceptions propagate to the caller through the future.
+    """
+    from action_plugins import resolve_action
+
+    scratch = TrackedState(seed)
+    started = time.perf_counter()
+    resolve_action(action_name).fn(payload, scratch)
+    seconds = time.perf_counter() - started
+
+    return {
+        "seconds": seconds,
+        "set": {key: scratch[key] for key in scratch.dirty_keys},
+        "del": list(scratch.deleted_keys),
+        "put": {
+            key: {record_id: scratch[key][record_id] for record_id in ids if record_id in scratch[key]}
+            for key, ids in scratch.dirty_records.items() if ids
+        },
+        "drop": {key: list(ids) for key, ids in scratch.deleted_records.items() if ids},
+    }
+
+
+def _init_worker():
+    # Ctrl+C is the parent's to handle; it shuts the pool down cleanly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger.use_sync_writes()
+
+
+def _warmup():
+    # Imports the process-target action modules once per worker and keeps
+    # it busy briefly so every worker of the pool gets spawned up front
+    from action_plugins import get_registry
+    get_registry().preload(target="process")
+    time.sleep(0.05)
+    return True
+
+
+# ======================================================
+# PARENT SIDE
+# ======================================================
+
+def apply_changes(state, changes):
+    """
+    Merge a worker's change set into the live state (journaled as usual).
+    Record-level changes apply to dict-valued keys only.
+    """
+    for key in changes.get("del", []):
+        state.pop(key, None)
+
+    for key, value in changes.get("set", {}).items():
+        state[key] = value
+
+    for key, records in changes.get("put", {}).items():
+        target = state.setdefault(key, {})
+        for record_id, value in records.items():
+            target[record_id] = value
+            mark_dirty(state, key, record_id)
+
+    for key, record_ids in changes.get("drop", {}).items():
+        target = state.get(key, {})
+        for record_id in record_ids:
+            if target.pop(record_id, None) is not None:
+                mark_removed(state, key, record_id)
+
+
+class ActionPools:
+    """
+    Warm thread and process pools for actions whose ActionSpec declares
+    target "thread" or "process". Pools start lazily on first use and are
+    reused for the life of the agent.
+    """
+
+    def __init__(self, thread_workers=ACTION_THREAD_WORKERS, process_workers=ACTION_PROCESS_WORKERS):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.threads = None
+        self.processes = None
+        self.pending = []   # (future, intent, state, timeout, submitted) from intent_executor_task
+        self.overdue = set()  # futures past their timeout, reported as TimeoutError
+
+    def pool(self, target):
+        if target == "thread":
+            if self.threads is None:
+                self.threads = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix="action"
+                )
+            return self.threads
+
+        if target == "process":
+            if self.processes is None:
+                self.processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context(ACTION_PROCESS_START_METHOD),
+                    initializer=_init_worker,
+                )
+                started = time.perf_counter()
+                warm = [self.processes.submit(_warmup) for _ in range(self.process_workers)]
+                for future in warm:
+                    future.result()
+                log(
+                    f"[POOL] {self.process_workers} process workers ready "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            return self.processes
+
+        raise ValueError(f"Unknown execution target '{target}'")
+
+    def submit(self, entry, action_name, payload, state):
+        seed = entry.state_slice(payload, state) if entry.state_slice else {}
+
+        future = self.pool(entry.target).submit(run_action_in_worker, action_name, payload, seed)
+        future.add_done_callback(lambda _: scheduler.notify("intent"))
+        return future
+
+    def track(self, future, intent, state=None, timeout=None):
+        self.pending.append((future, intent, state, timeout, time.monotonic()))
+
+    def expire(self, entry, now):
+        """
+        Past its timeout a queued submission is cancelled; one already
+        running cannot be interrupted, so it stays pending (its intent
+        leased) until it stops, and either way fails with TimeoutError.
+        """
+        future, intent, _, timeout, submitted = entry
+        if future in self.overdue or not timeout or now - submitted < timeout:
+            return
+
+        self.overdue.add(future)
+        if not future.cancel():
+            log(
+                "[POOL] Action %s exceeded %ss, waiting for the running attempt",
+                intent.get("action"), timeout, level="WARNING", step_id=intent.get("plan_step_id"),
+            )
+
+    def harvest(self, state=None):
+        """
+        Remove and return (intent, changes, error) for finished submissions
+        (of one state only, when several agents share the pools).
+        """
+        now = time.monotonic()
+        done = []
+        still_running = []
+        for entry in self.pending:
+            future, _, owner = entry[:3]
+            if state is not None and owner is not state:
+                still_running.append(entry)
+                continue
+
+            self.expire(entry, now)
+            (done if future.done() else still_running).append(entry)
+
+        if not done:
+            return []
+
+        self.pending = still_running
+
+        results = []
+        for future, intent, _, timeout, _ in done:
+            if future in self.overdue:
+                self.overdue.discard(future)
+                results.append((intent, None, TimeoutError(f"Action '{intent.get('action')}' exceeded {timeout}s")))
+                continue
+            try:
+                results.append((intent, future.result(), None))
+            except Exception as e:
+                results.append((intent, None, e))
+        return results
+
+    def in_flight(self, state):
+        return [entry[0] for entry in self.pending if entry[2] is state]
+
+    def running_keys(self, state):
+        """
+        Idempotency keys of a state's submissions still in the pools.
+        """
+        return {entry[1]["idempotency_key"] for entry in self.pending if entry[2] is state}
+
+    def discard(self, state):
+        """
+        Stop tracking a state's submissions (its agent was removed).
+        """
+        kept = []
+        for entry in self.pending:
+            if entry[2] is state:
+                self.overdue.discard(entry[0])
+            else:
+                kept.append(entry)
+        self.pending = kept
+
+    def shutdown(self, wait=False):
+        for pool in (self.threads, self.processes):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_pools = None
+
+
+def get_pools():
+    global _pools
+    if _pools is None:
+        _pools = ActionPools()
+    return _pools
+
+
+def configure_pools(**kwargs):
+    """
+    Replace the (not yet started) pools, e.g. to size them per shard.
+    """
+    global _pools
+    _pools = ActionPools(**kwargs)
+    return _pools